@@ -1,12 +1,43 @@
-from flask import Flask, request, render_template, jsonify
-import numpy as np
-import pandas as pd
+import os
 
-from sklearn.preprocessing import StandardScaler
+from flask import Flask, Response, request, render_template, jsonify
+
+from src.metrics import metrics
+from src.pipeline.input_schema import SchemaValidationError
 from src.pipeline.predict_pipeline import CustomData, PredictPipeline
 
 app = Flask(__name__)
 
+# Largest number of rows accepted by `/predict/batch` in a single request
+app.config['MAX_BATCH_SIZE'] = int(os.environ.get('MAX_BATCH_SIZE', 10000))
+
+# Artifacts are cached process-wide, so a single pipeline serves every request.
+# With SERVING_ROUTES and/or SHADOW_MODELS set, models of the registry are served side by side
+# (see `ModelRouter`). Otherwise, with MICRO_BATCHING=1, concurrent `/predict` requests are
+# coalesced into micro-batches.
+if os.environ.get('SERVING_ROUTES') or os.environ.get('SHADOW_MODELS'):
+    from src.pipeline.model_router import ModelRouter
+    predict_pipeline = PredictPipeline(router=ModelRouter())
+elif os.environ.get('MICRO_BATCHING') == '1':
+    from src.pipeline.micro_batcher import MicroBatcher
+    predict_pipeline = PredictPipeline(batcher=MicroBatcher())
+else:
+    predict_pipeline = PredictPipeline()
+
+# Set by `warm_up` once the artifacts are loaded and a test prediction has succeeded
+app.config['READY'] = False
+
+
+def warm_up():
+    """
+    Load the artifacts and run a warm-up prediction, then mark the app as ready.
+    """
+    app.config['READY'] = False
+    prediction = predict_pipeline.warm_up()
+    app.config['READY'] = True
+    return prediction
+
+
 # Route for Homepage
 @app.route('/')
 def index():
@@ -25,30 +56,80 @@ def predict_datapoint():
         return render_template('home.html')
     
     try:
-        # Collect form input and create a `CustomData` instance
+        # Collect form input and create a `CustomData` instance, the scores are parsed by the schema check
         student_data = CustomData(
             gender=request.form.get('gender'),
             race_ethnicity=request.form.get('ethnicity'),   
             parental_level_of_education=request.form.get('parental_level_of_education'),
             lunch=request.form.get('lunch'),
             test_preparation_course=request.form.get('test_preparation_course'),
-            reading_score=int(request.form.get('reading_score')),
-            writing_score=int(request.form.get('writing_score'))
+            reading_score=request.form.get('reading_score'),
+            writing_score=request.form.get('writing_score')
         )
 
-        # Convert to DataFrame for model compatibility
-        input_data = student_data.to_dataframe()
-        
-        # Load and run the prediction pipeline
-        predictor = PredictPipeline()
-        predicted_score = predictor.predict(input_data)
+        # Run the single-row prediction pipeline (no DataFrame on the fast path)
+        predicted_score = predict_pipeline.predict_one(student_data, request.headers.get('X-Routing-Key'))
 
         # Render the result on the home page
-        return render_template('home.html', prediction=round(predicted_score[0], 2))
+        return render_template('home.html', prediction=round(predicted_score, 2))
 
+    except SchemaValidationError as e:
+        return jsonify({"error": str(e), "details": e.errors}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Handle JSON batch prediction requests.
+    - Accepts a list of records, `{"records": [...]}` or columnar `{"columns": {...}}`.
+    - Runs a single preprocess/predict call over the whole batch.
+    - Returns the predictions in input order, and the model of each one when several are served.
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({"error": "Request body must be JSON."}), 400
+
+    try:
+        input_data = CustomData.batch_to_dataframe(payload, app.config['MAX_BATCH_SIZE'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        routing_key = request.headers.get('X-Routing-Key')
+        if predict_pipeline.router is not None:
+            predictions, served_by = predict_pipeline.predict_routed(input_data, routing_key)
+            return jsonify({"predictions": predictions.tolist(), "count": len(predictions), "models": served_by})
+        predictions = predict_pipeline.predict(input_data)
+        return jsonify({"predictions": predictions.tolist(), "count": len(predictions)})
+
+    except SchemaValidationError as e:
+        # Invalid rows are rejected before any preprocessing, with the row and field of each error
+        return jsonify({"error": str(e), "details": e.errors, "invalid_rows": e.n_invalid_rows}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/ready')
+def readiness():
+    """Readiness probe: 200 only after the warm-up prediction has succeeded."""
+    if not app.config['READY']:
+        return jsonify({"status": "warming up"}), 503
+    if predict_pipeline.router is not None:
+        return jsonify({"status": "ready", "models": predict_pipeline.router.get().version})
+    return jsonify({"status": "ready", "artifacts_version": predict_pipeline.cache.get().version})
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose stage timings and prediction cache statistics in Prometheus text format."""
+    body = metrics.render_prometheus() + predict_pipeline.result_cache.render_prometheus()
+    if predict_pipeline.router is not None:
+        body += predict_pipeline.router.render_prometheus()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == "__main__":
+    warm_up()
     app.run(host='0.0.0.0', debug=True)
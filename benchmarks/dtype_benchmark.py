@@ -0,0 +1,88 @@
+"""
+Compares the dataset formats between pipeline stages: CSV with default dtypes, CSV with the typed schema and the binary pickle.
+
+The dataset is stud.csv with its rows repeated to get closer to a realistic size. For every
+format the script reports the write time, the file size, the read (parse) time, the in-memory
+size of the loaded frame and the peak allocation while reading it (tracemalloc).
+
+Usage:
+    python benchmarks/dtype_benchmark.py [--repeat-rows 200] [--repeats 3] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_schema import DatasetSchema, frame_nbytes, read_dataset, write_dataset  # noqa: E402
+
+FORMATS = {
+    'csv (default dtypes)': ('.csv', lambda path: pd.read_csv(path)),
+    'csv (typed schema)': ('.csv', lambda path: read_dataset(path, DatasetSchema())),
+    'pickle (typed schema)': ('.pkl', lambda path: read_dataset(path, DatasetSchema())),
+}
+
+
+def _timed(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+def _peak_allocation(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(repeat_rows, repeats):
+    source = pd.read_csv(os.path.join('notebook', 'data', 'stud.csv'))
+    source = pd.concat([source] * repeat_rows, ignore_index=True)
+    typed = DatasetSchema().apply(source)
+    report = {'rows': len(source), 'formats': {}}
+    print(f"{len(source)} rows")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (extension, read) in FORMATS.items():
+            path = os.path.join(directory, f"data{extension}")
+            frame = source if name == 'csv (default dtypes)' else typed
+            write_time, _ = _timed(lambda: write_dataset(frame, path), repeats)
+            read_time, loaded = _timed(lambda: read(path), repeats)
+            result = {
+                'write_seconds': write_time,
+                'read_seconds': read_time,
+                'file_bytes': os.path.getsize(path),
+                'memory_bytes': frame_nbytes(loaded),
+                'peak_read_allocation_bytes': _peak_allocation(lambda: read(path)),
+                'dtypes': {column: str(dtype) for column, dtype in loaded.dtypes.items()},
+            }
+            report['formats'][name] = result
+            print(f"{name:>22}: write {write_time * 1e3:8.1f} ms, read {read_time * 1e3:8.1f} ms, "
+                  f"file {result['file_bytes'] / 1e6:7.2f} MB, in memory {result['memory_bytes'] / 1e6:7.2f} MB, "
+                  f"peak while reading {result['peak_read_allocation_bytes'] / 1e6:7.2f} MB")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    parser.add_argument('--repeat-rows', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    report = run(args.repeat_rows, args.repeats)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
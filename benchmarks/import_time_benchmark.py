@@ -0,0 +1,130 @@
+"""
+Measures the cold start of the serving app and enforces an import-time budget.
+
+Each repeat runs in a fresh interpreter that imports `app` (the serving entry point), then
+runs its warm-up prediction. The check fails (exit code 1) if:
+- the median import time exceeds `--budget-ms`,
+- importing the app loads a training-only module (model selection, metrics, boosting
+  libraries), i.e. the serving import graph picked up a training dependency again,
+- importing the app creates a log file (imports must not have filesystem side effects).
+
+The heaviest direct imports of `app` (from `python -X importtime`) are printed to show where
+the remaining time goes.
+
+Usage:
+    python benchmarks/import_time_benchmark.py [--budget-ms 1000] [--repeats 5] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the training code needs; none of them may be imported by `import app`
+TRAINING_ONLY_MODULES = (
+    'sklearn.model_selection',
+    'sklearn.metrics',
+    'sklearn.ensemble',
+    'sklearn.tree',
+    'sklearn.neighbors',
+    'xgboost',
+    'catboost',
+    'src.components',
+)
+
+# Runs in a fresh interpreter, so modules imported by earlier runs don't hide any cost.
+_CHILD = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import app
+import_time = time.perf_counter() - start
+import src.logger
+loaded = sorted(name for name in sys.modules if name.startswith({modules!r}))
+log_file_created = os.path.exists(src.logger.LOG_FILE_PATH)
+start = time.perf_counter()
+app.warm_up()
+warm_up_time = time.perf_counter() - start
+print(json.dumps({{
+    'import_time': import_time,
+    'warm_up_time': warm_up_time,
+    'training_modules': loaded,
+    'log_file_created': log_file_created,
+}}))
+"""
+
+
+def heaviest_imports(top):
+    """
+    Returns the `top` direct imports of `app` with the largest cumulative import time (ms).
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            check=True, capture_output=True, text=True, cwd=ROOT)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Children are listed before their parent and indented two spaces per level, so the
+        # direct imports of `app` are the depth-1 entries since the previous top-level module
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == 'app':
+                break
+            imports = []
+        elif depth == 1:
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+
+def run(repeats, budget_ms, top):
+    code = _CHILD.format(root=ROOT, modules=TRAINING_ONLY_MODULES)
+    runs = [
+        json.loads(subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                                  text=True, cwd=ROOT).stdout.strip().splitlines()[-1])
+        for _ in range(repeats)
+    ]
+    report = {
+        'repeats': repeats,
+        'budget_ms': budget_ms,
+        'import_ms_median': float(np.median([r['import_time'] for r in runs])) * 1e3,
+        'warm_up_ms_median': float(np.median([r['warm_up_time'] for r in runs])) * 1e3,
+        'training_modules': sorted({name for r in runs for name in r['training_modules']}),
+        'log_file_created': any(r['log_file_created'] for r in runs),
+        'heaviest_imports': heaviest_imports(top),
+    }
+
+    print(f"import app: {report['import_ms_median']:.1f} ms (budget {budget_ms:.0f} ms), "
+          f"warm-up: {report['warm_up_ms_median']:.1f} ms")
+    for name, cumulative in report['heaviest_imports']:
+        print(f"  {name:<40} {cumulative:8.1f} ms")
+
+    failures = []
+    if report['import_ms_median'] > budget_ms:
+        failures.append(f"import time {report['import_ms_median']:.1f} ms is over the {budget_ms:.0f} ms budget")
+    if report['training_modules']:
+        failures.append(f"training-only modules imported by the app: {', '.join(report['training_modules'])}")
+    if report['log_file_created']:
+        failures.append("importing the app created a log file")
+    report['failures'] = failures
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000.0)
+    parser.add_argument('--top', type=int, default=10, help="Number of heaviest imports to list.")
+    args = parser.parse_args()
+    report = run(args.repeats, args.budget_ms, args.top)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    for failure in report['failures']:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if report['failures'] else 0)
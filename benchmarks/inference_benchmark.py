@@ -0,0 +1,190 @@
+"""
+Measures the latency and throughput of the inference hot path.
+
+Scenarios, all fed with rows of notebook/data/stud.csv:
+- predict_single:      PredictPipeline.predict on a one-row DataFrame
+- predict_one:         PredictPipeline.predict_one on a CustomData (compiled fast path)
+- predict_batch:       PredictPipeline.predict on `--batch-size` rows at once
+- flask_predict:       POST /predict through the Flask test client
+- flask_predict_batch: POST /predict/batch through the Flask test client
+- cold_start:          Fresh interpreter: import app + first prediction (artifact load)
+
+Results are written as JSON so that runs on different commits can be compared:
+    python benchmarks/inference_benchmark.py --output after.json --compare before.json
+
+Requires trained artifacts in artifacts/ (run `python src/components/data_ingestion.py` first).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FORM_FIELDS = {
+    'gender': 'gender',
+    'race_ethnicity': 'ethnicity',
+    'parental_level_of_education': 'parental_level_of_education',
+    'lunch': 'lunch',
+    'test_preparation_course': 'test_preparation_course',
+    'reading_score': 'reading_score',
+    'writing_score': 'writing_score',
+}
+
+_COLD_START = """
+import time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+from src.pipeline.predict_pipeline import CustomData, PredictPipeline
+PredictPipeline().predict_one(CustomData(**{record!r}))
+print(imported - start, time.perf_counter() - start)
+"""
+
+
+def summarize(latencies, n_rows=1):
+    """
+    Turns per-call latencies (seconds) into percentiles (ms) and throughput.
+    """
+    latencies = np.asarray(latencies)
+    total = latencies.sum()
+    return {
+        'calls': int(latencies.size),
+        'p50_ms': float(np.percentile(latencies, 50) * 1e3),
+        'p95_ms': float(np.percentile(latencies, 95) * 1e3),
+        'p99_ms': float(np.percentile(latencies, 99) * 1e3),
+        'mean_ms': float(latencies.mean() * 1e3),
+        'calls_per_sec': float(latencies.size / total),
+        'rows_per_sec': float(latencies.size * n_rows / total),
+    }
+
+
+def measure(call, payloads, warmup):
+    """
+    Times `call(payload)` once per payload, after `warmup` untimed calls.
+    """
+    for payload in payloads[:warmup]:
+        call(payload)
+    latencies = []
+    for payload in payloads:
+        start = time.perf_counter()
+        call(payload)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(iterations, batch_size, cold_starts, warmup):
+    from app import app
+    from src.pipeline.predict_pipeline import FEATURE_COLUMNS, CustomData, PredictPipeline
+
+    df = pd.read_csv(os.path.join(ROOT, 'notebook', 'data', 'stud.csv'))[FEATURE_COLUMNS]
+    records = df.to_dict('records')
+    workload = [records[i % len(records)] for i in range(iterations)]
+    pipeline = PredictPipeline()
+    client = app.test_client()
+    results = {}
+
+    results['predict_single'] = summarize(measure(
+        lambda record: pipeline.predict(pd.DataFrame([record])), workload, warmup))
+
+    results['predict_one'] = summarize(measure(
+        lambda record: pipeline.predict_one(CustomData(**record)), workload, warmup))
+
+    batch = pd.concat([df] * (batch_size // len(df) + 1), ignore_index=True).iloc[:batch_size]
+    batch_calls = max(10, iterations // 100)
+    results['predict_batch'] = summarize(
+        measure(pipeline.predict, [batch] * batch_calls, 1), n_rows=batch_size)
+    results['predict_batch']['batch_size'] = batch_size
+
+    def post_form(record):
+        response = client.post('/predict', data={FORM_FIELDS[name]: str(value) for name, value in record.items()})
+        assert response.status_code == 200, response.data
+
+    results['flask_predict'] = summarize(measure(post_form, workload, warmup))
+
+    batch_json = batch.to_dict('records')
+
+    def post_batch(payload):
+        response = client.post('/predict/batch', json=payload)
+        assert response.status_code == 200, response.data
+
+    results['flask_predict_batch'] = summarize(
+        measure(post_batch, [batch_json] * batch_calls, 1), n_rows=batch_size)
+    results['flask_predict_batch']['batch_size'] = batch_size
+
+    import_times, total_times = [], []
+    for _ in range(cold_starts):
+        output = subprocess.run([sys.executable, '-c', _COLD_START.format(record=records[0])], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+        import_time, total_time = map(float, output.split())
+        import_times.append(import_time)
+        total_times.append(total_time)
+    results['cold_start'] = {
+        'runs': cold_starts,
+        'import_ms_median': float(np.median(import_times) * 1e3),
+        'first_prediction_ms_median': float(np.median(total_times) * 1e3),
+    }
+
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """
+    Prints the relative change of the headline numbers against a previous report.
+    """
+    print(f"\nChange vs {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for scenario, current in report['results'].items():
+        previous = baseline['results'].get(scenario)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms', 'rows_per_sec', 'first_prediction_ms_median'):
+            if metric in current and metric in previous and previous[metric]:
+                change = (current[metric] - previous[metric]) / previous[metric] * 100
+                print(f"  {scenario:>20} {metric:>27}: {previous[metric]:12.3f} -> {current[metric]:12.3f} "
+                      f"({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark single and batch inference latency/throughput.")
+    parser.add_argument('--iterations', type=int, default=2000, help="Timed calls per single-row scenario.")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--cold-starts', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    parser.add_argument('--compare', help="Previous JSON results to compare against.")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    report = run(args.iterations, args.batch_size, args.cold_starts, args.warmup)
+
+    for scenario, result in report['results'].items():
+        print(f"{scenario:>20}: " + ", ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.items()))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
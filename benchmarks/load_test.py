@@ -0,0 +1,308 @@
+"""
+Load-tests the Flask app over HTTP at increasing numbers of concurrent clients.
+
+The app is started in its own process on a localhost port with Werkzeug's threaded server
+(not the debug server, and after the same warm-up as `python app.py`), or an already running
+server is targeted with `--url`. For every concurrency level, that many clients each keep one
+HTTP/1.1 connection open and send requests back to back for `--duration` seconds, with the
+rows of notebook/data/stud.csv as payloads: form posts to /predict, or JSON batches of
+`--batch-size` rows to /predict/batch with `--endpoint batch`.
+
+Per level the report has the throughput, the latency percentiles and histogram, the errors
+by kind and the server's resident memory (sampled from /proc, Linux only). A level is flagged
+as saturated when adding clients no longer raises the throughput by `--min-gain` but raises
+the p99 latency by more than `--max-latency-growth` times, or when more than `--max-error-rate`
+of its requests fail. Reports are JSON so runs on different commits can be compared:
+    python benchmarks/load_test.py --output after.json --compare before.json
+
+Requires trained artifacts in artifacts/ (run `python src/components/data_ingestion.py` first).
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.inference_benchmark import FORM_FIELDS, git_commit  # noqa: E402
+from src.metrics import DEFAULT_BUCKETS  # noqa: E402
+from src.pipeline.predict_pipeline import FEATURE_COLUMNS  # noqa: E402
+
+_SERVER = """
+from werkzeug.serving import make_server
+import app
+app.warm_up()
+server = make_server('127.0.0.1', 0, app.app, threaded=True)
+print(server.server_port, flush=True)
+server.serve_forever()
+"""
+
+
+def rss_bytes(pid):
+    """
+    Returns the resident set size of a process, None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class LocalServer:
+    """
+    Runs app.py behind Werkzeug's threaded server in a child process, on a free localhost port.
+    """
+
+    def __init__(self, env=None, startup_timeout=120):
+        self.process = subprocess.Popen(
+            [sys.executable, '-c', _SERVER], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, env={**os.environ, 'PYTHONPATH': ROOT, **(env or {})})
+        port = self._read_port(startup_timeout)
+        self.url = f"http://127.0.0.1:{port}"
+        self.pid = self.process.pid
+
+    def _read_port(self, timeout):
+        result = {}
+        reader = threading.Thread(target=lambda: result.update(line=self.process.stdout.readline()), daemon=True)
+        reader.start()
+        reader.join(timeout)
+        if not result.get('line', '').strip().isdigit():
+            self.stop()
+            raise RuntimeError("The app server did not start, are the artifacts trained?")
+        return int(result['line'])
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def build_requests(endpoint, batch_size):
+    """
+    Returns (path, body, content type) tuples built from the rows of stud.csv.
+    """
+    df = pd.read_csv(os.path.join(ROOT, 'notebook', 'data', 'stud.csv'))[FEATURE_COLUMNS]
+    records = df.to_dict('records')
+    if endpoint == 'predict':
+        return [('/predict', urlencode({FORM_FIELDS[name]: str(value) for name, value in record.items()}),
+                 'application/x-www-form-urlencoded') for record in records]
+    return [('/predict/batch', json.dumps([records[(start + i) % len(records)] for i in range(batch_size)]),
+             'application/json') for start in range(0, len(records), batch_size)]
+
+
+def _client(url, requests, offset, deadline, timeout, results):
+    # One keep-alive connection per client, reopened after a connection error
+    parts = urlsplit(url)
+    connection = None
+    index = offset
+    while time.perf_counter() < deadline:
+        path, body, content_type = requests[index % len(requests)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+            connection.request('POST', path, body=body, headers={'Content-Type': content_type})
+            response = connection.getresponse()
+            response.read()
+            outcome = 'ok' if response.status == 200 else f"http_{response.status}"
+        except Exception as e:
+            outcome = type(e).__name__
+            if connection is not None:
+                connection.close()
+            connection = None
+        results.append((start, time.perf_counter() - start, outcome))
+    if connection is not None:
+        connection.close()
+
+
+def run_level(url, requests, concurrency, duration, warmup, timeout, server_pid=None, rows_per_request=1):
+    """
+    Runs `concurrency` clients for `warmup + duration` seconds and summarizes the requests
+    that started after the warm-up.
+    """
+    results = [[] for _ in range(concurrency)]
+    start = time.perf_counter()
+    deadline = start + warmup + duration
+    clients = [
+        threading.Thread(target=_client, daemon=True,
+                         args=(url, requests, i * len(requests) // concurrency, deadline, timeout, results[i]))
+        for i in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+
+    rss = []
+    while any(client.is_alive() for client in clients):
+        if server_pid is not None:
+            rss.append(rss_bytes(server_pid))
+        time.sleep(0.1)
+
+    measured = [(latency, outcome) for client_results in results
+                for (started, latency, outcome) in client_results if started >= start + warmup]
+    latencies = np.array([latency for latency, _ in measured]) if measured else np.zeros(0)
+    ok = np.array([outcome == 'ok' for _, outcome in measured], dtype=bool)
+    errors = {}
+    for _, outcome in measured:
+        if outcome != 'ok':
+            errors[outcome] = errors.get(outcome, 0) + 1
+
+    ok_latencies = latencies[ok]
+    # Cumulative like a Prometheus histogram: requests that took at most each bound
+    counts = np.cumsum(np.bincount(np.searchsorted(DEFAULT_BUCKETS, ok_latencies), minlength=len(DEFAULT_BUCKETS) + 1))
+    rss = [value for value in rss if value is not None]
+    summary = {
+        'concurrency': concurrency,
+        'requests': len(measured),
+        'errors': errors,
+        'error_rate': float(1 - ok.mean()) if len(measured) else 0.0,
+        'throughput_rps': float(ok.sum() / duration),
+        'rows_per_sec': float(ok.sum() * rows_per_request / duration),
+        'latency_histogram': {**{f"le_{bound}": int(count) for bound, count in zip(DEFAULT_BUCKETS, counts)},
+                              'le_inf': int(counts[-1])},
+        'server_rss_peak_bytes': max(rss) if rss else None,
+        'server_rss_end_bytes': rss[-1] if rss else None,
+    }
+    if len(ok_latencies):
+        for name, percentile in (('p50_ms', 50), ('p90_ms', 90), ('p99_ms', 99)):
+            summary[name] = float(np.percentile(ok_latencies, percentile) * 1e3)
+        summary['max_ms'] = float(ok_latencies.max() * 1e3)
+    return summary
+
+
+def flag_saturation(levels, min_gain, max_latency_growth, max_error_rate):
+    """
+    Marks every level with `saturated` (and why), compared with the previous level.
+
+    Returns:
+    - int: The concurrency of the first saturated level, None if none saturated.
+    """
+    first = None
+    for previous, level in zip([None] + levels[:-1], levels):
+        reasons = []
+        if level['error_rate'] > max_error_rate:
+            reasons.append(f"error rate {level['error_rate']:.1%}")
+        if previous is not None and previous.get('p99_ms') and level.get('p99_ms'):
+            gain = level['throughput_rps'] / previous['throughput_rps'] - 1 if previous['throughput_rps'] else 0.0
+            growth = level['p99_ms'] / previous['p99_ms']
+            if gain < min_gain and growth > max_latency_growth:
+                reasons.append(f"throughput {gain:+.0%} while p99 latency x{growth:.1f}")
+        level['saturated'] = bool(reasons)
+        level['saturation_reasons'] = reasons
+        if reasons and first is None:
+            first = level['concurrency']
+    return first
+
+
+def run(args):
+    requests = build_requests(args.endpoint, args.batch_size)
+    server = None
+    if args.url:
+        url, server_pid = args.url.rstrip('/'), args.server_pid
+    else:
+        server = LocalServer(dict(item.split('=', 1) for item in args.server_env))
+        url, server_pid = server.url, server.pid
+    try:
+        idle_rss = rss_bytes(server_pid) if server_pid else None
+        levels = []
+        for concurrency in args.concurrency:
+            level = run_level(url, requests, concurrency, args.duration, args.warmup, args.timeout, server_pid,
+                              args.batch_size if args.endpoint == 'batch' else 1)
+            levels.append(level)
+            print(f"{concurrency:>5} clients: {level['throughput_rps']:8.1f} req/s, "
+                  f"p50 {level.get('p50_ms', float('nan')):8.2f} ms, p99 {level.get('p99_ms', float('nan')):8.2f} ms, "
+                  f"errors {level['error_rate']:6.1%}, server RSS "
+                  f"{(level['server_rss_peak_bytes'] or 0) / 2 ** 20:7.1f} MiB")
+    finally:
+        if server is not None:
+            server.stop()
+
+    saturation = flag_saturation(levels, args.min_gain, args.max_latency_growth, args.max_error_rate)
+    best = max(levels, key=lambda level: level['throughput_rps'])
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'target': args.url or 'werkzeug threaded server (local)',
+        'endpoint': args.endpoint,
+        'batch_size': args.batch_size if args.endpoint == 'batch' else 1,
+        'server_env': args.server_env,
+        'duration_seconds': args.duration,
+        'server_rss_idle_bytes': idle_rss,
+        'levels': levels,
+        'saturation_concurrency': saturation,
+        'peak_throughput': {'concurrency': best['concurrency'], 'throughput_rps': best['throughput_rps']},
+    }
+
+
+def compare(report, baseline):
+    """
+    Prints the relative change of throughput and latency per concurrency level against a previous report.
+    """
+    print(f"\nChange vs {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    if (baseline.get('endpoint'), baseline.get('batch_size')) != (report['endpoint'], report['batch_size']):
+        print(f"  warning: the baseline loaded {baseline.get('endpoint')} with {baseline.get('batch_size')} row(s) "
+              f"per request, this run {report['endpoint']} with {report['batch_size']}")
+    previous_levels = {level['concurrency']: level for level in baseline['levels']}
+    for level in report['levels']:
+        previous = previous_levels.get(level['concurrency'])
+        if previous is None:
+            continue
+        for metric in ('throughput_rps', 'rows_per_sec', 'p50_ms', 'p99_ms', 'server_rss_peak_bytes'):
+            if level.get(metric) is not None and previous.get(metric):
+                change = (level[metric] - previous[metric]) / previous[metric] * 100
+                print(f"  {level['concurrency']:>5} clients {metric:>22}: {previous[metric]:14.2f} -> "
+                      f"{level[metric]:14.2f} ({change:+.1f}%)")
+    print(f"  saturation: {baseline.get('saturation_concurrency')} -> {report['saturation_concurrency']} clients")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 64, 256])
+    parser.add_argument('--duration', type=float, default=10.0, help="Measured seconds per concurrency level.")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Unmeasured seconds before each level.")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout, in seconds.")
+    parser.add_argument('--endpoint', choices=['predict', 'batch'], default='predict')
+    parser.add_argument('--batch-size', type=int, default=100, help="Rows per request with --endpoint batch.")
+    parser.add_argument('--url', help="Load-test a running server instead of starting one.")
+    parser.add_argument('--server-pid', type=int, help="Process of the --url server, to sample its memory.")
+    parser.add_argument('--server-env', action='append', default=[], metavar='NAME=VALUE',
+                        help="Environment of the local server, e.g. MICRO_BATCHING=1 (repeatable).")
+    parser.add_argument('--min-gain', type=float, default=0.1,
+                        help="Throughput gain under which a level with growing latency is saturated.")
+    parser.add_argument('--max-latency-growth', type=float, default=2.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--output', help="Write the report as JSON to this file.")
+    parser.add_argument('--compare', help="Previous JSON report to compare against.")
+    args = parser.parse_args()
+
+    report = run(args)
+    if report['saturation_concurrency'] is not None:
+        level = next(level for level in report['levels'] if level['saturated'])
+        print(f"Saturated at {level['concurrency']} clients: {'; '.join(level['saturation_reasons'])}")
+    print(f"Peak throughput {report['peak_throughput']['throughput_rps']:.1f} req/s "
+          f"at {report['peak_throughput']['concurrency']} clients")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
@@ -0,0 +1,137 @@
+"""
+Compares the artifact serialization formats supported by `save_object` / `load_object`.
+
+For every format the model and preprocessor are saved once, then loaded in a fresh
+subprocess to measure load time and the memory the load adds to the process: RSS and,
+on Linux, anonymous memory. Memory-mapped file pages show up in RSS but not as anonymous
+memory, because they come from the page cache and are shared by every worker process that
+maps the same file. Anonymous memory is what each extra worker pays.
+
+Usage:
+    python benchmarks/serialization_benchmark.py [--output results.json] [--repeats 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.components.data_transformation import DataTransformation  # noqa: E402
+from src.utils import save_object  # noqa: E402
+
+FORMATS = {
+    'dill': dict(serializer='dill', compress=0, mmap_mode=None),
+    'joblib': dict(serializer='joblib', compress=0, mmap_mode=None),
+    'joblib-mmap': dict(serializer='joblib', compress=0, mmap_mode='r'),
+    'joblib-zlib3': dict(serializer='joblib', compress=3, mmap_mode=None),
+}
+
+# Runs in a fresh interpreter, so imports and page faults of earlier loads don't leak in.
+_CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from benchmarks.serialization_benchmark import memory_usage
+import sklearn.ensemble, sklearn.compose  # import cost is not load cost
+from src.utils import load_object
+
+before = memory_usage()
+start = time.perf_counter()
+model = load_object({model!r}, mmap_mode={mmap_mode!r})
+preprocessor = load_object({preprocessor!r}, mmap_mode={mmap_mode!r})
+load_time = time.perf_counter() - start
+after = memory_usage()
+print(json.dumps({{
+    'load_time': load_time,
+    'rss_delta_kb': after['rss_kb'] - before['rss_kb'],
+    'anonymous_delta_kb': after['anonymous_kb'] - before['anonymous_kb'],
+}}))
+"""
+
+
+def memory_usage():
+    """
+    Returns the resident and anonymous (not file-backed) memory of the current process in kB.
+    Both are read from /proc/self/smaps_rollup, elsewhere they fall back to the peak RSS.
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                name, value = line.split(':', 1)
+                if name in ('Rss', 'Anonymous'):
+                    usage[name] = int(value.split()[0])
+        return {'rss_kb': usage['Rss'], 'anonymous_kb': usage['Anonymous']}
+    except (OSError, KeyError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss_kb': rss, 'anonymous_kb': rss}
+
+
+def build_artifacts(n_estimators):
+    """
+    Fits the project preprocessor and a RandomForest on stud.csv, the largest kind of model the trainer picks.
+    """
+    df = pd.read_csv(os.path.join('notebook', 'data', 'stud.csv'))
+    preprocessor = DataTransformation().get_preprocessing_pipeline()
+    X = preprocessor.fit_transform(df.drop(columns=['math_score']))
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42).fit(X, df['math_score'])
+    return model, preprocessor
+
+
+def run(repeats, n_estimators):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    model, preprocessor = build_artifacts(n_estimators)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, options in FORMATS.items():
+            model_path = os.path.join(directory, f"{name}-model.pkl")
+            preprocessor_path = os.path.join(directory, f"{name}-preprocessor.pkl")
+
+            start = time.perf_counter()
+            save_object(model_path, model, serializer=options['serializer'], compress=options['compress'])
+            save_object(preprocessor_path, preprocessor,
+                        serializer=options['serializer'], compress=options['compress'])
+            save_time = time.perf_counter() - start
+
+            code = _CHILD.format(root=root, model=model_path, preprocessor=preprocessor_path,
+                                 mmap_mode=options['mmap_mode'])
+            runs = [
+                json.loads(subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                                          text=True, cwd=root).stdout.strip().splitlines()[-1])
+                for _ in range(repeats)
+            ]
+            results[name] = {
+                'size_bytes': os.path.getsize(model_path) + os.path.getsize(preprocessor_path),
+                'save_time': save_time,
+                'load_time_median': float(np.median([r['load_time'] for r in runs])),
+                'rss_delta_kb': int(np.median([r['rss_delta_kb'] for r in runs])),
+                'anonymous_delta_kb': int(np.median([r['anonymous_delta_kb'] for r in runs])),
+            }
+            print(f"{name:>13}: {results[name]['size_bytes'] / 1e6:8.2f} MB, "
+                  f"load {results[name]['load_time_median'] * 1e3:8.1f} ms, "
+                  f"RSS +{results[name]['rss_delta_kb'] / 1024:7.1f} MB, "
+                  f"anonymous +{results[name]['anonymous_delta_kb'] / 1024:7.1f} MB")
+
+    return {'n_estimators': n_estimators, 'repeats': repeats, 'formats': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--n-estimators', type=int, default=300)
+    args = parser.parse_args()
+
+    report = run(args.repeats, args.n_estimators)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
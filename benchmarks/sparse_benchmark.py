@@ -0,0 +1,100 @@
+"""
+Compares training on dense and CSR features: feature memory, and fit and predict time per candidate model.
+
+The features are the project preprocessor's output on stud.csv, optionally with the rows
+repeated to get closer to a realistic dataset size. Every candidate model of the trainer
+is fitted with its default parameters on both representations.
+
+Usage:
+    python benchmarks/sparse_benchmark.py [--repeat-rows 50] [--repeats 3] [--output results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.ensemble import AdaBoostRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.tree import DecisionTreeRegressor
+from xgboost import XGBRFRegressor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.components.data_transformation import DataTransformation  # noqa: E402
+from src.utils import features_nbytes  # noqa: E402
+
+MODELS = {
+    "Linear Regression": LinearRegression,
+    "Decision Tree": DecisionTreeRegressor,
+    "Random Forest": RandomForestRegressor,
+    "KNN": KNeighborsRegressor,
+    "AdaBoost": AdaBoostRegressor,
+    "Gradient Boosting": GradientBoostingRegressor,
+    "XGBoost": XGBRFRegressor,
+}
+
+
+def build_features(repeat_rows):
+    """
+    Returns the transformed features (dense and CSR) and the target of stud.csv repeated `repeat_rows` times.
+    """
+    df = pd.read_csv(os.path.join('notebook', 'data', 'stud.csv'))
+    df = pd.concat([df] * repeat_rows, ignore_index=True)
+    X = df.drop(columns=['math_score'])
+    preprocessor = DataTransformation().get_preprocessing_pipeline().fit(X)
+    dense = preprocessor.transform(X)
+    dense = dense.toarray() if sparse.issparse(dense) else np.ascontiguousarray(dense)
+    return dense, sparse.csr_matrix(dense), df['math_score'].to_numpy(dtype=np.float64)
+
+
+def _timed(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+def run(repeat_rows, repeats):
+    dense, csr, y = build_features(repeat_rows)
+    report = {
+        'rows': dense.shape[0],
+        'features': dense.shape[1],
+        'density': csr.nnz / (dense.shape[0] * dense.shape[1]),
+        'dense_bytes': features_nbytes(dense),
+        'csr_bytes': features_nbytes(csr),
+        'models': {},
+    }
+    print(f"{report['rows']} rows x {report['features']} features, density {report['density']:.2f}: "
+          f"dense {report['dense_bytes'] / 1e6:.2f} MB, CSR {report['csr_bytes'] / 1e6:.2f} MB "
+          f"({report['csr_bytes'] / report['dense_bytes']:.0%})")
+
+    for name, model_class in MODELS.items():
+        results = {}
+        for representation, X in (('dense', dense), ('csr', csr)):
+            fit_time, model = _timed(lambda: model_class().fit(X, y), repeats)
+            predict_time, _ = _timed(lambda: model.predict(X), repeats)
+            results[representation] = {'fit_time': fit_time, 'predict_time': predict_time}
+        report['models'][name] = results
+        print(f"{name:>18}: fit dense {results['dense']['fit_time'] * 1e3:9.1f} ms, "
+              f"CSR {results['csr']['fit_time'] * 1e3:9.1f} ms | predict dense "
+              f"{results['dense']['predict_time'] * 1e3:8.1f} ms, CSR {results['csr']['predict_time'] * 1e3:8.1f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help="Write the results as JSON to this file.")
+    parser.add_argument('--repeat-rows', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    report = run(args.repeat_rows, args.repeats)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
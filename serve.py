@@ -0,0 +1,222 @@
+"""
+Production launcher for the prediction service.
+
+The parent process imports the app, loads the model/preprocessor and runs a warm-up
+prediction *before* forking, so the N worker processes share the loaded artifacts
+copy-on-write and are ready as soon as they start. The parent then supervises the workers:
+- a worker that dies is replaced,
+- SIGHUP, or a new artifact version on disk (or, when serving from the model registry with
+  SERVING_ROUTES / SHADOW_MODELS, routes resolving to new models), reloads and warms the
+  artifacts in the parent and replaces the workers one at a time (graceful reload, no downtime),
+- SIGTERM / SIGINT stops the workers and exits.
+
+Usage:
+    python serve.py [--host 0.0.0.0] [--port 5000] [--workers N]
+
+`/ready` only returns 200 once the warm-up prediction has succeeded.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass, replace
+
+from werkzeug.serving import make_server
+
+from src.logger import logging
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    """
+    Configuration for the production server.
+    Attributes:
+    - host / port: Address to listen on.
+    - workers: Number of worker processes, each serving requests on multiple threads.
+    - reload_check_interval: Seconds between checks for new artifacts in the parent.
+    - shutdown_grace: Seconds a stopping worker gets to finish its in-flight requests.
+    """
+    host: str = os.environ.get('HOST', '0.0.0.0')
+    port: int = int(os.environ.get('PORT', 5000))
+    workers: int = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1))
+    reload_check_interval: float = 2.0
+    shutdown_grace: float = 5.0
+
+
+def _serve_worker(app, sock, config, cache):
+    """
+    Runs in a forked worker: serves the shared listening socket until SIGTERM.
+    Never returns, so an error can't fall through into the parent's supervisor loop.
+    """
+    exit_code = 1
+    try:
+        # The parent's rolling restart is the only reload path: a worker reloading its own copy would
+        # un-share the copy-on-write pages and serve a different version than its siblings
+        cache.config = replace(cache.config, check_interval=None)
+        server = make_server(config.host, config.port, app, threaded=True, fd=sock.fileno())
+
+        def stop(signum, frame):
+            # shutdown() waits for serve_forever() to return, so it can't run on this thread
+            import threading
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        exit_code = 0
+    except Exception:
+        logging.exception(f"Worker {os.getpid()} failed.")
+    finally:
+        os._exit(exit_code)
+
+
+class PreforkServer:
+    """
+    Supervises a pool of forked worker processes sharing one listening socket.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ServerConfig()
+        self.workers = set()
+        self.reload_requested = False
+        self.stopping = False
+
+        # Importing the app builds the Flask app and the process-wide caches in the parent
+        import app as app_module
+        self.app_module = app_module
+        # Where the served models come from: the model router, or the artifact cache without one
+        router = app_module.predict_pipeline.router
+        self.source = router if router is not None else app_module.predict_pipeline.cache
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        prediction = self.app_module.warm_up()
+        version = self.source.get().version
+        logging.info(f"Warm-up with artifacts {version} took {time.perf_counter() - start:.2f}s "
+                     f"(prediction {prediction:.2f}).")
+        # Keep the warmed-up objects out of the GC's reach, so collections in the workers
+        # don't write to (and un-share) the copy-on-write pages
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        return version
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            _serve_worker(self.app_module.app, self.sock, self.config, self.app_module.predict_pipeline.cache)
+        self.workers.add(pid)
+        return pid
+
+    def _stop_workers(self, pids):
+        # Signal every worker first, so they drain their in-flight requests in parallel
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.config.shutdown_grace
+        pending = set(pids)
+        while pending and time.monotonic() < deadline:
+            for pid in list(pending):
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    pending.discard(pid)
+            time.sleep(0.05)
+        for pid in pending:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.difference_update(pids)
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if not self.stopping:
+                    logging.warning(f"Worker {pid} exited with status {status}, starting a replacement.")
+                    self._spawn()
+
+    def _rolling_restart(self):
+        logging.info("Reloading: replacing workers one at a time.")
+        for pid in list(self.workers):
+            self._spawn()
+            self._stop_workers([pid])
+
+    def run(self):
+        version = self._warm_up()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.config.host, self.config.port))
+        self.sock.listen(1024)
+        self.sock.set_inheritable(True)
+
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, 'reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, 'stopping', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, 'stopping', True))
+
+        for _ in range(self.config.workers):
+            self._spawn()
+        logging.info(f"Serving on {self.config.host}:{self.config.port} with {self.config.workers} workers.")
+
+        next_check = time.monotonic() + self.config.reload_check_interval
+        while not self.stopping:
+            time.sleep(0.2)
+            self._reap()
+
+            changed = False
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.config.reload_check_interval
+                changed = self.source.reload().version != version
+
+            if changed or self.reload_requested:
+                if hasattr(gc, 'unfreeze'):
+                    gc.unfreeze()
+                try:
+                    # A change found by the check is already loaded, SIGHUP forces a reload
+                    if self.reload_requested:
+                        self.reload_requested = False
+                        self.source.reload(force=True)
+                    version = self._warm_up()
+                except Exception as e:
+                    logging.error(f"Reload failed, keeping the current workers: {e}")
+                    continue
+                self._rolling_restart()
+
+        logging.info("Shutting down.")
+        self._stop_workers(list(self.workers))
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the prediction service with pre-forked workers.")
+    parser.add_argument('--host', default=ServerConfig.host)
+    parser.add_argument('--port', type=int, default=ServerConfig.port)
+    parser.add_argument('--workers', type=int, default=ServerConfig.workers)
+    args = parser.parse_args(argv)
+    config = ServerConfig(host=args.host, port=args.port, workers=max(1, args.workers))
+
+    if not hasattr(os, 'fork'):
+        # No fork() (e.g. Windows): fall back to a single multi-threaded process
+        import app as app_module
+        app_module.warm_up()
+        make_server(config.host, config.port, app_module.app, threaded=True).serve_forever()
+        return
+
+    PreforkServer(config).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
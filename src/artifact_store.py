@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from dataclasses import asdict, dataclass, is_dataclass
+
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass(frozen=True)
+class ArtifactStoreConfig:
+    """
+    Configuration for the content-addressed artifact store.
+    Attributes:
+    - root: Directory holding the stored objects and the stage manifests.
+    """
+    root: str = os.path.join('artifacts', 'store')
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """
+    Computes the SHA-256 digest of a file without reading it into memory at once.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def array_digest(array):
+    """
+    Computes the SHA-256 digest of a NumPy array, including its dtype and shape.
+    Sparse matrices are digested through their component arrays.
+    """
+    if hasattr(array, 'tocsr'):
+        csr = array.tocsr()
+        digest = hashlib.sha256(f"csr{csr.shape}".encode())
+        for component in (csr.data, csr.indices, csr.indptr):
+            digest.update(array_digest(component).encode())
+        return digest.hexdigest()
+    digest = hashlib.sha256(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(memoryview(array).cast('B') if array.flags.c_contiguous else array.tobytes())
+    return digest.hexdigest()
+
+
+def _library_versions():
+    versions = {'python': platform.python_version()}
+    for name in ('numpy', 'pandas', 'sklearn', 'xgboost'):
+        module = sys.modules.get(name)
+        if module is not None:
+            versions[name] = getattr(module, '__version__', '')
+    return versions
+
+
+class ArtifactStore:
+    """
+    A content-addressed store that lets pipeline stages skip work whose inputs have not changed.
+
+    Every stage run is keyed by a hash of its input data, its configuration and the source
+    of the code that runs it. Output files are stored once under `objects/<sha256>` and a small
+    manifest under `stages/<key>.json` maps the stage's output names to those objects, so
+    identical outputs of different runs share storage.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ArtifactStoreConfig()
+        self.objects_dir = os.path.join(self.config.root, 'objects')
+        self.stages_dir = os.path.join(self.config.root, 'stages')
+
+    def stage_key(self, stage, input_files=(), input_digests=(), config=None, code_files=()):
+        """
+        Computes the cache key of a stage run.
+
+        Parameters:
+        - stage (str): Name of the stage.
+        - input_files (iterable): Paths of the input data files.
+        - input_digests (iterable): Precomputed digests of in-memory inputs (see `array_digest`).
+        - config: Stage configuration, a dataclass or any JSON-serializable value.
+        - code_files (iterable): Source files whose content defines the code version.
+
+        Returns:
+        - str: Hex digest identifying the stage run.
+        """
+        if is_dataclass(config):
+            config = asdict(config)
+        description = {
+            'stage': stage,
+            'inputs': [file_digest(path) for path in input_files] + list(input_digests),
+            'config': config,
+            'code': [file_digest(path) for path in code_files],
+            'libraries': _library_versions(),
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def _manifest_path(self, key):
+        return os.path.join(self.stages_dir, f"{key}.json")
+
+    def fetch(self, key, outputs):
+        """
+        Restores the outputs of a previous run of the stage, if there was one.
+
+        Parameters:
+        - key (str): Stage key from `stage_key`.
+        - outputs (dict): Output name -> destination path.
+
+        Returns:
+        - bool: True if every output was restored, False if the stage has to run.
+        """
+        try:
+            manifest_path = self._manifest_path(key)
+            if not os.path.exists(manifest_path):
+                return False
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+            if set(outputs) - set(manifest):
+                return False
+            # Every object is checked before anything is written, so a partial hit leaves the outputs alone
+            sources = {name: os.path.join(self.objects_dir, manifest[name]) for name in outputs}
+            if not all(os.path.exists(source) for source in sources.values()):
+                return False
+            for name, destination in outputs.items():
+                if os.path.dirname(destination):
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                self._atomic_copy(sources[name], destination)
+            return True
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def put(self, key, outputs):
+        """
+        Stores the outputs of a stage run under its key.
+
+        Parameters:
+        - key (str): Stage key from `stage_key`.
+        - outputs (dict): Output name -> path of the file produced by the stage.
+        """
+        try:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            os.makedirs(self.stages_dir, exist_ok=True)
+            manifest = {}
+            for name, path in outputs.items():
+                digest = file_digest(path)
+                target = os.path.join(self.objects_dir, digest)
+                if not os.path.exists(target):
+                    self._atomic_copy(path, target)
+                manifest[name] = digest
+
+            # Write the manifest last, so a stage is only ever found with all of its objects
+            fd, tmp_path = tempfile.mkstemp(dir=self.stages_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as file:
+                json.dump(manifest, file, indent=2)
+            os.replace(tmp_path, self._manifest_path(key))
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _atomic_copy(self, source, target):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target) or '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def run_cached_stage(store, stage, key_kwargs, outputs, run):
+    """
+    Runs a stage unless the store already holds its outputs for the same inputs, config and code.
+
+    Parameters:
+    - store (ArtifactStore | None): The store, None to always run the stage.
+    - stage (str): Name of the stage, used for logging and in the key.
+    - key_kwargs (dict): Keyword arguments for `ArtifactStore.stage_key`.
+    - outputs (dict): Output name -> path the stage writes (and the store restores).
+    - run (callable): Runs the stage, writing every file in `outputs`.
+
+    Returns:
+    - bool: True if the stage was skipped and its outputs restored from the store.
+    """
+    if store is None:
+        run()
+        return False
+
+    key = store.stage_key(stage, **key_kwargs)
+    if store.fetch(key, outputs):
+        logging.info(f"{stage}: inputs unchanged, reusing stored artifacts ({key[:12]}).")
+        return True
+
+    run()
+    store.put(key, outputs)
+    logging.info(f"{stage}: artifacts stored ({key[:12]}).")
+    return False
@@ -1,13 +1,17 @@
+import inspect
 import os
 import sys
+import numpy as np
 import pandas as pd
 from src.exception import CustomException
 from src.logger import logging
+from src.metrics import metrics
 from sklearn.model_selection import train_test_split
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 
-from src.components.data_transformation import DataTransformation, DataTransformationConfig
-from src.components.model_trainer import ModelTrainer, ModelTrainerConfig
+from src.artifact_store import run_cached_stage
+from src.data_schema import DatasetSchema, read_dataset, write_dataset
 
 
 @dataclass
@@ -18,10 +22,38 @@ class DataIngestionConfig:
     - train_data_path: Path to save the training dataset.
     - test_data_path: Path to save the test dataset.
     - raw_data_path: Path to save the raw dataset.
+      The three are written in the format of their extension (see `write_dataset`): binary
+      pickles by default, which keep the typed columns, or '.csv'.
+    - source_data_path: Path of the dataset to ingest, read with the dtypes of `schema`.
+    - schema: Column types of the dataset (categoricals as `category`, scores as small integers).
+    - test_size: Fraction of the rows held out for testing.
+    - random_state: Seed of the train-test split.
+    - split: 'random' for a seeded random split, 'hash' to assign every row by a seeded hash of
+      its values, which keeps existing rows on the same side when new rows are added.
+      Chunked ingestion always uses the hash split.
+    - chunksize: Rows read at a time for out-of-core ingestion, None to load the whole file.
+      Chunked ingestion writes the train/test sets as Parquet (paths below) and no raw copy.
     """
-    train_data_path: str = os.path.join('artifacts', 'train.csv')
-    test_data_path: str = os.path.join('artifacts', 'test.csv')
-    raw_data_path: str = os.path.join('artifacts', 'data.csv')
+    train_data_path: str = os.path.join('artifacts', 'train.pkl')
+    test_data_path: str = os.path.join('artifacts', 'test.pkl')
+    raw_data_path: str = os.path.join('artifacts', 'data.pkl')
+    source_data_path: str = os.path.join('notebook', 'data', 'stud.csv')
+    schema: DatasetSchema = field(default_factory=DatasetSchema)
+    test_size: float = 0.2
+    random_state: int = 42
+    split: str = 'random'
+    chunksize: Optional[int] = int(os.environ['INGESTION_CHUNKSIZE']) if os.environ.get('INGESTION_CHUNKSIZE') else None
+    train_parquet_path: str = os.path.join('artifacts', 'train.parquet')
+    test_parquet_path: str = os.path.join('artifacts', 'test.parquet')
+
+    @property
+    def output_paths(self):
+        """
+        Returns the paths written by the configured ingestion mode.
+        """
+        if self.chunksize:
+            return {'train': self.train_parquet_path, 'test': self.test_parquet_path}
+        return {'raw': self.raw_data_path, 'train': self.train_data_path, 'test': self.test_data_path}
 
 
 class DataIngestion:
@@ -30,16 +62,22 @@ class DataIngestion:
     and saving the outputs to predefined locations.
     """
 
-    def __init__(self):
+    def __init__(self, config=None, store=None):
         """
         Initializes the DataIngestion class by setting up configuration paths.
+
+        Parameters:
+        - config (DataIngestionConfig, optional): Paths and split settings, the defaults if omitted.
+        - store (ArtifactStore, optional): Skip the stage when its inputs, config and code are unchanged.
         """
-        self.ingestion_config = DataIngestionConfig()
+        self.ingestion_config = config or DataIngestionConfig()
+        self.store = store
 
+    @metrics.timed('ingestion')
     def initialize_data_ingestion(self):
         """
         Handles the data ingestion process:
-        - Reads raw data from a CSV file.
+        - Reads raw data from a CSV file (in chunks when `chunksize` is set).
         - Splits the data into training and testing datasets.
         - Saves the datasets to predefined paths.
         
@@ -48,42 +86,115 @@ class DataIngestion:
         """
         logging.info('Entered the data ingestion method or component')
         try:
-            # Load dataset
-            df = pd.read_csv('notebook/data/stud.csv')
-            logging.info('Dataset loaded successfully')
-
-            # Create necessary directories
-            os.makedirs(os.path.dirname(self.ingestion_config.train_data_path), exist_ok=True)
-            
-            # Save the raw dataset
-            df.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
-            logging.info('Raw data saved successfully')
-
-            # Train-test split
-            logging.info('Performing train-test split')
-            train_set, test_set = train_test_split(df, test_size=0.2, random_state=42)
-            
-            # Save training and test datasets
-            train_set.to_csv(self.ingestion_config.train_data_path, index=False, header=True)
-            test_set.to_csv(self.ingestion_config.test_data_path, index=False, header=True)
-            logging.info('Train and test data saved successfully')
+            run_cached_stage(
+                self.store,
+                'DataIngestion',
+                dict(
+                    input_files=[self.ingestion_config.source_data_path],
+                    config=self.ingestion_config,
+                    code_files=[__file__, inspect.getsourcefile(DatasetSchema)],
+                ),
+                self.ingestion_config.output_paths,
+                self._ingest_chunked if self.ingestion_config.chunksize else self._ingest,
+            )
 
             # Return paths for downstream use
-            return (
-                self.ingestion_config.train_data_path,
-                self.ingestion_config.test_data_path,
-            )
+            outputs = self.ingestion_config.output_paths
+            return outputs['train'], outputs['test']
         except Exception as e:
             logging.error('Error occurred during data ingestion')
             raise CustomException(e, sys)
 
+    def _ingest(self):
+        """
+        Reads the raw data, splits it and writes the raw, train and test datasets.
+        """
+        # Load dataset with typed columns
+        df = read_dataset(self.ingestion_config.source_data_path, self.ingestion_config.schema)
+        logging.info('Dataset loaded successfully')
+
+        # Save the raw dataset
+        write_dataset(df, self.ingestion_config.raw_data_path)
+        logging.info('Raw data saved successfully')
 
-if __name__ == "__main__":
-    data_inject = DataIngestion()
-    train_data, test_data = data_inject.initialize_data_ingestion()
+        # Train-test split
+        logging.info('Performing train-test split')
+        if self.ingestion_config.split == 'hash':
+            is_test = self._is_test_row(df)
+            train_set, test_set = df[~is_test], df[is_test]
+        else:
+            train_set, test_set = train_test_split(
+                df,
+                test_size=self.ingestion_config.test_size,
+                random_state=self.ingestion_config.random_state,
+            )
 
-    data_transformation = DataTransformation()
-    train_array, test_array, _ =data_transformation.initialize_data_transformation(train_data, test_data)
+        # Save training and test datasets
+        write_dataset(train_set, self.ingestion_config.train_data_path)
+        write_dataset(test_set, self.ingestion_config.test_data_path)
+        logging.info('Train and test data saved successfully')
+
+    def _is_test_row(self, df):
+        """
+        Returns a boolean mask of the rows that belong to the test set under the hash split.
+        """
+        # A column parsed as int in one chunk and float in another must hash the same, and
+        # categorical columns hash like their values
+        numeric = df.select_dtypes('number').columns
+        df = df.astype({name: np.float64 for name in numeric})
+        hash_key = f"{self.ingestion_config.random_state:016d}"[-16:]
+        hashes = pd.util.hash_pandas_object(df, index=False, hash_key=hash_key).to_numpy()
+        return hashes % 10_000 < round(self.ingestion_config.test_size * 10_000)
+
+    def _ingest_chunked(self):
+        """
+        Streams the raw data in chunks and appends every row to the train or test Parquet file.
+
+        Rows are assigned by a seeded hash of their values instead of a random permutation, so
+        the split needs no global view of the data, doesn't depend on the chunk size and always
+        puts duplicate rows on the same side. Every chunk is parsed and written with the column
+        types of `schema` (see `DatasetSchema.arrow_schema`), whatever its own values look like.
+        The files are written to temporary paths and only renamed once every chunk is written.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Chunked ingestion writes Parquet and requires pyarrow: pip install pyarrow") from e
+
+        config = self.ingestion_config
+        os.makedirs(os.path.dirname(config.train_parquet_path), exist_ok=True)
+
+        columns = pd.read_csv(config.source_data_path, nrows=0).columns
+        schema = config.schema.arrow_schema(columns)
+        dtypes = {field.name: np.float64 if field.type == pa.float64() else object for field in schema}
+
+        paths = {'train': config.train_parquet_path, 'test': config.test_parquet_path}
+        tmp_paths = {split: f"{path}.tmp" for split, path in paths.items()}
+        writers = {split: pq.ParquetWriter(path, schema) for split, path in tmp_paths.items()}
+        counts = {'train': 0, 'test': 0}
+        try:
+            for chunk in pd.read_csv(config.source_data_path, chunksize=config.chunksize, dtype=dtypes):
+                is_test = self._is_test_row(chunk)
+                for split, rows in (('train', chunk[~is_test]), ('test', chunk[is_test])):
+                    if len(rows):
+                        writers[split].write_table(pa.Table.from_pandas(rows, schema=schema, preserve_index=False))
+                        counts[split] += len(rows)
+            for writer in writers.values():
+                writer.close()
+            for split, path in paths.items():
+                os.replace(tmp_paths[split], path)
+        finally:
+            for split, writer in writers.items():
+                if os.path.exists(tmp_paths[split]):
+                    writer.close()
+                    os.remove(tmp_paths[split])
+
+        logging.info(f"Chunked ingestion wrote {counts['train']} train and {counts['test']} test rows as Parquet.")
+
+
+if __name__ == "__main__":
+    # The stages run as a DAG with checkpoints and a run summary, see `TrainingPipeline`
+    from src.pipeline.train_pipeline import main
 
-    model_trainer = ModelTrainer()
-    model_trainer.initiate_model_trainer(train_array, test_array)
\ No newline at end of file
+    sys.exit(main())
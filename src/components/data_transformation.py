@@ -1,29 +1,52 @@
 import os
 import sys
+from collections import Counter
 from dataclasses import dataclass
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 
+from src.artifact_store import run_cached_stage
+from src.data_schema import DatasetSchema, frame_nbytes, read_dataset
 from src.exception import CustomException
 from src.logger import logging
-from src.utils import save_object
+from src.metrics import metrics
+from src.utils import features_nbytes, load_features, load_object, metadata_path, save_features, save_object
 
 
 @dataclass(frozen=True)
 class DataTransformationConfig:
     """
-    Configuration for saving the preprocessor object.
+    Configuration for saving the preprocessor object and, when an artifact store is used,
+    the transformed features and targets (see `save_features` for the feature file format).
+    - serializer / compress: Format of the saved preprocessor, see `save_object`.
+    - chunksize: Rows per batch when transforming Parquet input out of core, or when building CSR features.
+    - refit_preprocessor: False to reuse the saved preprocessor when there is one (incremental
+      retraining needs the feature space of the previous run), True to fit it on the training data.
+    - sparse_threshold: Features are kept as a CSR matrix when the fraction of nonzero values
+      is below this (CSR stores 12 bytes per nonzero instead of 8 bytes per value), 0 to always keep them dense.
     """
     preprocessor_obj_file_path: str = os.path.join('artifacts', 'preprocessor.pkl')
+    train_features_file_path: str = os.path.join('artifacts', 'train_features.npy')
+    train_target_file_path: str = os.path.join('artifacts', 'train_target.npy')
+    test_features_file_path: str = os.path.join('artifacts', 'test_features.npy')
+    test_target_file_path: str = os.path.join('artifacts', 'test_target.npy')
+    serializer: str = 'joblib'
+    compress: int = 0
+    chunksize: int = 100_000
+    sparse_threshold: float = 0.5
+    refit_preprocessor: bool = True
 
 
 class DataTransformation:
-    def __init__(self):
-        self.config = DataTransformationConfig()
+    def __init__(self, config=None, store=None):
+        self.config = config or DataTransformationConfig()
+        # Optional ArtifactStore, skips the stage when its inputs, config and code are unchanged
+        self.store = store
 
     def get_preprocessing_pipeline(self):
         """
@@ -60,42 +83,304 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e, sys)
 
+    @metrics.timed('transformation')
     def initialize_data_transformation(self, train_data_path: str, test_data_path: str):
         """
         Transforms training and testing data, saves preprocessing pipeline.
 
+        Features and targets are kept apart. The features are a CSR matrix when they are sparse
+        enough for that to save memory (see `sparse_threshold`), a dense array otherwise.
+
+        Parquet input (from chunked ingestion) is processed out of core: the preprocessor is
+        fitted in streaming passes and the transformed arrays are written to disk chunk by
+        chunk and returned memory-mapped.
+
         Returns:
-            tuple: Transformed train/test data and saved preprocessor path.
+            tuple: Train features and targets, test features and targets, and the saved preprocessor path.
         """
+        chunked = train_data_path.endswith('.parquet')
+        input_files = [train_data_path, test_data_path]
+        if self._reuses_preprocessor():
+            input_files.append(self.config.preprocessor_obj_file_path)
+        if self.store is None and not chunked:
+            return self._transform(train_data_path, test_data_path)
+
         try:
-            # Load datasets
-            train_df = pd.read_csv(train_data_path)
-            test_df = pd.read_csv(test_data_path)
-            logging.info("Training and testing data loaded.")
+            def run():
+                if chunked:
+                    return self._transform_chunked(train_data_path, test_data_path)
+                X_train, y_train, X_test, y_test, _ = self._transform(train_data_path, test_data_path)
+                save_features(self.config.train_features_file_path, X_train)
+                np.save(self.config.train_target_file_path, y_train)
+                save_features(self.config.test_features_file_path, X_test)
+                np.save(self.config.test_target_file_path, y_test)
 
-            target_column = 'math_score'
-            preprocessor = self.get_preprocessing_pipeline()
+            if self.store is None:
+                run()
+                return self._load_arrays(mmap_mode='r')
+
+            run_cached_stage(
+                self.store,
+                'DataTransformation',
+                dict(input_files=input_files, config=self.config, code_files=[__file__]),
+                {
+                    'preprocessor': self.config.preprocessor_obj_file_path,
+                    'preprocessor_metadata': metadata_path(self.config.preprocessor_obj_file_path),
+                    'train_features': self.config.train_features_file_path,
+                    'train_target': self.config.train_target_file_path,
+                    'test_features': self.config.test_features_file_path,
+                    'test_target': self.config.test_target_file_path,
+                },
+                run,
+            )
+            return self._load_arrays(mmap_mode='r' if chunked else None)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _reuses_preprocessor(self):
+        return not self.config.refit_preprocessor and os.path.exists(self.config.preprocessor_obj_file_path)
+
+    def _fitted_preprocessor(self, X_train):
+        """
+        Returns the saved preprocessor when it is reused, otherwise a new one fitted on `X_train`.
+        """
+        if self._reuses_preprocessor():
+            logging.info("Reusing the saved preprocessor.")
+            return load_object(self.config.preprocessor_obj_file_path)
+        return self.get_preprocessing_pipeline().fit(X_train)
+
+    def _load_arrays(self, mmap_mode=None):
+        return (
+            load_features(self.config.train_features_file_path, mmap_mode=mmap_mode),
+            np.load(self.config.train_target_file_path, mmap_mode=mmap_mode),
+            load_features(self.config.test_features_file_path, mmap_mode=mmap_mode),
+            np.load(self.config.test_target_file_path, mmap_mode=mmap_mode),
+            self.config.preprocessor_obj_file_path,
+        )
+
+    def transform_features(self, preprocessor, X):
+        """
+        Transforms `X` with a fitted preprocessor, into a CSR matrix when that saves memory.
+
+        The density is measured on the first `chunksize` rows. For CSR output the rest is
+        transformed chunk by chunk, so the dense version of the full matrix is never built.
+
+        Returns:
+            numpy.ndarray or scipy.sparse.csr_matrix: The transformed features.
+        """
+        from scipy import sparse
+
+        first = preprocessor.transform(X.iloc[:self.config.chunksize])
+        nonzero = first.nnz if sparse.issparse(first) else np.count_nonzero(first)
+        density = nonzero / max(first.shape[0] * first.shape[1], 1)
+        if density >= self.config.sparse_threshold:
+            features = preprocessor.transform(X) if len(X) > self.config.chunksize else first
+            return features.toarray() if sparse.issparse(features) else features
+
+        blocks = [sparse.csr_matrix(first)]
+        for start in range(self.config.chunksize, len(X), self.config.chunksize):
+            blocks.append(sparse.csr_matrix(preprocessor.transform(X.iloc[start:start + self.config.chunksize])))
+        return sparse.vstack(blocks, format='csr')
+
+    def _transform(self, train_data_path: str, test_data_path: str):
+        try:
+            # Load datasets with typed columns (categoricals as codes, scores as small integers)
+            schema = DatasetSchema()
+            train_df = read_dataset(train_data_path, schema)
+            test_df = read_dataset(test_data_path, schema)
+            logging.info(f"Training and testing data loaded "
+                         f"({(frame_nbytes(train_df) + frame_nbytes(test_df)) / 1024:.1f} KiB).")
+
+            target_column = schema.target_column
 
             # Separate features and targets
             X_train = train_df.drop(columns=[target_column])
-            y_train = train_df[target_column]
+            y_train = train_df[target_column].to_numpy(dtype=np.float64)
             X_test = test_df.drop(columns=[target_column])
-            y_test = test_df[target_column]
+            y_test = test_df[target_column].to_numpy(dtype=np.float64)
 
             # Preprocess data
-            X_train_transformed = preprocessor.fit_transform(X_train)
-            X_test_transformed = preprocessor.transform(X_test)
+            reused = self._reuses_preprocessor()
+            preprocessor = self._fitted_preprocessor(X_train)
+            X_train_transformed = self.transform_features(preprocessor, X_train)
+            X_test_transformed = self.transform_features(preprocessor, X_test)
+
+            dense_nbytes = X_train_transformed.shape[0] * X_train_transformed.shape[1] * 8
+            logging.info(f"Data transformation completed successfully. Train features: "
+                         f"{'CSR' if hasattr(X_train_transformed, 'indptr') else 'dense'}, "
+                         f"{features_nbytes(X_train_transformed) / 1024:.1f} KiB (dense: {dense_nbytes / 1024:.1f} KiB).")
+
+            # Save the preprocessor object (a reused one is already saved)
+            if not reused:
+                save_object(
+                    self.config.preprocessor_obj_file_path,
+                    preprocessor,
+                    serializer=self.config.serializer,
+                    compress=self.config.compress,
+                )
+                logging.info("Preprocessing object saved.")
+
+            return X_train_transformed, y_train, X_test_transformed, y_test, self.config.preprocessor_obj_file_path
+
+        except Exception as e:
+            raise CustomException(e, sys)
 
-            # Combine features and target
-            train_data = np.c_[X_train_transformed, y_train.values]
-            test_data = np.c_[X_test_transformed, y_test.values]
-            logging.info("Data transformation completed successfully.")
+    def _iter_chunks(self, parquet_path, columns=None):
+        """
+        Yields a Parquet file as DataFrames of at most `chunksize` rows, categorical columns as object.
+        """
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=self.config.chunksize, columns=columns):
+            chunk = batch.to_pandas()
+            for name, dtype in chunk.dtypes.items():
+                if isinstance(dtype, pd.CategoricalDtype):
+                    chunk[name] = chunk[name].astype(object)
+            yield chunk
+
+    def fit_preprocessor_chunked(self, train_data_path, feature_columns):
+        """
+        Fits the preprocessing pipeline over a Parquet file without loading it into memory.
+
+        - Pass 1 counts the values of every column: this gives the exact medians and most
+          frequent categories (the same ties rule as SimpleImputer) and the category vocabularies.
+        - The pipeline is then fitted on a small frame holding every category once, and the
+          imputers get the exact statistics from pass 1.
+        - Pass 2 runs the imputed/encoded chunks through `StandardScaler.partial_fit`
+          (running mean and variance) and swaps the fitted scalers into the pipelines.
+
+        Memory grows with the number of distinct values per column, not with the number of rows.
+
+        Returns:
+            ColumnTransformer: The fitted preprocessor, equivalent to `fit` on the whole file.
+        """
+        preprocessor = self.get_preprocessing_pipeline()
+        transformers = {name: columns for name, _, columns in preprocessor.transformers}
+        numeric_features = transformers['numeric_pipeline']
+        categorical_features = transformers['categorical_pipeline']
+
+        # Pass 1: value histograms
+        counts = {name: Counter() for name in feature_columns}
+        for chunk in self._iter_chunks(train_data_path, feature_columns):
+            for name in feature_columns:
+                counts[name].update(chunk[name].value_counts(dropna=True).to_dict())
+
+        medians = [_histogram_median(counts[name]) for name in numeric_features]
+        modes = [_histogram_mode(counts[name]) for name in categorical_features]
+        vocabulary = {name: sorted(counts[name]) for name in categorical_features}
+
+        # Fit the pipeline structure on one row per category, then set the exact imputer statistics
+        n_rows = max(len(values) for values in vocabulary.values())
+        frame = {}
+        for name in feature_columns:
+            if name in vocabulary:
+                frame[name] = [vocabulary[name][i % len(vocabulary[name])] for i in range(n_rows)]
+            elif name in numeric_features:
+                frame[name] = [medians[numeric_features.index(name)]] * n_rows
+            else:
+                frame[name] = [np.nan] * n_rows
+        frame = pd.DataFrame(frame)
+        preprocessor.fit(frame)
+        numeric_pipeline = preprocessor.named_transformers_['numeric_pipeline']
+        categorical_pipeline = preprocessor.named_transformers_['categorical_pipeline']
+        numeric_pipeline.named_steps['imputer'].statistics_ = np.array(medians, dtype=np.float64)
+        categorical_pipeline.named_steps['imputer'].statistics_ = np.array(modes, dtype=object)
+
+        # Pass 2: running mean/variance of the scalers' inputs
+        scalers = {
+            'numeric_pipeline': clone(numeric_pipeline.named_steps['scaler']),
+            'categorical_pipeline': clone(categorical_pipeline.named_steps['scaler']),
+        }
+        for chunk in self._iter_chunks(train_data_path, feature_columns):
+            for name, pipeline in (('numeric_pipeline', numeric_pipeline), ('categorical_pipeline', categorical_pipeline)):
+                scalers[name].partial_fit(pipeline[:-1].transform(chunk[transformers[name]]))
+        for name, pipeline in (('numeric_pipeline', numeric_pipeline), ('categorical_pipeline', categorical_pipeline)):
+            pipeline.steps[-1] = ('scaler', scalers[name])
+
+        return preprocessor
 
-            # Save the preprocessor object
-            save_object(self.config.preprocessor_obj_file_path, preprocessor)
-            logging.info("Preprocessing object saved.")
+    def _transform_chunked(self, train_data_path: str, test_data_path: str):
+        """
+        Out-of-core version of `_transform` for Parquet input: fits the preprocessor in streaming
+        passes and writes the transformed features and the targets to memory-mapped .npy files.
+        """
+        import pyarrow.parquet as pq
+
+        try:
+            target_column = 'math_score'
+            columns = pq.ParquetFile(train_data_path).schema_arrow.names
+            feature_columns = [name for name in columns if name != target_column]
+
+            reused = self._reuses_preprocessor()
+            if reused:
+                preprocessor = load_object(self.config.preprocessor_obj_file_path)
+            else:
+                preprocessor = self.fit_preprocessor_chunked(train_data_path, feature_columns)
+                logging.info("Preprocessor fitted out of core.")
 
-            return train_data, test_data, self.config.preprocessor_obj_file_path
+            for source, features_path, target_path in (
+                    (train_data_path, self.config.train_features_file_path, self.config.train_target_file_path),
+                    (test_data_path, self.config.test_features_file_path, self.config.test_target_file_path)):
+                n_rows = pq.ParquetFile(source).metadata.num_rows
+                os.makedirs(os.path.dirname(features_path), exist_ok=True)
+                features = None
+                target = np.lib.format.open_memmap(target_path, mode='w+', dtype=np.float64, shape=(n_rows,))
+                start = 0
+                for chunk in self._iter_chunks(source):
+                    transformed = preprocessor.transform(chunk[feature_columns])
+                    if hasattr(transformed, 'toarray'):
+                        transformed = transformed.toarray()
+                    if features is None:
+                        features = np.lib.format.open_memmap(
+                            features_path, mode='w+', dtype=np.float64, shape=(n_rows, transformed.shape[1]))
+                    features[start:start + len(chunk)] = transformed
+                    target[start:start + len(chunk)] = chunk[target_column].to_numpy()
+                    start += len(chunk)
+                features.flush()
+                target.flush()
+                del features, target
+            logging.info("Data transformation completed out of core.")
+
+            if not reused:
+                save_object(
+                    self.config.preprocessor_obj_file_path,
+                    preprocessor,
+                    serializer=self.config.serializer,
+                    compress=self.config.compress,
+                )
+                logging.info("Preprocessing object saved.")
 
         except Exception as e:
             raise CustomException(e, sys)
+
+
+def _histogram_median(counts):
+    """
+    Returns the median of the values counted in `counts` (the mean of the two middle values for an even count).
+    """
+    values = sorted(counts)
+    total = sum(counts.values())
+    if not total:
+        return np.nan
+    middle = [(total - 1) // 2, total // 2]
+    result = []
+    seen = 0
+    for value in values:
+        seen += counts[value]
+        while middle and middle[0] < seen:
+            result.append(value)
+            middle.pop(0)
+        if not middle:
+            break
+    return float(np.mean(result))
+
+
+def _histogram_mode(counts):
+    """
+    Returns the most frequent value in `counts`, the smallest one on ties (as SimpleImputer does).
+    """
+    if not counts:
+        return np.nan
+    most = max(counts.values())
+    return min(value for value, count in counts.items() if count == most)
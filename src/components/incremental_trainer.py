@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.linear_model import LinearRegression
+
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass(frozen=True)
+class IncrementalTrainingConfig:
+    """
+    Configuration for updating the previous best model with new training rows.
+    Attributes:
+    - state_file_path: Best model name, hyperparameters and baseline score of the last full search.
+    - rows_file_path: Hashes of the training rows the saved model has seen.
+    - normal_equations_file_path: X'X and X'y of those rows, for exact linear model updates.
+    - max_r2_drop: Largest drop of the test R^2 below the baseline before a full search is run.
+    - max_new_fraction: Above this fraction of new training rows, a full search is run instead.
+    - replay_ratio: Old rows replayed per new row when adding trees or boosting rounds.
+    - block_size: Rows processed at a time when hashing rows and summing normal equations.
+    - random_state: Seed of the replay sample.
+    """
+    state_file_path: str = os.path.join('artifacts', 'training_state.json')
+    rows_file_path: str = os.path.join('artifacts', 'training_rows.npy')
+    normal_equations_file_path: str = os.path.join('artifacts', 'normal_equations.npz')
+    max_r2_drop: float = 0.02
+    max_new_fraction: float = 0.5
+    replay_ratio: float = 1.0
+    block_size: int = 100_000
+    random_state: int = 42
+
+
+def _blocks(X, y, block_size):
+    for start in range(0, X.shape[0], block_size):
+        yield X[start:start + block_size], y[start:start + block_size]
+
+
+def _dense(X):
+    return X.toarray() if sparse.issparse(X) else np.asarray(X)
+
+
+def _stack(*arrays):
+    return sparse.vstack(arrays, format='csr') if sparse.issparse(arrays[0]) else np.concatenate(arrays)
+
+
+def _is_boosted(model):
+    # XGBRF* models are a single round of `n_estimators` parallel trees: another round would be
+    # fitted to the forest's residuals at learning rate 1 instead of averaged with it
+    if not type(model).__module__.startswith('xgboost'):
+        return False
+    from xgboost import XGBRFClassifier, XGBRFRegressor
+    return not isinstance(model, (XGBRFClassifier, XGBRFRegressor))
+
+
+class IncrementalTrainer:
+    """
+    Updates the previous best model with the training rows it has not seen yet.
+
+    New rows are found by hashing every (features, target) row and comparing with the hashes
+    saved by the previous run, so the ingestion must keep existing rows in the training set
+    (the 'hash' split) and the preprocessor must be reused. How a model is updated depends on
+    what it supports, cheapest first:
+    - LinearRegression: the normal equations X'X, X'y are updated with the new rows and solved,
+      which gives the same fit as retraining on all rows, in time proportional to the new rows.
+    - `partial_fit`: one pass over the new rows.
+    - XGBoost boosters: extra boosting rounds on the new rows plus a replay sample of old rows.
+    - `warm_start` ensembles (GradientBoosting, RandomForest): extra stages/trees on the new rows
+      plus a replay sample, the number of extra estimators proportional to the share of new rows.
+      For a random forest this is an approximation of a refit: the extra trees are bootstrapped
+      from the new rows and the replay sample rather than from all rows, so they over-represent
+      the new rows, and the existing trees never see them. The test R^2 check (`max_r2_drop`)
+      falls back to a full search when the approximation costs too much.
+    - anything else, including XGBoost random forests (XGBRF): refitted on all rows with the
+      previous best hyperparameters (no search).
+    """
+
+    def __init__(self, config=None):
+        self.config = config or IncrementalTrainingConfig()
+
+    def state_files(self):
+        return {
+            'training_state': self.config.state_file_path,
+            'training_rows': self.config.rows_file_path,
+            'normal_equations': self.config.normal_equations_file_path,
+        }
+
+    def row_hashes(self, X, y):
+        """
+        Returns a uint64 hash of every (features, target) row.
+        """
+        hashes = []
+        for X_block, y_block in _blocks(X, y, self.config.block_size):
+            block = pd.DataFrame(np.column_stack([_dense(X_block), np.asarray(y_block)]))
+            hashes.append(pd.util.hash_pandas_object(block, index=False).to_numpy())
+        return np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+
+    def normal_equations(self, X, y):
+        """
+        Returns X'X and X'y, with a column of ones appended to X for the intercept.
+        """
+        n_columns = X.shape[1] + 1
+        xtx = np.zeros((n_columns, n_columns))
+        xty = np.zeros(n_columns)
+        for X_block, y_block in _blocks(X, y, self.config.block_size):
+            X_block = np.column_stack([_dense(X_block), np.ones(X_block.shape[0])])
+            xtx += X_block.T @ X_block
+            xty += X_block.T @ np.asarray(y_block, dtype=np.float64)
+        return xtx, xty
+
+    def save_state(self, model_name, best_params, baseline_score, X_train, y_train,
+                   row_hashes=None, normal_equations=None):
+        """
+        Records what the next incremental run starts from.
+
+        Parameters:
+        - model_name (str): Name of the saved best model.
+        - best_params: Its hyperparameters, as reported by the search.
+        - baseline_score (float): Test R^2 of the last full search, the reference for `max_r2_drop`.
+        - row_hashes / normal_equations: Precomputed values for `X_train`, `y_train`, computed if omitted.
+        """
+        try:
+            if row_hashes is None:
+                row_hashes = self.row_hashes(X_train, y_train)
+            xtx, xty = normal_equations if normal_equations is not None else self.normal_equations(X_train, y_train)
+
+            os.makedirs(os.path.dirname(self.config.state_file_path), exist_ok=True)
+            np.save(self.config.rows_file_path, np.sort(row_hashes))
+            with open(self.config.normal_equations_file_path, 'wb') as file:
+                np.savez(file, xtx=xtx, xty=xty)
+            with open(self.config.state_file_path, 'w') as file:
+                json.dump({
+                    'model_name': model_name,
+                    'best_params': best_params,
+                    'baseline_score': baseline_score,
+                    'n_rows': int(len(row_hashes)),
+                }, file, indent=2, default=str)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def load_state(self):
+        """
+        Returns the state saved by the previous run, or None if there is none.
+        """
+        if not all(os.path.exists(path) for path in self.state_files().values()):
+            return None
+        with open(self.config.state_file_path) as file:
+            state = json.load(file)
+        state['row_hashes'] = np.load(self.config.rows_file_path)
+        with np.load(self.config.normal_equations_file_path) as equations:
+            state['normal_equations'] = (equations['xtx'], equations['xty'])
+        return state
+
+    def update(self, model, state, X_train, y_train):
+        """
+        Updates `model` with the rows of `X_train` missing from the previous run.
+
+        Returns:
+        - tuple: The updated model (None when a full search is needed instead), how it was
+          updated, the row hashes and the normal equations of the whole training set.
+        """
+        try:
+            hashes = self.row_hashes(X_train, y_train)
+            is_new = ~np.isin(hashes, state['row_hashes'])
+            n_new = int(is_new.sum())
+            n_removed = len(state['row_hashes']) - (len(hashes) - n_new)
+            logging.info(f"Incremental training: {n_new} new rows, {len(hashes) - n_new} seen before.")
+
+            if n_removed > 0:
+                logging.info(f"{n_removed} previous training rows are gone, the data was not only appended to.")
+                return None, 'full search', hashes, None
+            if n_new / max(len(hashes), 1) > self.config.max_new_fraction:
+                logging.info("Too many new rows for an incremental update.")
+                return None, 'full search', hashes, None
+
+            X_new, y_new = X_train[is_new], y_train[is_new]
+            xtx, xty = state['normal_equations']
+            new_xtx, new_xty = self.normal_equations(X_new, y_new)
+            normal_equations = (xtx + new_xtx, xty + new_xty)
+            if n_new == 0:
+                return model, 'unchanged', hashes, normal_equations
+
+            if isinstance(model, LinearRegression) and model.fit_intercept and np.ndim(model.coef_) == 1:
+                coefficients = np.linalg.lstsq(normal_equations[0], normal_equations[1], rcond=None)[0]
+                model.coef_, model.intercept_ = coefficients[:-1], float(coefficients[-1])
+                return model, 'normal equations', hashes, normal_equations
+
+            if hasattr(model, 'partial_fit'):
+                model.partial_fit(X_new, y_new)
+                return model, 'partial_fit', hashes, normal_equations
+
+            # Trees and boosting rounds learn from the new rows plus a sample of the old ones
+            old = np.flatnonzero(~is_new)
+            rng = np.random.default_rng(self.config.random_state)
+            replay = np.sort(rng.choice(old, size=min(len(old), math.ceil(n_new * self.config.replay_ratio)),
+                                        replace=False))
+            X_update = _stack(X_new, X_train[replay])
+            y_update = np.concatenate([y_new, y_train[replay]])
+            share = n_new / len(hashes)
+
+            if _is_boosted(model):
+                extra_rounds = max(1, math.ceil((model.get_params()['n_estimators'] or 100) * share))
+                booster = model.get_booster()
+                model = clone(model).set_params(n_estimators=extra_rounds)
+                model.fit(X_update, y_update, xgb_model=booster)
+                return model, 'extra boosting rounds', hashes, normal_equations
+
+            params = model.get_params()
+            if 'warm_start' in params and 'n_estimators' in params:
+                # An approximation for random forests, see the class docstring
+                extra = max(1, math.ceil(len(model.estimators_) * share))
+                model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra)
+                model.fit(X_update, y_update)
+                model.set_params(warm_start=False)
+                return model, 'warm start', hashes, normal_equations
+
+            model = clone(model).fit(X_train, y_train)
+            return model, 'refit with the previous hyperparameters', hashes, normal_equations
+
+        except Exception as e:
+            raise CustomException(e, sys)
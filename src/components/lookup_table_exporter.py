@@ -0,0 +1,166 @@
+import itertools
+import json
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.artifact_store import array_digest
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import metrics
+from src.pipeline.artifact_cache import artifacts_version
+from src.pipeline.lookup_table import LookupTable
+from src.pipeline.predict_pipeline import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+from src.utils import load_object
+
+
+@dataclass(frozen=True)
+class LookupTableConfig:
+    """
+    Configuration for exporting the dense prediction lookup table.
+    Attributes:
+    - model_path / preprocessor_path: Artifacts to tabulate.
+    - table_file_path: Where to write the table (.npy, memory-mappable).
+    - metadata_file_path: Where to write the axes, score range and artifacts version.
+    - validation_data_path: Dataset whose rows are checked against the real model.
+    - score_min / score_max: Range of the reading and writing scores.
+    - batch_size: Number of grid rows evaluated per model call.
+    - tolerance: Largest absolute difference from the real model accepted during validation.
+    """
+    model_path: str = os.path.join('artifacts', 'model.pkl')
+    preprocessor_path: str = os.path.join('artifacts', 'preprocessor.pkl')
+    table_file_path: str = os.path.join('artifacts', 'prediction_table.npy')
+    metadata_file_path: str = os.path.join('artifacts', 'prediction_table.json')
+    validation_data_path: str = os.path.join('notebook', 'data', 'stud.csv')
+    score_min: int = 0
+    score_max: int = 100
+    batch_size: int = 200_000
+    tolerance: float = 1e-3
+
+
+class LookupTableExporter:
+    """
+    Evaluates the trained model over every combination of its discrete inputs and stores the
+    results as a float32 array, so serving can replace the model call with an array index.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or LookupTableConfig()
+
+    @metrics.timed('lookup_table_export')
+    def export(self):
+        """
+        Builds, saves and validates the lookup table.
+
+        Returns:
+        - float: Largest absolute difference between the table and the model on the validation data.
+        """
+        try:
+            model = load_object(self.config.model_path)
+            preprocessor = load_object(self.config.preprocessor_path)
+
+            # Table axes follow the encoder's category order, then every integer score
+            encoder = preprocessor.named_transformers_['categorical_pipeline'].named_steps['encoder']
+            categories = dict(zip(CATEGORICAL_FEATURES, (list(values) for values in encoder.categories_)))
+            scores = np.arange(self.config.score_min, self.config.score_max + 1)
+            shape = [len(categories[name]) for name in CATEGORICAL_FEATURES] + [len(scores)] * len(NUMERIC_FEATURES)
+            logging.info(f"Tabulating the model over {int(np.prod(shape))} inputs, shape {shape}.")
+
+            # Servers keep the published table mmapped, so it is built in a temporary file and
+            # swapped in with os.replace instead of being rewritten in place
+            table_dir = os.path.dirname(self.config.table_file_path)
+            os.makedirs(table_dir, exist_ok=True)
+            descriptor, tmp_table_path = tempfile.mkstemp(dir=table_dir, suffix='.tmp')
+            os.close(descriptor)
+            try:
+                table_sha256 = self._tabulate(model, preprocessor, categories, scores, shape, tmp_table_path)
+                os.replace(tmp_table_path, self.config.table_file_path)
+            finally:
+                if os.path.exists(tmp_table_path):
+                    os.remove(tmp_table_path)
+
+            # The metadata is published last and carries the table's checksum, so a reader never
+            # pairs it with another table
+            metadata = {
+                'artifacts_version': artifacts_version(self.config.model_path, self.config.preprocessor_path),
+                'categorical_features': CATEGORICAL_FEATURES,
+                'numeric_features': NUMERIC_FEATURES,
+                'categories': categories,
+                'score_min': self.config.score_min,
+                'score_max': self.config.score_max,
+                'dtype': 'float32',
+                'table_sha256': table_sha256,
+            }
+            metadata_dir = os.path.dirname(self.config.metadata_file_path)
+            os.makedirs(metadata_dir, exist_ok=True)
+            descriptor, tmp_metadata_path = tempfile.mkstemp(dir=metadata_dir, suffix='.tmp')
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump(metadata, file, indent=2)
+            os.replace(tmp_metadata_path, self.config.metadata_file_path)
+            logging.info(f"Lookup table saved to {self.config.table_file_path}.")
+
+            return self.validate(model, preprocessor)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _tabulate(self, model, preprocessor, categories, scores, shape, table_path):
+        """
+        Writes the model's predictions over the whole input grid to a new .npy file at `table_path`.
+
+        Returns:
+        - str: `array_digest` of the written table.
+        """
+        table = np.lib.format.open_memmap(table_path, mode='w+', dtype=np.float32, shape=tuple(shape))
+        flat_table = table.reshape(-1)
+
+        # One categorical combination covers a contiguous block of len(scores)^2 table cells
+        score_grid = np.array(list(itertools.product(scores, repeat=len(NUMERIC_FEATURES))))
+        block = len(score_grid)
+        combinations = list(itertools.product(*(categories[name] for name in CATEGORICAL_FEATURES)))
+        per_batch = max(1, self.config.batch_size // block)
+
+        for start in range(0, len(combinations), per_batch):
+            chunk = combinations[start:start + per_batch]
+            batch = pd.DataFrame(
+                np.repeat(np.array(chunk, dtype=object), block, axis=0), columns=CATEGORICAL_FEATURES)
+            for position, name in enumerate(NUMERIC_FEATURES):
+                batch[name] = np.tile(score_grid[:, position], len(chunk))
+            predictions = model.predict(preprocessor.transform(batch))
+            flat_table[start * block:(start + len(chunk)) * block] = predictions
+
+        table.flush()
+        table_sha256 = array_digest(table)
+        del table, flat_table
+        return table_sha256
+
+    def validate(self, model, preprocessor):
+        """
+        Compares the saved table with the real model on the validation dataset.
+
+        Raises:
+        - ValueError: If a row differs by more than the configured tolerance or is missing from the table.
+        """
+        df = pd.read_csv(self.config.validation_data_path)
+        lookup_table = LookupTable(self.config.table_file_path, self.config.metadata_file_path)
+
+        expected = model.predict(preprocessor.transform(df[CATEGORICAL_FEATURES + NUMERIC_FEATURES]))
+        tabulated = np.array([
+            lookup_table.lookup(record) for record in df[CATEGORICAL_FEATURES + NUMERIC_FEATURES].to_dict('records')
+        ], dtype=float)
+
+        if np.isnan(tabulated).any():
+            raise ValueError(f"{int(np.isnan(tabulated).sum())} validation rows are not covered by the lookup table.")
+        max_error = float(np.abs(tabulated - expected).max())
+        logging.info(f"Lookup table validated on {len(df)} rows, max abs error {max_error:.2e}.")
+        if max_error > self.config.tolerance:
+            raise ValueError(f"Lookup table differs from the model by {max_error} (tolerance {self.config.tolerance}).")
+        return max_error
+
+
+if __name__ == "__main__":
+    LookupTableExporter().export()
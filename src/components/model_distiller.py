@@ -0,0 +1,159 @@
+import json
+import os
+import pickle
+import sys
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+from sklearn.tree import DecisionTreeRegressor
+
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import metrics
+from src.utils import load_object, metadata_path, save_object
+
+
+@dataclass(frozen=True)
+class ModelDistillationConfig:
+    """
+    Configuration for distilling the trained model into a compact surrogate.
+    Attributes:
+    - teacher_model_path: The model selected by `ModelTrainer`.
+    - surrogate_file_path: Where the surrogate is published, served with SERVE_MODEL=surrogate.
+    - report_file_path: Accuracy, latency and size of the teacher and of every surrogate candidate.
+    - r2_tolerance: Largest drop of the test R^2 below the teacher's for a surrogate to be published.
+    - min_speedup: Smallest single-row latency speedup over the teacher worth publishing a surrogate for.
+    - tree_depths: Depths of the shallow tree candidates.
+    - latency_rows: Number of test rows timed one at a time.
+    - random_state: Seed of the tree candidates.
+    """
+    teacher_model_path: str = os.path.join('artifacts', 'model.pkl')
+    surrogate_file_path: str = os.path.join('artifacts', 'surrogate_model.pkl')
+    report_file_path: str = os.path.join('artifacts', 'distillation_report.json')
+    r2_tolerance: float = 0.01
+    min_speedup: float = 1.5
+    tree_depths: Tuple[int, ...] = (4, 6, 8, 10)
+    latency_rows: int = 200
+    random_state: int = 42
+
+
+def _dense(X):
+    return X.toarray() if sparse.issparse(X) else np.asarray(X)
+
+
+class ModelDistiller:
+    """
+    Fits compact surrogates (a linear model on the one-hot features and shallow trees) to the
+    predictions of the trained model, and publishes the fastest one whose test R^2 stays within
+    `r2_tolerance` of the trained model's.
+
+    The surrogates learn the trained model's predictions rather than the raw target, so they
+    copy its smoothing of the noise instead of refitting it. Latency is measured the way the
+    single-row serving path calls the model: one dense row at a time.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ModelDistillationConfig()
+
+    def candidates(self):
+        candidates = {"Linear Regression": LinearRegression()}
+        for depth in self.config.tree_depths:
+            candidates[f"Decision Tree (depth {depth})"] = DecisionTreeRegressor(
+                max_depth=depth, random_state=self.config.random_state)
+        return candidates
+
+    def profile(self, model, X_test, y_test, teacher_predictions=None):
+        """
+        Measures the accuracy, latency and size of a fitted model.
+
+        Returns:
+        - dict: Test R^2, R^2 against the teacher's predictions (fidelity), median single-row
+          latency (microseconds), whole test set latency (milliseconds) and pickled size (bytes).
+        """
+        predictions = model.predict(X_test)
+        rows = _dense(X_test[:self.config.latency_rows])
+        timings = []
+        for row in rows:
+            row = row.reshape(1, -1)
+            start = time.perf_counter()
+            model.predict(row)
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        model.predict(X_test)
+        batch_time = time.perf_counter() - start
+
+        return {
+            'test_r2': float(r2_score(y_test, predictions)),
+            'fidelity_r2': None if teacher_predictions is None else float(r2_score(teacher_predictions, predictions)),
+            'single_row_latency_us': float(np.median(timings) * 1e6),
+            'batch_latency_ms': batch_time * 1e3,
+            'size_bytes': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        }
+
+    @metrics.timed('model_distillation')
+    def distill(self, X_train, y_train, X_test, y_test):
+        """
+        Distils the trained model, writes the report and publishes the selected surrogate.
+
+        A previously published surrogate is removed when no candidate qualifies, so a stale
+        surrogate of an older model is never served: SERVE_MODEL=surrogate then falls back to the
+        trained model (see `ArtifactCacheConfig.fallback_model_path`).
+
+        Returns:
+        - dict: The report, with the name of the published surrogate under 'published' (None if none).
+        """
+        try:
+            teacher = load_object(self.config.teacher_model_path)
+            teacher_train = teacher.predict(X_train)
+            teacher_test = teacher.predict(X_test)
+            report = {
+                'teacher': {'model': type(teacher).__name__, **self.profile(teacher, X_test, y_test)},
+                'r2_tolerance': self.config.r2_tolerance,
+                'min_speedup': self.config.min_speedup,
+                'candidates': {},
+                'published': None,
+            }
+            teacher_r2 = report['teacher']['test_r2']
+            teacher_latency = report['teacher']['single_row_latency_us']
+
+            for name, model in self.candidates().items():
+                model.fit(X_train, teacher_train)
+                result = self.profile(model, X_test, y_test, teacher_test)
+                result['speedup'] = teacher_latency / result['single_row_latency_us']
+                result['qualifies'] = (teacher_r2 - result['test_r2'] <= self.config.r2_tolerance
+                                       and result['speedup'] >= self.config.min_speedup)
+                report['candidates'][name] = result
+                logging.info(f"Surrogate {name}: test R^2 {result['test_r2']:.4f} (teacher {teacher_r2:.4f}), "
+                             f"fidelity {result['fidelity_r2']:.4f}, {result['single_row_latency_us']:.0f} us/row "
+                             f"({result['speedup']:.1f}x), {result['size_bytes']} bytes.")
+
+                if result['qualifies'] and (
+                        report['published'] is None
+                        or result['single_row_latency_us']
+                        < report['candidates'][report['published']]['single_row_latency_us']):
+                    report['published'] = name
+                    surrogate = model
+
+            if report['published'] is not None:
+                save_object(self.config.surrogate_file_path, surrogate, serializer='joblib')
+                logging.info(f"Published surrogate {report['published']} to {self.config.surrogate_file_path}.")
+            else:
+                for path in (self.config.surrogate_file_path, metadata_path(self.config.surrogate_file_path)):
+                    if os.path.exists(path):
+                        os.remove(path)
+                logging.info(f"No surrogate within {self.config.r2_tolerance} R^2 of the teacher and "
+                             f"{self.config.min_speedup}x faster, removed {self.config.surrogate_file_path}: "
+                             f"SERVE_MODEL=surrogate serves the trained model instead.")
+
+            os.makedirs(os.path.dirname(self.config.report_file_path), exist_ok=True)
+            with open(self.config.report_file_path, 'w') as file:
+                json.dump(report, file, indent=2)
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
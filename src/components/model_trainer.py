@@ -1,6 +1,8 @@
+import inspect
 import os
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
 
 from sklearn.ensemble import (
     AdaBoostRegressor,
@@ -13,125 +15,319 @@ from sklearn.neighbors import KNeighborsRegressor
 from sklearn.tree import DecisionTreeRegressor
 from xgboost import XGBRFRegressor
 
+from src.artifact_store import array_digest, run_cached_stage
+from src.components.incremental_trainer import IncrementalTrainer, IncrementalTrainingConfig
 from src.exception import CustomException
+from src.fold_cache import FoldCache, FoldCacheConfig
 from src.logger import logging
-from src.utils import save_object, evaluate_model
+from src.metrics import metrics
+from src.model_registry import ModelRegistry, ModelRegistryConfig
+from src.utils import load_object, metadata_path, save_object, evaluate_model
 
 
 @dataclass(frozen=True)
 class ModelTrainerConfig:
     """
-    Configuration for saving the model object.
+    Configuration for saving the model object and for the model search.
+    - n_jobs: CPU cores shared by all candidate searches, -1 for all of them.
+    - search_strategy: 'random' (random search) or 'halving' (successive halving).
+    - time_budget: Seconds after which the whole search stops, keeping the best setting of every
+      running search so far and skipping the searches not started yet, None for no limit.
+    - serializer / compress: Format of the saved model, see `save_object`.
+    - dense_models: Candidates trained on dense features even when the features are CSR.
+      Trees and KNN accept CSR but are several times slower on it (see benchmarks/sparse_benchmark.py).
+      XGBoost reads the entries absent from a CSR matrix as missing values rather than zeros, so it
+      must be trained on the dense rows it is served (see `check_sparse_consistency`).
+    - cv_folds: Number of CV folds, computed once and shared by every candidate search.
+    - fold_cache_dir: Directory caching CV fold scores and refitted estimators across runs, None to disable.
+    - incremental: Update the previous best model with the new training rows instead of searching
+      from scratch, falling back to a full search when needed (see `IncrementalTrainer`).
+    - incremental_config: Where the incremental training state is kept and when to fall back.
+    - registry_dir: Model registry every trained candidate is registered in with its metrics
+      and timings, a new version per run (see `ModelRegistry`), None to only save the best model.
+    - preprocessor_file_path: Preprocessor the models are trained with, registered along with them.
     """
     model_obj_file_path: str = os.path.join('artifacts', 'model.pkl')
+    n_jobs: int = -1
+    search_strategy: str = 'random'
+    time_budget: Optional[float] = None
+    serializer: str = 'joblib'
+    compress: int = 0
+    dense_models: Tuple[str, ...] = ('Decision Tree', 'Random Forest', 'KNN', 'XGBoost')
+    cv_folds: int = 3
+    fold_cache_dir: Optional[str] = os.path.join('artifacts', 'fold_cache')
+    incremental: bool = False
+    incremental_config: IncrementalTrainingConfig = field(default_factory=IncrementalTrainingConfig)
+    registry_dir: Optional[str] = os.path.join('artifacts', 'registry')
+    preprocessor_file_path: str = os.path.join('artifacts', 'preprocessor.pkl')
 
 
 class ModelTrainer:
-    def __init__(self):
+    def __init__(self, config=None, store=None):
         # Initialize configuration for saving the model object
-        self.model_trainer_config = ModelTrainerConfig()
+        self.model_trainer_config = config or ModelTrainerConfig()
+        # Optional ArtifactStore, skips training when data, config, grids and code are unchanged
+        self.store = store
+        self.incremental = IncrementalTrainer(self.model_trainer_config.incremental_config)
 
-    def initiate_model_trainer(self, train_array, test_array):
+    def candidate_models(self):
+        """
+        Returns the untrained candidate models keyed by name.
+        """
+        # Define models to train
+        return {
+            "Linear Regression": LinearRegression(),
+            "Decision Tree": DecisionTreeRegressor(),
+            "Random Forest": RandomForestRegressor(),
+            "KNN": KNeighborsRegressor(),
+            "AdaBoost": AdaBoostRegressor(),
+            "Gradient Boosting": GradientBoostingRegressor(),
+            "XGBoost": XGBRFRegressor(),
+        }
+
+    def param_grids(self):
+        """
+        Returns the hyperparameter grid of each candidate model, keyed by name.
+        """
+        return {
+            "Decision Tree": {
+                'criterion': ['squared_error', 'friedman_mse', 'absolute_error', 'poisson'],
+                'splitter': ['best', 'random'],  # Controls how splits are chosen
+                'max_features': ['sqrt', 'log2'],  # Limits features per split
+            },
+            "Random Forest": {
+                'criterion': ['squared_error', 'friedman_mse', 'absolute_error', 'poisson'],
+                'max_features': ['sqrt', 'log2', None],  # Feature selection strategies
+                'n_estimators': [50, 100, 200, 300],  # Number of trees in the forest
+            },
+            "Gradient Boosting": {
+                'loss': ['squared_error', 'huber', 'absolute_error', 'quantile'],  # Loss function selection
+                'learning_rate': [0.1, 0.05, 0.01, 0.001],  # Step size
+                'subsample': [0.6, 0.75, 0.85, 0.95],  # Fraction of samples per boosting round
+                'criterion': ['squared_error', 'friedman_mse'],
+                'max_features': ['sqrt', 'log2', None],  # Feature selection strategies
+                'n_estimators': [50, 100, 200, 300],  # Number of boosting stages
+            },
+            "Linear Regression": {},  # No hyperparameters to tune
+            "XGBoost": {
+                # XGBRFRegressor fits a single random forest, so a learning rate below 1 only shrinks it
+                'colsample_bynode': [0.6, 0.8, 1.0],  # Features sampled per split
+                'n_estimators': [50, 100, 200, 300],  # Number of trees
+                'max_depth': [3, 5, 7],  # Tree depth for controlling complexity
+            },
+            "AdaBoost": {
+                'learning_rate': [0.1, 0.05, 0.01, 0.001],  # Step size shrinkage
+                'loss': ['linear', 'square', 'exponential'],  # Error weighting strategy
+                'n_estimators': [50, 100, 200, 300],  # Number of weak learners
+            }
+        }
+
+    @metrics.timed('model_training')
+    def initiate_model_trainer(self, X_train, y_train, X_test, y_test):
         """
         Trains multiple models, evaluates them, and saves the best-performing model.
         
-        :param train_array: Array containing training features and target variable.
-        :param test_array: Array containing testing features and target variable.
+        :param X_train: Training features, a dense array or a CSR matrix.
+        :param y_train: Training target variable.
+        :param X_test: Testing features, a dense array or a CSR matrix.
+        :param y_test: Testing target variable.
         """
         try:
-            logging.info("Splitting training and test input data.")
-            X_train, y_train, X_test, y_test = (
-                train_array[:, :-1],
-                train_array[:, -1],
-                test_array[:, :-1],
-                test_array[:, -1],
-            )
+            models = self.candidate_models()
+            params = self.param_grids()
 
-            # Define models to train
-            models = {
-                "Linear Regression": LinearRegression(),
-                "Decision Tree": DecisionTreeRegressor(),
-                "Random Forest": RandomForestRegressor(),
-                "KNN": KNeighborsRegressor(),
-                "AdaBoost": AdaBoostRegressor(),
-                "Gradient Boosting": GradientBoostingRegressor(),
-                "XGBoost": XGBRFRegressor(),
-            }
+            def train():
+                if self.model_trainer_config.incremental:
+                    self._train_incrementally(X_train, y_train, X_test, y_test, models, params)
+                else:
+                    self._train_and_save(X_train, y_train, X_test, y_test, models, params)
 
-            params = {
-                "Decision Tree": {
-                    'criterion': ['squared_error', 'friedman_mse', 'absolute_error', 'poisson'],
-                    'splitter': ['best', 'random'],  # Controls how splits are chosen
-                    'max_features': ['sqrt', 'log2'],  # Limits features per split
-                },
-                "Random Forest": {
-                    'criterion': ['squared_error', 'friedman_mse', 'absolute_error', 'poisson'],
-                    'max_features': ['sqrt', 'log2', None],  # Feature selection strategies
-                    'n_estimators': [50, 100, 200, 300],  # Number of trees in the forest
-                },
-                "Gradient Boosting": {
-                    'loss': ['squared_error', 'huber', 'absolute_error', 'quantile'],  # Loss function selection
-                    'learning_rate': [0.1, 0.05, 0.01, 0.001],  # Step size
-                    'subsample': [0.6, 0.75, 0.85, 0.95],  # Fraction of samples per boosting round
-                    'criterion': ['squared_error', 'friedman_mse'],
-                    'max_features': ['auto', 'sqrt', 'log2'],  # Feature selection strategies
-                    'n_estimators': [50, 100, 200, 300],  # Number of boosting stages
-                },
-                "Linear Regression": {},  # No hyperparameters to tune
-                "XGBRegressor": {
-                    'learning_rate': [0.1, 0.05, 0.01, 0.001],  # Learning rate for boosting
-                    'n_estimators': [50, 100, 200, 300],  # Number of trees
-                    'max_depth': [3, 5, 7],  # Tree depth for controlling complexity
+            if self.store is None:
+                train()
+                return
+
+            # An incremental run also depends on the model and state of the previous run
+            previous_run = [self.model_trainer_config.model_obj_file_path, *self.incremental.state_files().values()]
+            restored = run_cached_stage(
+                self.store,
+                'ModelTrainer',
+                dict(
+                    input_files=[path for path in previous_run if os.path.exists(path)]
+                    if self.model_trainer_config.incremental else [],
+                    input_digests=[array_digest(array) for array in (X_train, y_train, X_test, y_test)],
+                    config={
+                        'trainer': self.model_trainer_config,
+                        'models': {name: repr(model) for name, model in models.items()},
+                        'params': params,
+                    },
+                    code_files=[__file__, inspect.getsourcefile(evaluate_model),
+                                inspect.getsourcefile(IncrementalTrainer), inspect.getsourcefile(FoldCache),
+                                inspect.getsourcefile(ModelRegistry)],
+                ),
+                {
+                    'model': self.model_trainer_config.model_obj_file_path,
+                    'model_metadata': metadata_path(self.model_trainer_config.model_obj_file_path),
+                    **self.incremental.state_files(),
                 },
-                "AdaBoost Regressor": {
-                    'learning_rate': [0.1, 0.05, 0.01, 0.001],  # Step size shrinkage
-                    'loss': ['linear', 'square', 'exponential'],  # Error weighting strategy
-                    'n_estimators': [50, 100, 200, 300],  # Number of weak learners
-                }
+                train,
+            )
+            if restored:
+                self._register_restored(X_test, y_test)
+
+        except Exception as e:
+            logging.error(f"Error occurred during model training initiation: {e}")
+            raise CustomException(e, sys)
+
+    def _train_and_save(self, X_train, y_train, X_test, y_test, models, params):
+        """
+        Evaluates the candidate models and saves the best-performing one.
+        """
+        logging.info("Evaluating models using training and test data...")
+        model_report = evaluate_model(
+            X_train, y_train, X_test, y_test, models, params,
+            n_jobs=self.model_trainer_config.n_jobs,
+            search_strategy=self.model_trainer_config.search_strategy,
+            time_budget=self.model_trainer_config.time_budget,
+            dense_models=self.model_trainer_config.dense_models,
+            cv_folds=self.model_trainer_config.cv_folds,
+            fold_cache=self.fold_cache(),
+        )
+        logging.info(f"Model evaluation completed. Report: {model_report}")
+        self.select_and_save(models, model_report, X_train, y_train)
+
+    def fold_cache(self):
+        """
+        Returns the configured fold cache, or None when it is disabled.
+        """
+        if not self.model_trainer_config.fold_cache_dir:
+            return None
+        return FoldCache(FoldCacheConfig(root=self.model_trainer_config.fold_cache_dir))
+
+    def registry(self):
+        """
+        Returns the configured model registry, or None when it is disabled.
+        """
+        if not self.model_trainer_config.registry_dir:
+            return None
+        return ModelRegistry(ModelRegistryConfig(root=self.model_trainer_config.registry_dir))
+
+    def _register_restored(self, X_test, y_test):
+        """
+        Registers the best model restored from the artifact store, unless the latest registered
+        version already holds it (the registry may have been cleared, or the store shared).
+        """
+        registry = self.registry()
+        if registry is None:
+            return
+        config = self.model_trainer_config
+        model = load_object(config.model_obj_file_path)
+        state = self.incremental.load_state()
+        name = state['model_name'] if state is not None else type(model).__name__
+        X_test = X_test.toarray() if hasattr(X_test, 'toarray') and name in config.dense_models else X_test
+        report = {'test_score': r2_score(y_test, model.predict(X_test)),
+                  'best_params': state['best_params'] if state is not None else None}
+        # The saved file is registered as is: saving a reloaded model again may not give the same bytes
+        registry.register({name: config.model_obj_file_path}, {name: report}, config.preprocessor_file_path,
+                          best_model=name, source='restored')
+
+    def select_and_save(self, models, model_report, X_train, y_train):
+        """
+        Saves the fitted candidate with the best test R^2, and the state the next incremental run starts from.
+        Every fitted candidate is registered in the model registry, if enabled.
+
+        Parameters:
+        - models (dict): Fitted best estimator of each candidate, keyed by name.
+        - model_report (dict): Report entry of each candidate, with 'test_score' and 'best_params'
+          for the ones that trained successfully.
+
+        Returns:
+        - tuple: The best model name and its test score.
+        """
+        # Find and log the best-performing model
+        try:
+            logging.info("Finding the best model from the report.")
+
+            # Extract valid test scores
+            valid_scores = {
+                model_name: score['test_score']
+                for model_name, score in model_report.items()
+                if isinstance(score, dict) and 'test_score' in score
             }
 
-            
+            # Ensure there are valid scores to evaluate
+            if not valid_scores:
+                logging.warning("No valid scores found. Cannot select the best model.")
+                raise ValueError("No valid model scores to evaluate.")
 
+            # Get the best model score and name
+            best_model_score = max(valid_scores.values())
+            best_model_name = max(valid_scores, key=valid_scores.get)
 
+            logging.info(f"Best model: {best_model_name} with a score of {best_model_score:.4f}")
 
-            logging.info("Evaluating models using training and test data...")
-            model_report = evaluate_model(X_train, y_train, X_test, y_test, models, params)
-            logging.info(f"Model evaluation completed. Report: {model_report}")
+            # Save the best-performing model
+            logging.info("Saving the best model...")
+            save_object(
+                self.model_trainer_config.model_obj_file_path,
+                models[best_model_name],
+                serializer=self.model_trainer_config.serializer,
+                compress=self.model_trainer_config.compress,
+            )
+            logging.info(f"Best model saved to {self.model_trainer_config.model_obj_file_path}")
 
-            # Find and log the best-performing model
-            try:
-                logging.info("Finding the best model from the report.")
+            registry = self.registry()
+            if registry is not None:
+                registry.register(models, model_report, self.model_trainer_config.preprocessor_file_path,
+                                  best_model=best_model_name)
 
-                # Extract valid test scores
-                valid_scores = {
-                    model_name: score['test_score']
-                    for model_name, score in model_report.items()
-                    if isinstance(score, dict) and 'test_score' in score
-                }
+            # Starting point of the next incremental run
+            self.incremental.save_state(
+                best_model_name, model_report[best_model_name]['best_params'], best_model_score, X_train, y_train)
 
-                # Ensure there are valid scores to evaluate
-                if not valid_scores:
-                    logging.warning("No valid scores found. Cannot select the best model.")
-                    raise ValueError("No valid model scores to evaluate.")
+            return best_model_name, best_model_score
 
-                # Get the best model score and name
-                best_model_score = max(valid_scores.values())
-                best_model_name = max(valid_scores, key=valid_scores.get)
+        except Exception as e:
+            logging.error(f"Error during best model selection: {e}")
+            raise CustomException(e, sys)
 
-                logging.info(f"Best model: {best_model_name} with a score of {best_model_score:.4f}")
+    def _train_incrementally(self, X_train, y_train, X_test, y_test, models, params):
+        """
+        Updates the previous best model with the new training rows and saves it, or runs a full
+        search when there is no previous run, the data changed too much or the test R^2 dropped.
+        """
+        config = self.model_trainer_config
+        state = self.incremental.load_state()
+        if state is None or not os.path.exists(config.model_obj_file_path):
+            logging.info("No previous training run, running a full search.")
+            return self._train_and_save(X_train, y_train, X_test, y_test, models, params)
 
-                # Save the best-performing model
-                logging.info("Saving the best model...")
-                save_object(
-                    self.model_trainer_config.model_obj_file_path,
-                    models[best_model_name],
-                )
-                logging.info(f"Best model saved to {self.model_trainer_config.model_obj_file_path}")
+        try:
+            model = load_object(config.model_obj_file_path)
+            if hasattr(X_train, 'toarray') and state['model_name'] in config.dense_models:
+                X_train, X_test = X_train.toarray(), X_test.toarray()
+
+            model, method, row_hashes, normal_equations = self.incremental.update(model, state, X_train, y_train)
+            if model is None:
+                return self._train_and_save(X_train, y_train, X_test, y_test, models, params)
+
+            test_score = r2_score(y_test, model.predict(X_test))
+            logging.info(f"{state['model_name']} updated by {method}: test R^2 {test_score:.4f} "
+                         f"(baseline {state['baseline_score']:.4f}).")
+            if state['baseline_score'] - test_score > config.incremental_config.max_r2_drop:
+                logging.info("Test R^2 dropped too much, running a full search.")
+                return self._train_and_save(X_train, y_train, X_test, y_test, models, params)
 
-            except Exception as e:
-                logging.error(f"Error during best model selection: {e}")
-                raise CustomException(e, sys)
+            save_object(config.model_obj_file_path, model, serializer=config.serializer, compress=config.compress)
+            self.incremental.save_state(state['model_name'], state['best_params'], state['baseline_score'],
+                                        X_train, y_train, row_hashes, normal_equations)
+            logging.info(f"Updated model saved to {config.model_obj_file_path}")
+
+            registry = self.registry()
+            if registry is not None:
+                registry.register({state['model_name']: model},
+                                  {state['model_name']: {'test_score': test_score, 'best_params': state['best_params']}},
+                                  config.preprocessor_file_path, best_model=state['model_name'], source='incremental')
 
         except Exception as e:
-            logging.error(f"Error occurred during model training initiation: {e}")
+            logging.error(f"Error during incremental training: {e}")
             raise CustomException(e, sys)
@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.profiling import profiler
+
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    """
+    Column types of the student dataset.
+    Attributes:
+    - categorical_columns: Loaded as pandas `category` (one small integer code per row instead of a string object).
+    - score_columns: Integer scores, loaded as the smallest integer type that holds them (int8 for 0-100).
+      A score column with missing or fractional values is kept as float64.
+    - target_column: The score the model predicts.
+    """
+    categorical_columns: Tuple[str, ...] = (
+        'gender', 'race_ethnicity', 'parental_level_of_education', 'lunch', 'test_preparation_course',
+    )
+    score_columns: Tuple[str, ...] = ('math_score', 'reading_score', 'writing_score')
+    target_column: str = 'math_score'
+
+    def csv_dtypes(self):
+        """
+        Returns the dtypes passed to `pd.read_csv`, so categoricals are parsed straight into codes.
+        """
+        return {name: 'category' for name in self.categorical_columns}
+
+    def apply(self, df):
+        """
+        Returns `df` with the schema's dtypes. Columns already of the right type are not copied.
+        """
+        columns = {}
+        for name in self.categorical_columns:
+            if name in df.columns and not isinstance(df[name].dtype, pd.CategoricalDtype):
+                columns[name] = df[name].astype('category')
+        for name in self.score_columns:
+            if name not in df.columns or (
+                    pd.api.types.is_integer_dtype(df[name].dtype) and df[name].dtype.itemsize <= 2):
+                continue
+            values = df[name]
+            if values.notna().all() and np.array_equal(values, np.round(values)):
+                columns[name] = pd.to_numeric(values, downcast='integer')
+            elif values.dtype != np.float64:
+                columns[name] = values.astype(np.float64)
+        return df.assign(**columns) if columns else df
+
+    def arrow_schema(self, columns):
+        """
+        Returns the Arrow schema of the Parquet files written by chunked ingestion, for the given
+        columns in file order: categoricals as dictionary-encoded strings, scores as float64 (a
+        chunk may hold missing or fractional values) and any other column as strings.
+        Requires pyarrow.
+        """
+        import pyarrow as pa
+
+        return pa.schema([
+            (name, pa.dictionary(pa.int32(), pa.string()) if name in self.categorical_columns
+             else pa.float64() if name in self.score_columns else pa.string())
+            for name in columns
+        ])
+
+
+def write_dataset(df, file_path):
+    """
+    Writes a dataset between pipeline stages, in the format given by the file extension.
+
+    - '.pkl': pandas pickle, binary and keeps the dtypes (categoricals as codes), no extra dependency.
+    - '.csv': text, the dtypes are parsed again on read.
+
+    Parquet files are written by chunked ingestion and processed out of core instead.
+    """
+    try:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        extension = os.path.splitext(file_path)[1]
+        if extension == '.pkl':
+            # The row labels are dropped, as in the CSV format
+            df.reset_index(drop=True).to_pickle(file_path, protocol=5)
+        elif extension == '.csv':
+            df.to_csv(file_path, index=False, header=True)
+        else:
+            raise ValueError(f"Unknown dataset format {extension!r}, expected .pkl or .csv.")
+        profiler.record_io('write', file_path, time.perf_counter() - start, df)
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def read_dataset(file_path, schema=None):
+    """
+    Reads a dataset written by `write_dataset` (or a source CSV) with the schema's dtypes.
+
+    Parameters:
+    - file_path (str): A .pkl or .csv file.
+    - schema (DatasetSchema, optional): Column types, the student dataset's by default.
+
+    Returns:
+    - pd.DataFrame: The typed dataset.
+    """
+    try:
+        schema = schema or DatasetSchema()
+        start = time.perf_counter()
+        extension = os.path.splitext(file_path)[1]
+        if extension == '.pkl':
+            df = pd.read_pickle(file_path)
+        elif extension == '.csv':
+            df = pd.read_csv(file_path, dtype=schema.csv_dtypes())
+        else:
+            raise ValueError(f"Unknown dataset format {extension!r}, expected .pkl or .csv.")
+        df = schema.apply(df)
+        seconds = time.perf_counter() - start
+        profiler.record_io('read', file_path, seconds, df)
+        logging.info(f"Read {len(df)} rows from {file_path} in {seconds * 1e3:.1f} ms "
+                     f"({frame_nbytes(df) / 1024:.1f} KiB in memory).")
+        return df
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def frame_nbytes(df):
+    """
+    Returns the memory used by a DataFrame, including the strings of object columns.
+    """
+    return int(df.memory_usage(deep=True, index=False).sum())
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
+
+import joblib
+
+from src.artifact_store import _library_versions
+from src.exception import CustomException
+
+
+@dataclass(frozen=True)
+class FoldCacheConfig:
+    """
+    Configuration for the on-disk cache of model search results.
+    Attributes:
+    - root: Directory holding the fold scores (`scores/`) and refitted estimators (`models/`).
+    """
+    root: str = os.path.join('artifacts', 'fold_cache')
+
+
+def estimator_key(estimator, data_digest, extra=None):
+    """
+    Computes the cache key of an estimator configuration trained on some data.
+
+    Parameters:
+    - estimator: The unfitted estimator, with the candidate's hyperparameters set.
+    - data_digest (str): Digest of the training data and the CV folds.
+    - extra: Any other JSON-serializable value that changes the result (e.g. the fold index).
+
+    Returns:
+    - str: Hex digest of the estimator class, all its parameters, the data and the library versions.
+    """
+    description = {
+        'estimator': f"{type(estimator).__module__}.{type(estimator).__qualname__}",
+        'params': estimator.get_params(deep=True),
+        'data': data_digest,
+        'extra': extra,
+        'libraries': _library_versions(),
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+class FoldCache:
+    """
+    Caches the CV score of every (estimator configuration, data, fold) and the estimators refitted
+    on the full training data, so re-runs and overlapping grids never refit a configuration
+    they have already evaluated.
+
+    Estimators without a fixed `random_state` are cached too: a cached result is one of the
+    results a new fit could have given.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or FoldCacheConfig()
+        self.scores_dir = os.path.join(self.config.root, 'scores')
+        self.models_dir = os.path.join(self.config.root, 'models')
+
+    def get_score(self, key):
+        """
+        Returns the cached fold result for `key` (a dict with 'score' and 'fit_time'), or None on a miss.
+        """
+        try:
+            with open(os.path.join(self.scores_dir, f"{key}.json")) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def put_score(self, key, score, fit_time):
+        """
+        Caches a fold result, None as the score of a failed fit.
+        """
+        self._write(self.scores_dir, f"{key}.json",
+                    lambda file: file.write(json.dumps({'score': score, 'fit_time': fit_time}).encode()))
+
+    def get_model(self, key):
+        """
+        Returns the cached refitted estimator for `key`, or None on a miss.
+        """
+        path = os.path.join(self.models_dir, f"{key}.joblib")
+        if not os.path.exists(path):
+            return None
+        try:
+            return joblib.load(path)
+        except Exception:
+            return None
+
+    def put_model(self, key, estimator):
+        self._write(self.models_dir, f"{key}.joblib", lambda file: joblib.dump(estimator, file))
+
+    @staticmethod
+    def _write(directory, name, write):
+        # Written under a temporary name and renamed, so concurrent workers never read a partial file
+        try:
+            os.makedirs(directory, exist_ok=True)
+            descriptor, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as file:
+                write(file)
+            os.replace(tmp_path, os.path.join(directory, name))
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -8,15 +8,29 @@ LOG_FILE_NAME = f"{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}.log"
 # Create logs directory path
 LOGS_DIR = os.path.join(os.getcwd(), 'logs')
 
-# Ensure the logs directory exists
-os.makedirs(LOGS_DIR, exist_ok=True)
-
 # Full path to the log file
 LOG_FILE_PATH = os.path.join(LOGS_DIR, LOG_FILE_NAME)
 
+
+class _LazyFileHandler(logging.FileHandler):
+    """
+    A file handler that creates the logs directory and the log file on the first record,
+    so importing the logger has no filesystem side effects (processes that never log
+    leave no empty log files behind).
+    """
+
+    def __init__(self, filename):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
 # Configure logging
+file_handler = _LazyFileHandler(LOG_FILE_PATH)
 logging.basicConfig(
-    filename=LOG_FILE_PATH,
+    handlers=[file_handler],
     format='[%(asctime)s] %(lineno)d %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO,
 )
@@ -25,4 +39,3 @@ logging.basicConfig(
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s'))
 logging.getLogger().addHandler(console_handler)
-
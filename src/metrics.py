@@ -0,0 +1,164 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+
+# Upper bounds (seconds) of the duration histogram buckets, from sub-millisecond inference to full training runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                   60.0, 300.0)
+
+METRIC_NAME = 'ml_stage_duration_seconds'
+
+
+class _Timer(ContextDecorator):
+    """
+    Times a block or a function call and records the duration in the registry.
+    """
+
+    __slots__ = ('registry', 'stage', 'labels', 'start')
+
+    def __init__(self, registry, stage, labels):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+        self.start = None
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own timer, so concurrent calls don't share a start time
+        return _Timer(self.registry, self.stage, self.labels)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer(ContextDecorator):
+    """
+    Used when metrics are disabled, so an instrumented block costs one no-op call.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Collects duration histograms for pipeline stages, labelled by stage (and e.g. model).
+
+    Exposed as Prometheus text format for the serving side (`render_prometheus`) and as a
+    JSON-serializable summary for training runs (`report`). When disabled, `timed` returns a
+    shared no-op so instrumentation can stay in place in production.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def timed(self, stage, **labels):
+        """
+        Returns a context manager / decorator that records how long the block or call takes.
+
+        Parameters:
+        - stage (str): Name of the stage, e.g. 'ingestion' or 'predict'.
+        - labels: Extra labels, e.g. model='Random Forest'.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, labels)
+
+    def observe(self, stage, seconds, **labels):
+        """
+        Records one duration (in seconds) for a stage.
+        """
+        if not self.enabled:
+            return
+        key = (stage, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                                              'max': 0.0}
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+            series['count'] += 1
+            series['sum'] += seconds
+            series['max'] = max(series['max'], seconds)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            return {key: dict(series, counts=list(series['counts'])) for key, series in self._series.items()}
+
+    def render_prometheus(self):
+        """
+        Returns all recorded durations as a Prometheus histogram in text exposition format.
+        """
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of training and serving pipeline stages.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for (stage, labels), series in sorted(self._snapshot().items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in (('stage', stage),) + labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                lines.append(f'{METRIC_NAME}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{{label_text},le="+Inf"}} {series["count"]}')
+            lines.append(f'{METRIC_NAME}_sum{{{label_text}}} {series["sum"]}')
+            lines.append(f'{METRIC_NAME}_count{{{label_text}}} {series["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        """
+        Returns the recorded durations as a list of dicts (stage, labels, count, total/mean/max seconds).
+        """
+        return [
+            {
+                'stage': stage,
+                'labels': dict(labels),
+                'count': series['count'],
+                'total_seconds': series['sum'],
+                'mean_seconds': series['sum'] / series['count'],
+                'max_seconds': series['max'],
+            }
+            for (stage, labels), series in sorted(self._snapshot().items())
+        ]
+
+    def write_report(self, file_path):
+        """
+        Writes `report()` as JSON to `file_path`.
+        """
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide registry, disable with METRICS_ENABLED=0
+metrics = MetricsRegistry(enabled=os.environ.get('METRICS_ENABLED', '1') != '0')
@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+
+from src.artifact_store import file_digest
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import load_object, metadata_path, save_object
+
+# Report fields of `evaluate_model` kept with every registered model
+REPORT_FIELDS = ('test_score', 'train_score', 'best_params', 'fit_time', 'predict_time', 'cache_hits', 'truncated')
+
+
+@dataclass(frozen=True)
+class ModelRegistryConfig:
+    """
+    Configuration for the local model registry.
+    Attributes:
+    - root: Directory holding the model objects (`objects/`) and one manifest per version (`versions/`).
+    """
+    root: str = os.path.join('artifacts', 'registry')
+
+
+class ModelRegistry:
+    """
+    A versioned registry of every trained candidate model, with its metrics and timings.
+
+    Each training run registers a new version: a manifest `versions/<n>.json` listing every
+    candidate that trained successfully (its report entry and the digest of its model file),
+    the best one and the preprocessor they were trained with. A run whose models are already in
+    the latest version, byte for byte with the same preprocessor and best model, is not
+    registered again. Model and preprocessor files are
+    stored once under `objects/<sha256>.joblib`, uncompressed so serving can memory-map them,
+    and shared by every version they appear in.
+
+    Models are referenced as '<version>:<name>', e.g. '3:Random Forest'. The version can be
+    'latest' and the name can be left out for the best model of the version.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ModelRegistryConfig()
+        self.objects_dir = os.path.join(self.config.root, 'objects')
+        self.versions_dir = os.path.join(self.config.root, 'versions')
+
+    def register(self, models, model_report, preprocessor_path, best_model=None, source='search'):
+        """
+        Registers the fitted candidates of a training run as a new version.
+
+        Parameters:
+        - models (dict): Fitted estimator of each candidate, or the path of its saved file (see
+          `save_object`), keyed by name.
+        - model_report (dict): Report entry of each candidate (see `evaluate_model`); candidates
+          without a 'test_score' (failed or skipped) are not registered.
+        - preprocessor_path (str): The preprocessor the models were trained with.
+        - best_model (str, optional): Name of the model selected for serving.
+        - source (str): How the models were trained, 'search' or 'incremental', or 'restored' from the
+          artifact store.
+
+        Returns:
+        - int: The new version number, or that of the latest version if it already holds these models.
+        """
+        try:
+            entries = {}
+            for name, model in models.items():
+                report = model_report.get(name)
+                if not isinstance(report, dict) or 'test_score' not in report:
+                    continue
+                entries[name] = {
+                    'object': self._put_file(model) if isinstance(model, str) else self._put_object(model),
+                    **{field: report[field] for field in REPORT_FIELDS if field in report},
+                }
+            if not entries:
+                raise ValueError("No trained model to register.")
+
+            manifest = {
+                'created_at': time.time(),
+                'source': source,
+                'best_model': best_model if best_model in entries else None,
+                'preprocessor': self._put_file(preprocessor_path),
+                'models': entries,
+            }
+            latest = self.manifest() if self.versions() else None
+            if latest is not None and self._holds(latest, manifest):
+                logging.info(f"Models unchanged since version {latest['version']} of the model registry, "
+                             f"not registering them again.")
+                return latest['version']
+            version = self._publish(manifest)
+            logging.info(f"Registered {len(entries)} model(s) as version {version} of the model registry.")
+            return version
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def versions(self):
+        """
+        Returns the registered version numbers, oldest first.
+        """
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(int(name[:-5]) for name in os.listdir(self.versions_dir)
+                      if name.endswith('.json') and name[:-5].isdigit())
+
+    def manifest(self, version='latest'):
+        """
+        Returns the manifest of a version (a number or 'latest'), with its number under 'version'.
+        """
+        try:
+            if version == 'latest':
+                versions = self.versions()
+                if not versions:
+                    raise ValueError(f"The model registry in {self.config.root} is empty.")
+                version = versions[-1]
+            if not os.path.exists(self._manifest_path(int(version))):
+                raise ValueError(f"The model registry has no version {version}.")
+            with open(self._manifest_path(int(version))) as file:
+                return {**json.load(file), 'version': int(version)}
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def resolve(self, ref):
+        """
+        Resolves a model reference such as 'latest', '3' or '3:Random Forest'.
+
+        Returns:
+        - tuple: The canonical reference ('<version>:<name>'), the registry entry of the model
+          and the digest of its preprocessor.
+        """
+        try:
+            version, _, name = ref.partition(':')
+            manifest = self.manifest(version.strip() or 'latest')
+            name = name.strip() or manifest['best_model']
+            if name not in manifest['models']:
+                raise ValueError(f"Version {manifest['version']} has no model {name!r}, "
+                                 f"expected one of {sorted(manifest['models'])}.")
+            return f"{manifest['version']}:{name}", manifest['models'][name], manifest['preprocessor']
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, f"{digest}.joblib")
+
+    def load_object(self, digest, mmap_mode='r'):
+        """
+        Loads a stored model or preprocessor, memory-mapping its arrays by default.
+        """
+        return load_object(self.object_path(digest), mmap_mode=mmap_mode)
+
+    @staticmethod
+    def _holds(existing, manifest):
+        # Same preprocessor, best model and stored object for every model of the new manifest
+        return (existing['preprocessor'] == manifest['preprocessor']
+                and existing['best_model'] == manifest['best_model']
+                and all(existing['models'].get(name, {}).get('object') == entry['object']
+                        for name, entry in manifest['models'].items()))
+
+    def _manifest_path(self, version):
+        return os.path.join(self.versions_dir, f"{version:06d}.json")
+
+    def _put_object(self, obj):
+        os.makedirs(self.objects_dir, exist_ok=True)
+        directory = tempfile.mkdtemp(dir=self.objects_dir)
+        try:
+            tmp_path = os.path.join(directory, 'object.joblib')
+            save_object(tmp_path, obj, serializer='joblib', compress=0)
+            return self._put_file(tmp_path)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _put_file(self, file_path):
+        # Stored with its metadata file, so `load_object` verifies the checksum and knows the serializer
+        digest = file_digest(file_path)
+        target = self.object_path(digest)
+        if not os.path.exists(target):
+            os.makedirs(self.objects_dir, exist_ok=True)
+            for source, destination in ((metadata_path(file_path), metadata_path(target)), (file_path, target)):
+                if os.path.exists(source):
+                    descriptor, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix='.tmp')
+                    os.close(descriptor)
+                    shutil.copyfile(source, tmp_path)
+                    os.replace(tmp_path, destination)
+        return digest
+
+    def _publish(self, manifest):
+        # The manifest is hard-linked to the next free number, which fails if another run took it
+        os.makedirs(self.versions_dir, exist_ok=True)
+        descriptor, tmp_path = tempfile.mkstemp(dir=self.versions_dir, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump(manifest, file, indent=2, default=str)
+            version = (self.versions() or [0])[-1] + 1
+            while True:
+                try:
+                    os.link(tmp_path, self._manifest_path(version))
+                    return version
+                except FileExistsError:
+                    version += 1
+        finally:
+            os.remove(tmp_path)
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from src.artifact_store import file_digest
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import metrics
+from src.pipeline.fast_inference import CompiledPreprocessor
+from src.pipeline.input_schema import InputSchema
+from src.pipeline.lookup_table import LookupTable
+from src.utils import load_object
+
+
+@dataclass(frozen=True)
+class ArtifactCacheConfig:
+    """
+    Configuration for the process-wide artifact cache.
+    Attributes:
+    - model_path: Path to the serialized model. SERVE_MODEL=surrogate serves the compact surrogate
+      published by `ModelDistiller` instead of the trained model.
+    - fallback_model_path: Model served while `model_path` does not exist, None for no fallback.
+      With SERVE_MODEL=surrogate, the trained model, as the distiller removes the surrogate
+      when no candidate qualifies.
+    - preprocessor_path: Path to the serialized preprocessor.
+    - check_interval: Minimum number of seconds between two stat() checks of the artifact files, None
+      to keep the loaded artifacts until `reload` is called (e.g. by the pre-fork server's parent).
+    - mmap_mode: Memory-map the NumPy arrays of uncompressed joblib artifacts ('r'), None to copy them.
+    - lookup_table_path: Dense prediction table to serve from (its metadata is the .json next to it),
+      None to always call the model. Enabled by default with PREDICTION_MODE=lookup.
+    """
+    model_path: str = os.path.join(
+        'artifacts', 'surrogate_model.pkl' if os.environ.get('SERVE_MODEL') == 'surrogate' else 'model.pkl')
+    fallback_model_path: Optional[str] = (
+        os.path.join('artifacts', 'model.pkl') if os.environ.get('SERVE_MODEL') == 'surrogate' else None
+    )
+    preprocessor_path: str = os.path.join('artifacts', 'preprocessor.pkl')
+    check_interval: Optional[float] = 1.0
+    mmap_mode: Optional[str] = 'r'
+    lookup_table_path: Optional[str] = (
+        os.path.join('artifacts', 'prediction_table.npy') if os.environ.get('PREDICTION_MODE') == 'lookup' else None
+    )
+
+    @property
+    def lookup_metadata_path(self):
+        return os.path.splitext(self.lookup_table_path)[0] + '.json' if self.lookup_table_path else None
+
+
+@dataclass(frozen=True)
+class LoadedArtifacts:
+    """
+    An immutable snapshot of the model and preprocessor loaded together.
+    Attributes:
+    - model: The fitted model.
+    - preprocessor: The fitted preprocessor.
+    - version: Short content hash identifying this pair of artifacts.
+    - compiled_preprocessor: Pandas-free single-row preprocessor, or None if it could not be compiled.
+    - lookup_table: Dense prediction table of this model, or None if not configured or out of date.
+    - schema: Inputs accepted by the preprocessor, or None if it could not be derived (no validation).
+    """
+    model: object
+    preprocessor: object
+    version: str
+    compiled_preprocessor: object = None
+    lookup_table: object = None
+    schema: object = None
+
+
+def artifacts_version(model_path, preprocessor_path):
+    """
+    Returns the short content hash identifying a model/preprocessor pair, as used in `LoadedArtifacts.version`.
+    """
+    return _version_from_digests((file_digest(model_path), file_digest(preprocessor_path)))
+
+
+def _version_from_digests(digests):
+    return hashlib.sha256(''.join(digests).encode()).hexdigest()[:12]
+
+
+class ArtifactCache:
+    """
+    Loads the model and preprocessor once per process and shares them across requests and threads.
+
+    The files are stat()-ed at most once every `check_interval` seconds. When their mtime or size
+    changes, their content hash is recomputed and the artifacts are reloaded only if the content
+    actually differs. The new pair is swapped in atomically, so callers always see a consistent
+    model/preprocessor snapshot and never pay the deserialization cost on the hot path.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ArtifactCacheConfig()
+        self._lock = threading.Lock()
+        self._artifacts = None
+        self._stat_key = None
+        self._digests = None
+        self._next_check = 0.0
+
+    def _model_path(self):
+        fallback = self.config.fallback_model_path
+        if fallback and not os.path.exists(self.config.model_path):
+            return fallback
+        return self.config.model_path
+
+    def _stat(self, model_path):
+        stats = [os.stat(path) for path in (model_path, self.config.preprocessor_path)]
+        # The model path is part of the key, so switching to or from the fallback reloads
+        stat_key = (model_path,) + tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+        # The lookup table may be exported after the model, so it is watched too
+        metadata_path = self.config.lookup_metadata_path
+        if metadata_path and os.path.exists(metadata_path):
+            stat = os.stat(metadata_path)
+            stat_key += ((stat.st_mtime_ns, stat.st_size),)
+        return stat_key
+
+    def _load_lookup_table(self, version):
+        metadata_path = self.config.lookup_metadata_path
+        if not metadata_path or not os.path.exists(metadata_path):
+            return None
+        try:
+            lookup_table = LookupTable(self.config.lookup_table_path, metadata_path)
+        except Exception as e:
+            logging.warning(f"Lookup table could not be loaded, serving from the model: {e}")
+            return None
+        if lookup_table.version != version:
+            logging.warning(f"Lookup table was built for artifacts {lookup_table.version}, not {version}, "
+                            f"serving from the model until it is re-exported.")
+            return None
+        return lookup_table
+
+    def get(self):
+        """
+        Returns the current artifacts, reloading them first if the files on disk have changed.
+
+        Returns:
+        - LoadedArtifacts: The cached model/preprocessor snapshot.
+        """
+        artifacts = self._artifacts
+        if artifacts is not None and (self.config.check_interval is None or time.monotonic() < self._next_check):
+            return artifacts
+        return self.reload()
+
+    def reload(self, force=False):
+        """
+        Checks the artifact files and reloads them if their content changed.
+
+        Parameters:
+        - force (bool): Reload even if the files look unchanged.
+
+        Returns:
+        - LoadedArtifacts: The (possibly refreshed) model/preprocessor snapshot.
+        """
+        with self._lock:
+            try:
+                model_path = self._model_path()
+                stat_key = self._stat(model_path)
+                if not force and self._artifacts is not None and stat_key == self._stat_key:
+                    return self._artifacts
+
+                digests = (
+                    file_digest(model_path),
+                    file_digest(self.config.preprocessor_path),
+                )
+                if len(stat_key) > 3:
+                    digests += (file_digest(self.config.lookup_metadata_path),)
+                if not force and self._artifacts is not None and digests == self._digests:
+                    # Files were touched but their content is identical, keep serving the current pair.
+                    self._stat_key = stat_key
+                    return self._artifacts
+
+                logging.info(f"Loading model {model_path} and preprocessor artifacts into the cache.")
+                with metrics.timed('artifact_load'):
+                    model = load_object(model_path, mmap_mode=self.config.mmap_mode)
+                    preprocessor = load_object(self.config.preprocessor_path, mmap_mode=self.config.mmap_mode)
+                version = _version_from_digests(digests[:2])
+
+                try:
+                    compiled_preprocessor = CompiledPreprocessor(preprocessor)
+                except Exception as e:
+                    logging.warning(f"Single-row fast path disabled, preprocessor could not be compiled: {e}")
+                    compiled_preprocessor = None
+
+                try:
+                    schema = InputSchema.from_preprocessor(preprocessor)
+                except Exception as e:
+                    logging.warning(f"Input validation disabled, no schema could be derived from the preprocessor: {e}")
+                    schema = None
+
+                self._artifacts = LoadedArtifacts(
+                    model=model,
+                    preprocessor=preprocessor,
+                    version=version,
+                    compiled_preprocessor=compiled_preprocessor,
+                    lookup_table=self._load_lookup_table(version),
+                    schema=schema,
+                )
+                self._stat_key = stat_key
+                self._digests = digests
+                logging.info(f"Artifacts version {version} loaded.")
+            except Exception as e:
+                if self._artifacts is None:
+                    raise CustomException(e, sys)
+                # A retrain may be writing the files right now, keep serving the previous version.
+                logging.error(f"Artifact reload failed, keeping version {self._artifacts.version}: {e}")
+            finally:
+                self._next_check = time.monotonic() + (self.config.check_interval or 0.0)
+
+            return self._artifacts
+
+
+# Shared by every PredictPipeline in the process.
+artifact_cache = ArtifactCache()
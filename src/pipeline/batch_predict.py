@@ -0,0 +1,202 @@
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from src.data_schema import DatasetSchema
+from src.exception import CustomException
+from src.logger import logging
+from src.pipeline.artifact_cache import ArtifactCache, ArtifactCacheConfig
+from src.pipeline.predict_pipeline import FEATURE_COLUMNS
+
+
+@dataclass(frozen=True)
+class BatchPredictConfig:
+    """
+    Configuration for offline batch scoring.
+    Attributes:
+    - chunksize: Number of input rows read, scored and written at a time.
+    - workers: Number of worker processes, 0 scores in the current process.
+    - prediction_column: Name of the column holding the predictions in the output.
+    - model_path: Path to the serialized model.
+    - preprocessor_path: Path to the serialized preprocessor.
+    - schema: Column types of the input, which fix those of the Parquet output (see
+      `DatasetSchema.arrow_schema`) whatever the values of each chunk.
+    """
+    chunksize: int = 50_000
+    workers: int = 0
+    prediction_column: str = 'predicted_math_score'
+    model_path: str = os.path.join('artifacts', 'model.pkl')
+    preprocessor_path: str = os.path.join('artifacts', 'preprocessor.pkl')
+    schema: DatasetSchema = field(default_factory=DatasetSchema)
+
+
+# Artifacts snapshot of the current (worker) process, loaded once by `_load_artifacts`
+_artifacts = None
+
+
+def _load_artifacts(model_path, preprocessor_path):
+    global _artifacts
+    cache = ArtifactCache(ArtifactCacheConfig(
+        model_path=model_path, fallback_model_path=None, preprocessor_path=preprocessor_path))
+    _artifacts = cache.get()
+    return _artifacts
+
+
+def _score_chunk(chunk):
+    """
+    Scores one chunk with this process's artifacts snapshot.
+
+    Returns:
+    - tuple: The predictions array and the artifacts version used.
+    """
+    scaled_data = _artifacts.preprocessor.transform(chunk[FEATURE_COLUMNS])
+    return _artifacts.model.predict(scaled_data), _artifacts.version
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+
+class _ParquetWriter:
+    def __init__(self, path, dataset_schema, columns, prediction_column):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Writing Parquet output requires pyarrow: pip install pyarrow") from e
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        # Fixed up front rather than inferred from the first chunk, every chunk is cast to it
+        self.schema = dataset_schema.arrow_schema(
+            [name for name in columns if name != prediction_column]).append(pa.field(prediction_column, pa.float64()))
+        self.writer = None
+
+    def write(self, df):
+        table = self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class BatchPredictor:
+    """
+    Streams a CSV with the `stud.csv` schema through the model in fixed-size chunks and
+    writes the predictions incrementally, so memory use stays flat regardless of file size.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or BatchPredictConfig()
+
+    def _scored_chunks(self, reader, version):
+        """
+        Yields (chunk, predictions) pairs in input order.
+        """
+        if self.config.workers <= 0:
+            for chunk in reader:
+                predictions, _ = _score_chunk(chunk)
+                yield chunk, predictions
+            return
+
+        # Keep a bounded window of chunks in flight so reading never runs ahead of writing
+        with ProcessPoolExecutor(
+            max_workers=self.config.workers,
+            initializer=_load_artifacts,
+            initargs=(self.config.model_path, self.config.preprocessor_path),
+        ) as executor:
+            pending = deque()
+            for chunk in reader:
+                pending.append((chunk, executor.submit(_score_chunk, chunk)))
+                if len(pending) >= 2 * self.config.workers:
+                    yield self._collect(pending.popleft(), version)
+            while pending:
+                yield self._collect(pending.popleft(), version)
+
+    @staticmethod
+    def _collect(item, version):
+        chunk, future = item
+        predictions, worker_version = future.result()
+        if worker_version != version:
+            raise RuntimeError(
+                f"Artifacts changed during scoring (expected version {version}, worker used {worker_version})."
+            )
+        return chunk, predictions
+
+    def predict_file(self, input_path, output_path):
+        """
+        Scores `input_path` and writes the input columns plus a prediction column to `output_path`.
+        The output format is Parquet when the path ends in `.parquet`, CSV otherwise.
+
+        Returns:
+        - int: Number of rows scored.
+        """
+        try:
+            version = _load_artifacts(self.config.model_path, self.config.preprocessor_path).version
+            logging.info(f"Scoring {input_path} with artifacts version {version} "
+                         f"(chunksize={self.config.chunksize}, workers={self.config.workers}).")
+
+            columns = pd.read_csv(input_path, nrows=0).columns
+            if output_path.endswith('.parquet'):
+                writer = _ParquetWriter(output_path, self.config.schema, columns, self.config.prediction_column)
+            else:
+                writer = _CsvWriter(output_path)
+            # Text columns are always parsed as strings, even in a chunk where they look numeric or are empty
+            text_dtypes = {name: object for name in columns if name not in self.config.schema.score_columns}
+            n_rows = 0
+            try:
+                with pd.read_csv(input_path, chunksize=self.config.chunksize, dtype=text_dtypes) as reader:
+                    for chunk, predictions in self._scored_chunks(reader, version):
+                        chunk[self.config.prediction_column] = predictions
+                        writer.write(chunk)
+                        n_rows += len(chunk)
+                        logging.info(f"Scored {n_rows} rows.")
+            finally:
+                writer.close()
+
+            logging.info(f"Predictions written to {output_path}.")
+            return n_rows
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV file with the trained model in chunks.")
+    parser.add_argument('input', help="Input CSV with the stud.csv schema.")
+    parser.add_argument('output', help="Output file, .parquet for Parquet, anything else for CSV.")
+    parser.add_argument('--chunksize', type=int, default=BatchPredictConfig.chunksize)
+    parser.add_argument('--workers', type=int, default=BatchPredictConfig.workers,
+                        help="Worker processes, 0 to score in-process, -1 for one per CPU.")
+    parser.add_argument('--model', default=BatchPredictConfig.model_path)
+    parser.add_argument('--preprocessor', default=BatchPredictConfig.preprocessor_path)
+    args = parser.parse_args(argv)
+
+    config = BatchPredictConfig(
+        chunksize=args.chunksize,
+        workers=os.cpu_count() if args.workers < 0 else args.workers,
+        model_path=args.model,
+        preprocessor_path=args.preprocessor,
+    )
+    BatchPredictor(config).predict_file(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import math
+import threading
+
+import numpy as np
+
+
+class CompiledPreprocessor:
+    """
+    A pandas-free version of the fitted preprocessor built by
+    `DataTransformation.get_preprocessing_pipeline`, for single-row inference.
+
+    The imputer statistics, one-hot category -> output column tables and scaler
+    mean/scale vectors are read out of the fitted ColumnTransformer once, so
+    transforming a row is a handful of dict lookups and float operations on a
+    preallocated NumPy row. The arithmetic mirrors sklearn's exactly, so the
+    output is identical to `preprocessor.transform`.
+    """
+
+    def __init__(self, preprocessor):
+        """
+        Compiles a fitted ColumnTransformer.
+
+        Parameters:
+        - preprocessor (ColumnTransformer): The fitted preprocessor.
+
+        Raises:
+        - ValueError: If the preprocessor does not have the expected structure.
+        """
+        if getattr(preprocessor, 'sparse_output_', True):
+            raise ValueError('Only dense preprocessor output can be compiled.')
+
+        transformers = {name: columns for name, _, columns in preprocessor.transformers_}
+        if set(transformers) - {'numeric_pipeline', 'categorical_pipeline', 'remainder'}:
+            raise ValueError(f"Unexpected transformers: {sorted(transformers)}")
+
+        numeric = preprocessor.named_transformers_['numeric_pipeline']
+        categorical = preprocessor.named_transformers_['categorical_pipeline']
+        if [name for name, _ in numeric.steps] != ['imputer', 'scaler'] or \
+                [name for name, _ in categorical.steps] != ['imputer', 'encoder', 'scaler']:
+            raise ValueError('Unexpected preprocessing pipeline steps.')
+
+        encoder = categorical.named_steps['encoder']
+        if encoder.drop_idx_ is not None or encoder.handle_unknown != 'error':
+            raise ValueError('Only OneHotEncoder(drop=None, handle_unknown="error") can be compiled.')
+        if getattr(encoder, 'infrequent_categories_', None) and any(
+                categories is not None for categories in encoder.infrequent_categories_):
+            raise ValueError('Infrequent category grouping cannot be compiled.')
+
+        numeric_scaler = numeric.named_steps['scaler']
+        categorical_scaler = categorical.named_steps['scaler']
+
+        self.numeric_features = list(transformers['numeric_pipeline'])
+        self.categorical_features = list(transformers['categorical_pipeline'])
+        self.numeric_fill = [float(value) for value in numeric.named_steps['imputer'].statistics_]
+        self.categorical_fill = list(categorical.named_steps['imputer'].statistics_)
+
+        numeric_slice = preprocessor.output_indices_['numeric_pipeline']
+        categorical_slice = preprocessor.output_indices_['categorical_pipeline']
+        self.n_features = max(indices.stop for indices in preprocessor.output_indices_.values())
+        self.numeric_index = list(range(numeric_slice.start, numeric_slice.stop))
+
+        # StandardScaler computes (x - mean) / scale on dense input
+        n_numeric = len(self.numeric_features)
+        self.numeric_mean = (
+            [float(value) for value in numeric_scaler.mean_]
+            if numeric_scaler.with_mean else [0.0] * n_numeric
+        )
+        self.numeric_scale = (
+            [float(value) for value in numeric_scaler.scale_]
+            if numeric_scaler.with_std else [1.0] * n_numeric
+        )
+
+        # ...and multiplies sparse one-hot columns by 1 / scale, so each category maps
+        # straight to its output column and the value that lands in it.
+        inverse_scale = (
+            1.0 / categorical_scaler.scale_
+            if categorical_scaler.with_std else np.ones(sum(map(len, encoder.categories_)))
+        )
+        self.category_tables = []
+        offset = 0
+        for categories in encoder.categories_:
+            self.category_tables.append({
+                category: (categorical_slice.start + offset + position, float(inverse_scale[offset + position]))
+                for position, category in enumerate(categories)
+            })
+            offset += len(categories)
+
+        self._local = threading.local()
+
+    def _row(self):
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.zeros(self.n_features, dtype=np.float64)
+        else:
+            row.fill(0.0)
+        return row
+
+    def transform_one(self, values):
+        """
+        Transforms one raw input record.
+
+        Parameters:
+        - values (dict): Raw feature values keyed by column name, e.g. the form fields of `CustomData`.
+
+        Returns:
+        - np.ndarray: A (1, n_features) array. The buffer is reused by the next call on the same thread.
+
+        Raises:
+        - ValueError: If a categorical value was not seen during fitting.
+        """
+        row = self._row()
+
+        for position, name in enumerate(self.numeric_features):
+            value = values.get(name)
+            value = self.numeric_fill[position] if _is_missing(value) else float(value)
+            row[self.numeric_index[position]] = (value - self.numeric_mean[position]) / self.numeric_scale[position]
+
+        for position, name in enumerate(self.categorical_features):
+            value = values.get(name)
+            # Like SimpleImputer on object columns, only NaN counts as missing here
+            if isinstance(value, float) and math.isnan(value):
+                value = self.categorical_fill[position]
+            try:
+                column, scaled_one = self.category_tables[position][value]
+            except (KeyError, TypeError):
+                raise ValueError(f"Found unknown category {value!r} in column {name!r}.")
+            row[column] = scaled_one
+
+        return row.reshape(1, -1)
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
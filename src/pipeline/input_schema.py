@@ -0,0 +1,198 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Error codes of the validation matrix, 0 meaning valid
+MISSING, UNKNOWN_CATEGORY, NOT_A_NUMBER, OUT_OF_RANGE = 1, 2, 3, 4
+ERROR_MESSAGES = {
+    MISSING: 'missing value',
+    UNKNOWN_CATEGORY: 'unknown category',
+    NOT_A_NUMBER: 'not a number',
+    OUT_OF_RANGE: 'out of range',
+}
+
+
+class SchemaValidationError(ValueError):
+    """
+    Raised when input rows do not match the schema.
+    Attributes:
+    - errors: One dict per invalid field (row, field, value, error), at most `max_errors` of them.
+    - n_invalid_rows: Total number of invalid rows.
+    """
+
+    def __init__(self, errors, n_invalid_rows):
+        rows = sorted({error['row'] for error in errors})
+        super().__init__(f"{n_invalid_rows} invalid row(s), e.g. rows {rows[:20]}: "
+                         f"{errors[0]['field']} {errors[0]['error']} ({errors[0]['value']!r}).")
+        self.errors = errors
+        self.n_invalid_rows = n_invalid_rows
+
+
+class InputSchema:
+    """
+    The inputs accepted by the fitted preprocessor: the category vocabulary of every
+    categorical feature and the valid range of every numeric feature.
+
+    Batches are checked column by column with vectorized operations: each categorical column
+    is looked up in its vocabulary in one hash-table pass, and the scores are coerced and range
+    checked as arrays. The results land in one (rows x features) error matrix, so valid
+    traffic pays a few array operations and invalid traffic is rejected before any
+    preprocessing or model work, with the row and field of every error.
+    """
+
+    def __init__(self, categories, numeric_features, numeric_range=(0, 100), max_errors=100):
+        """
+        Parameters:
+        - categories (dict): Categorical feature name -> list of known categories.
+        - numeric_features (list): Names of the numeric features.
+        - numeric_range (tuple): Inclusive (min, max) of the numeric features.
+        - max_errors (int): Largest number of error details reported for one batch.
+        """
+        self.categorical_features = list(categories)
+        self.numeric_features = list(numeric_features)
+        self.vocabularies = {name: pd.Index(values) for name, values in categories.items()}
+        self.category_sets = {name: set(values) for name, values in categories.items()}
+        self.numeric_min, self.numeric_max = numeric_range
+        self.max_errors = max_errors
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor, numeric_range=(0, 100), max_errors=100):
+        """
+        Builds the schema of a fitted preprocessor from `DataTransformation.get_preprocessing_pipeline`.
+        """
+        transformers = {name: columns for name, _, columns in preprocessor.transformers_}
+        encoder = preprocessor.named_transformers_['categorical_pipeline'].named_steps['encoder']
+        categories = {
+            name: [category for category in values if isinstance(category, str)]
+            for name, values in zip(transformers['categorical_pipeline'], encoder.categories_)
+        }
+        return cls(categories, transformers['numeric_pipeline'], numeric_range, max_errors)
+
+    @property
+    def features(self):
+        return self.categorical_features + self.numeric_features
+
+    def validate(self, frame):
+        """
+        Validates a batch of raw input rows.
+
+        Parameters:
+        - frame (pd.DataFrame): One column per feature.
+
+        Returns:
+        - pd.DataFrame: The batch with the numeric features as float64 (strings such as '70' are accepted).
+
+        Raises:
+        - SchemaValidationError: If any row has a missing, unknown, non-numeric or out-of-range value.
+        """
+        missing_columns = [name for name in self.features if name not in frame.columns]
+        if missing_columns:
+            raise ValueError(f"Missing columns: {missing_columns}")
+
+        codes = np.zeros((len(frame), len(self.features)), dtype=np.int8)
+        numeric = {}
+
+        for position, name in enumerate(self.categorical_features):
+            column = frame[name]
+            try:
+                known = column.isin(self.vocabularies[name]).to_numpy()
+            except TypeError:
+                # Unhashable values (e.g. lists in JSON) are unknown categories
+                known = np.array([isinstance(value, str) and value in self.category_sets[name] for value in column])
+            codes[:, position] = np.where(known, 0, np.where(column.isna().to_numpy(), MISSING, UNKNOWN_CATEGORY))
+
+        for position, name in enumerate(self.numeric_features, start=len(self.categorical_features)):
+            column = frame[name]
+            if pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+                values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+                not_a_number = np.zeros(len(values), dtype=bool)
+            else:
+                # Blank strings count as missing, booleans are not scores, anything else non-numeric becomes NaN
+                objects = column.to_numpy(dtype=object)
+                blank = np.array([isinstance(value, str) and not value.strip() for value in objects], dtype=bool)
+                is_bool = np.array([isinstance(value, (bool, np.bool_)) for value in objects], dtype=bool)
+                values = pd.to_numeric(pd.Series(np.where(is_bool | blank, None, objects)), errors='coerce').to_numpy(
+                    dtype=np.float64, na_value=np.nan)
+                not_a_number = np.isnan(values) & ~(pd.isna(objects) | blank)
+            missing = np.isnan(values) & ~not_a_number
+            with np.errstate(invalid='ignore'):
+                out_of_range = ~np.isnan(values) & ((values < self.numeric_min) | (values > self.numeric_max))
+            codes[:, position] = np.select([missing, not_a_number, out_of_range],
+                                           [MISSING, NOT_A_NUMBER, OUT_OF_RANGE], 0)
+            numeric[name] = values
+
+        invalid_rows = np.flatnonzero(codes.any(axis=1))
+        if len(invalid_rows):
+            raise SchemaValidationError(self._details(frame, codes, invalid_rows), len(invalid_rows))
+
+        return frame.assign(**numeric)
+
+    def validate_record(self, values):
+        """
+        Validates one raw input record with plain dict and set lookups, for the single-row path.
+
+        Parameters:
+        - values (dict): Raw feature values keyed by feature name.
+
+        Returns:
+        - dict: The record with the numeric features as floats.
+
+        Raises:
+        - SchemaValidationError: Same rules as `validate`.
+        """
+        record = dict(values)
+        errors = []
+        for name in self.categorical_features:
+            value = values.get(name)
+            if _is_missing(value):
+                errors.append(self._error(0, name, value, MISSING))
+            elif not isinstance(value, str) or value not in self.category_sets[name]:
+                errors.append(self._error(0, name, value, UNKNOWN_CATEGORY))
+        for name in self.numeric_features:
+            value = values.get(name)
+            if _is_missing(value) or (isinstance(value, str) and not value.strip()):
+                errors.append(self._error(0, name, value, MISSING))
+                continue
+            try:
+                if isinstance(value, bool):
+                    raise TypeError
+                number = float(value)
+            except (TypeError, ValueError):
+                errors.append(self._error(0, name, value, NOT_A_NUMBER))
+                continue
+            if math.isnan(number):
+                errors.append(self._error(0, name, value, NOT_A_NUMBER))
+            elif not self.numeric_min <= number <= self.numeric_max:
+                errors.append(self._error(0, name, value, OUT_OF_RANGE))
+            record[name] = number
+        if errors:
+            raise SchemaValidationError(errors, 1)
+        return record
+
+    def _error(self, row, name, value, code):
+        # Values are reported JSON-serializable, NaN as None
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        elif isinstance(value, np.generic):
+            value = value.item()
+        elif not isinstance(value, (str, int, float, bool, type(None))):
+            value = repr(value)
+        error = ERROR_MESSAGES[int(code)]
+        if code == OUT_OF_RANGE:
+            error = f"{error}, expected a value in [{self.numeric_min}, {self.numeric_max}]"
+        return {'row': row, 'field': name, 'value': value, 'error': error}
+
+    def _details(self, frame, codes, invalid_rows):
+        errors = []
+        for row in invalid_rows:
+            for position in np.flatnonzero(codes[row]):
+                name = self.features[position]
+                errors.append(self._error(int(row), name, frame[name].iloc[row], codes[row, position]))
+                if len(errors) >= self.max_errors:
+                    return errors
+        return errors
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
@@ -0,0 +1,80 @@
+import json
+import math
+
+import numpy as np
+
+from src.artifact_store import array_digest
+
+
+class LookupTable:
+    """
+    Serves predictions from a dense table of the model's output over the whole input grid.
+
+    Every input of `CustomData` is discrete and bounded, so the model can be evaluated once
+    for every combination (see `src.components.lookup_table_exporter`). The table is
+    memory-mapped, so worker processes share it through the page cache, and a prediction is
+    a single array index. Values are stored as float32, within ~1e-5 of the model's output.
+    """
+
+    def __init__(self, table_path, metadata_path):
+        """
+        Parameters:
+        - table_path (str): Path of the .npy table.
+        - metadata_path (str): Path of the JSON metadata written by the exporter.
+        """
+        with open(metadata_path) as file:
+            self.metadata = json.load(file)
+        self.table = np.load(table_path, mmap_mode='r')
+        # The mapped table itself is checked, so a table swapped in after the metadata was read is caught
+        table_sha256 = self.metadata.get('table_sha256')
+        if table_sha256 is not None and array_digest(self.table) != table_sha256:
+            raise ValueError(f"Lookup table {table_path} does not match its metadata, it is being re-exported.")
+        self.version = self.metadata['artifacts_version']
+        self.categorical_features = self.metadata['categorical_features']
+        self.numeric_features = self.metadata['numeric_features']
+        self.score_min = self.metadata['score_min']
+        self.score_max = self.metadata['score_max']
+        self.category_codes = [
+            {category: code for code, category in enumerate(self.metadata['categories'][name])}
+            for name in self.categorical_features
+        ]
+
+        expected_shape = tuple(
+            [len(codes) for codes in self.category_codes]
+            + [self.score_max - self.score_min + 1] * len(self.numeric_features)
+        )
+        if self.table.shape != expected_shape:
+            raise ValueError(f"Lookup table shape {self.table.shape} does not match its metadata {expected_shape}.")
+
+    def index_of(self, values):
+        """
+        Returns the table index of one raw input record, or None if it lies outside the grid
+        (unknown or missing category, missing, fractional or out-of-range score).
+        """
+        index = []
+        for name, codes in zip(self.categorical_features, self.category_codes):
+            try:
+                code = codes.get(values.get(name))
+            except TypeError:
+                return None
+            if code is None:
+                return None
+            index.append(code)
+        for name in self.numeric_features:
+            try:
+                score = float(values.get(name))
+            except (TypeError, ValueError):
+                return None
+            if math.isnan(score) or not score.is_integer() or not self.score_min <= score <= self.score_max:
+                return None
+            index.append(int(score) - self.score_min)
+        return tuple(index)
+
+    def lookup(self, values):
+        """
+        Returns the tabulated prediction for one raw input record, or None if it is not in the table.
+        """
+        index = self.index_of(values)
+        if index is None:
+            return None
+        return float(self.table[index])
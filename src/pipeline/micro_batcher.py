@@ -0,0 +1,150 @@
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import metrics
+from src.pipeline.artifact_cache import artifact_cache
+from src.pipeline.predict_pipeline import FEATURE_COLUMNS
+
+
+@dataclass(frozen=True)
+class MicroBatcherConfig:
+    """
+    Configuration for coalescing concurrent single-row requests into micro-batches.
+    Attributes:
+    - max_batch_size: Largest number of requests scored by one model call.
+    - max_wait: Longest time (seconds) the first request of a batch waits for others to join it.
+    """
+    max_batch_size: int = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+    max_wait: float = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2)) / 1000
+
+
+class MicroBatcher:
+    """
+    Queues single-row prediction requests from concurrent threads and scores them together.
+
+    A background worker takes the first waiting request, collects more until the batch is full
+    or `max_wait` has passed since that first request, and then runs one
+    `preprocessor.transform` and one `model.predict` over the batch. Throughput under
+    concurrent load goes up while the extra latency of a request stays bounded by `max_wait`
+    plus one batch's inference time.
+    """
+
+    def __init__(self, config=None, cache=None):
+        self.config = config or MicroBatcherConfig()
+        self.cache = cache or artifact_cache
+        self._closed = False
+        self._start_worker()
+        # Threads don't survive fork(), so pre-forked server workers each start their own
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start_worker)
+
+    def _start_worker(self):
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, values):
+        """
+        Enqueues one raw input record.
+
+        Parameters:
+        - values (dict): Raw feature values keyed by column name.
+
+        Returns:
+        - Future: Resolves to a (prediction, artifacts version) tuple.
+        """
+        if self._closed:
+            raise RuntimeError('The micro-batcher is closed.')
+        future = Future()
+        self._queue.put((values, future))
+        return future
+
+    def predict(self, values, timeout=None):
+        """
+        Scores one raw input record as part of a micro-batch and waits for the result.
+
+        Returns:
+        - tuple: The prediction and the version of the artifacts that produced it.
+        """
+        return self.submit(values).result(timeout)
+
+    def close(self):
+        """
+        Stops the worker once the requests already queued have been scored.
+        """
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.config.max_wait
+        while len(batch) < self.config.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Let the main loop see the shutdown after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            try:
+                self._score(batch)
+            except Exception as e:
+                logging.error(f"Micro-batch of {len(batch)} requests failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, batch):
+        artifacts = self.cache.get()
+        with metrics.timed('micro_batch', size=_size_bucket(len(batch))):
+            try:
+                input_data = pd.DataFrame([values for values, _ in batch], columns=FEATURE_COLUMNS)
+                predictions = artifacts.model.predict(artifacts.preprocessor.transform(input_data))
+            except Exception:
+                if len(batch) == 1:
+                    raise
+                # One bad row (e.g. an unknown category) must not fail the whole batch
+                for item in batch:
+                    self._score_one(artifacts, item)
+                return
+
+        for (_, future), prediction in zip(batch, predictions):
+            future.set_result((prediction, artifacts.version))
+
+    @staticmethod
+    def _score_one(artifacts, item):
+        values, future = item
+        try:
+            input_data = pd.DataFrame([values], columns=FEATURE_COLUMNS)
+            prediction = artifacts.model.predict(artifacts.preprocessor.transform(input_data))[0]
+            future.set_result((prediction, artifacts.version))
+        except Exception as e:
+            future.set_exception(CustomException(e, sys))
+
+
+def _size_bucket(size):
+    # Keeps the metric's label cardinality small
+    for bound in (1, 4, 16, 64, 256):
+        if size <= bound:
+            return f"<={bound}"
+    return ">256"
@@ -0,0 +1,340 @@
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import metrics
+from src.model_registry import ModelRegistry, ModelRegistryConfig
+from src.pipeline.fast_inference import CompiledPreprocessor
+from src.pipeline.input_schema import InputSchema
+
+
+def parse_routes(text):
+    """
+    Parses a traffic split such as 'latest:Linear Regression=90, latest:Random Forest=10'
+    into ((model reference, percentage), ...). A single reference without '=' gets all traffic.
+    """
+    routes = []
+    for item in filter(None, (item.strip() for item in text.split(','))):
+        ref, separator, weight = item.rpartition('=')
+        routes.append((ref.strip(), float(weight)) if separator else (item, 100.0))
+    return tuple(routes)
+
+
+@dataclass(frozen=True)
+class ModelRouterConfig:
+    """
+    Configuration for serving several registered models side by side.
+    Attributes:
+    - routes: (model reference, percentage of traffic) of every served model, see `parse_routes`.
+      Set with SERVING_ROUTES; references are resolved in the model registry (see `ModelRegistry`).
+    - shadow: References of challenger models that score every request off the request path,
+      without their predictions being returned. Set with SHADOW_MODELS (comma-separated).
+    - registry_root: Directory of the model registry.
+    - mmap_mode: Memory-map the arrays of the registered models ('r'), None to copy them.
+    - shadow_queue_size: Largest number of requests waiting to be shadow-scored, later ones are dropped.
+    - shadow_batch_size: Largest number of queued requests shadow-scored by one model call.
+    """
+    routes: Tuple[Tuple[str, float], ...] = parse_routes(os.environ.get('SERVING_ROUTES', 'latest'))
+    shadow: Tuple[str, ...] = tuple(
+        filter(None, (ref.strip() for ref in os.environ.get('SHADOW_MODELS', '').split(','))))
+    registry_root: str = ModelRegistryConfig.root
+    mmap_mode: Optional[str] = 'r'
+    shadow_queue_size: int = 1000
+    shadow_batch_size: int = 256
+
+
+@dataclass(frozen=True)
+class PreprocessorGroup:
+    """
+    A preprocessor of the routing, shared by the served and shadow models trained with it.
+    Attributes:
+    - digest: Digest of the preprocessor in the model registry.
+    - preprocessor: The fitted preprocessor.
+    - compiled_preprocessor: Pandas-free single-row preprocessor, or None if it could not be compiled.
+    - schema: Inputs accepted by the preprocessor, or None if it could not be derived (no validation).
+    """
+    digest: str
+    preprocessor: object
+    compiled_preprocessor: object
+    schema: object
+
+
+@dataclass(frozen=True)
+class RoutedModels:
+    """
+    An immutable snapshot of the served models and their preprocessors.
+    Attributes:
+    - groups: The distinct preprocessors of the served and shadow models, that of the first arm first.
+    - group_of: Index in `groups` of the preprocessor of every reference.
+    - models: Loaded model of every reference, models stored once in the registry are loaded once.
+    - arms: References of the served models, in the order of `thresholds`.
+    - thresholds: Cumulative traffic fractions of the arms, the last one being 1.
+    - shadow: References of the shadow models.
+    - version: The resolved routes, identifying this snapshot.
+    """
+    groups: Tuple[PreprocessorGroup, ...]
+    group_of: dict
+    models: dict
+    arms: Tuple[str, ...]
+    thresholds: np.ndarray
+    shadow: Tuple[str, ...]
+    version: str
+
+
+class ModelRouter:
+    """
+    Serves several versions of the model at once from the model registry: requests are routed
+    to the served models by percentage (A/B testing) and copied to shadow models.
+
+    The models are grouped by the preprocessor they were trained with, so a routing can compare
+    models of different training runs (e.g. 'latest=90,3=10'). A request is preprocessed once
+    per preprocessor it needs (that of the model it is routed to and those of the shadow models)
+    and each feature matrix is shared within its group. The shadow models score it in batches on
+    a background thread after the response has been computed. When the shadow queue is full,
+    requests are not shadowed rather than slowed down. The shadow predictions are compared with
+    the served ones (`stats`, `render_prometheus`).
+
+    Rows are assigned to a model at random, or by a hash of the routing key when one is given,
+    so a client passing the same key is always served by the same model.
+    """
+
+    def __init__(self, config=None, registry=None):
+        self.config = config or ModelRouterConfig()
+        self.registry = registry or ModelRegistry(ModelRegistryConfig(root=self.config.registry_root))
+        self._lock = threading.Lock()
+        # Held while loading, so routing and statistics never wait for a reload
+        self._reload_lock = threading.Lock()
+        self._models = None
+        self._rng = np.random.default_rng()
+        self._stats = {}
+        self._start_worker()
+        # Threads don't survive fork(), so pre-forked server workers each start their own
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start_worker)
+
+    def _start_worker(self):
+        self._queue = queue.Queue(maxsize=self.config.shadow_queue_size)
+        self._worker = threading.Thread(target=self._run_shadow, name='shadow-scoring', daemon=True)
+        self._worker.start()
+
+    def get(self):
+        """
+        Returns the current snapshot, loading the models on first use.
+        """
+        models = self._models
+        return models if models is not None else self.reload()
+
+    def reload(self, force=False):
+        """
+        Resolves the routes again (e.g. 'latest' after a new training run) and loads their models
+        if they resolve to different ones. Only the manifests are read when nothing changed, so
+        this is cheap enough to poll.
+
+        Parameters:
+        - force (bool): Reload even if the routes resolve to the same models.
+
+        Returns:
+        - RoutedModels: The (possibly new) snapshot, swapped in atomically.
+        """
+        with self._reload_lock:
+            try:
+                routes = [(self.registry.resolve(ref), weight) for ref, weight in self.config.routes]
+                shadow = [self.registry.resolve(ref) for ref in self.config.shadow]
+                weights = np.array([weight for _, weight in routes], dtype=np.float64)
+                if not len(weights) or (weights < 0).any() or weights.sum() <= 0:
+                    raise ValueError(f"Invalid traffic split {self.config.routes}.")
+                arms = tuple(ref for (ref, _, _), _ in routes)
+                version = (','.join(f"{ref}={weight:g}" for ref, weight in zip(arms, weights))
+                           + ''.join(f",shadow {ref}" for ref, _, _ in shadow))
+                if not force and self._models is not None and version == self._models.version:
+                    return self._models
+
+                # One instance per stored model object or preprocessor, shared by every reference to it
+                resolved = [resolved for resolved, _ in routes] + shadow
+                digests = list(dict.fromkeys(digest for _, _, digest in resolved))
+                objects, models = {}, {}
+                for ref, entry, _ in resolved:
+                    if entry['object'] not in objects:
+                        objects[entry['object']] = self.registry.load_object(
+                            entry['object'], mmap_mode=self.config.mmap_mode)
+                    models[ref] = objects[entry['object']]
+
+                thresholds = np.cumsum(weights) / weights.sum()
+                thresholds[-1] = 1.0
+                self._models = RoutedModels(
+                    groups=tuple(self._load_group(digest) for digest in digests),
+                    group_of={ref: digests.index(digest) for ref, _, digest in resolved},
+                    models=models,
+                    arms=arms,
+                    thresholds=thresholds,
+                    shadow=tuple(ref for ref, _, _ in shadow),
+                    version=version,
+                )
+                logging.info(f"Serving {self._models.version}.")
+            except Exception as e:
+                if self._models is None:
+                    raise CustomException(e, sys)
+                logging.error(f"Model routing reload failed, keeping {self._models.version}: {e}")
+            return self._models
+
+    def _load_group(self, digest):
+        preprocessor = self.registry.load_object(digest, mmap_mode=self.config.mmap_mode)
+        try:
+            compiled_preprocessor = CompiledPreprocessor(preprocessor)
+        except Exception as e:
+            logging.warning(f"Single-row fast path disabled, preprocessor could not be compiled: {e}")
+            compiled_preprocessor = None
+        try:
+            schema = InputSchema.from_preprocessor(preprocessor)
+        except Exception as e:
+            logging.warning(f"Input validation disabled, no schema could be derived from the preprocessor: {e}")
+            schema = None
+        return PreprocessorGroup(digest=digest, preprocessor=preprocessor,
+                                 compiled_preprocessor=compiled_preprocessor, schema=schema)
+
+    def assign(self, models, n_rows, routing_key=None):
+        """
+        Returns the index in `models.arms` of the model serving each of `n_rows` rows.
+        """
+        if len(models.arms) == 1:
+            return np.zeros(n_rows, dtype=np.intp)
+        if routing_key is not None:
+            draws = np.full(n_rows, zlib.crc32(str(routing_key).encode()) / 2 ** 32)
+        else:
+            with self._lock:
+                draws = self._rng.random(n_rows)
+        return np.minimum(np.searchsorted(models.thresholds, draws, side='right'), len(models.arms) - 1)
+
+    def predict(self, models, preprocess, n_rows, routing_key=None):
+        """
+        Scores rows with the models they are routed to and queues them for the shadow models.
+
+        Parameters:
+        - models (RoutedModels): The current snapshot.
+        - preprocess (callable): Returns the rows preprocessed by the `PreprocessorGroup` it is
+          called with (dense array or CSR matrix). It is called once for every preprocessor
+          needed, before any model is called, and its output is shared within the group. The
+          shadow models read it after this returns, so it must not be a buffer the caller reuses.
+        - n_rows (int): Number of rows.
+        - routing_key (str, optional): Sends every row to the same model for the same key.
+
+        Returns:
+        - tuple: The predictions and the index in `models.arms` of the model that made each one.
+        """
+        arms = self.assign(models, n_rows, routing_key)
+        served = [(ref, rows) for ref, rows in ((ref, np.flatnonzero(arms == index))
+                                                for index, ref in enumerate(models.arms)) if len(rows)]
+        groups = dict.fromkeys([models.group_of[ref] for ref, _ in served]
+                               + [models.group_of[ref] for ref in models.shadow])
+        features = {group: preprocess(models.groups[group]) for group in groups}
+
+        predictions = np.empty(n_rows, dtype=np.float64)
+        for ref, rows in served:
+            group_features = features[models.group_of[ref]]
+            with metrics.timed('predict', path='routed', model=ref):
+                predictions[rows] = models.models[ref].predict(
+                    group_features if len(rows) == n_rows else group_features[rows])
+            self._count(ref, 'served_rows', len(rows))
+
+        if models.shadow:
+            shadow_features = {group: features[group] for group in {models.group_of[ref] for ref in models.shadow}}
+            try:
+                self._queue.put_nowait((models, shadow_features, predictions))
+            except queue.Full:
+                for ref in models.shadow:
+                    self._count(ref, 'dropped_rows', n_rows)
+        return predictions, arms
+
+    def flush(self, timeout=None):
+        """
+        Waits until the queued requests have been shadow-scored. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _run_shadow(self):
+        # Requests queued while the previous batch was scored are scored together, one
+        # predict call per shadow model, which amortizes the per-call overhead under load
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.config.shadow_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for models in {id(item[0]): item[0] for item in batch}.values():
+                    items = [item for item in batch if item[0] is models]
+                    served = np.concatenate([item[2] for item in items])
+                    for group in items[0][1]:
+                        features = [item[1][group] for item in items]
+                        if len(features) == 1:
+                            features = features[0]
+                        elif hasattr(features[0], 'tocsr'):
+                            features = sparse.vstack(features, format='csr')
+                        else:
+                            features = np.vstack(features)
+                        self._score_shadow(models, group, features, served)
+            except Exception as e:
+                logging.error(f"Shadow scoring failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _score_shadow(self, models, group, features, served):
+        for ref in (ref for ref in models.shadow if models.group_of[ref] == group):
+            start = time.perf_counter()
+            shadow_predictions = models.models[ref].predict(features)
+            metrics.observe('shadow_predict', time.perf_counter() - start, model=ref)
+            difference = np.abs(shadow_predictions - served)
+            with self._lock:
+                stats = self._stats.setdefault(ref, {})
+                stats['shadow_rows'] = stats.get('shadow_rows', 0) + len(difference)
+                stats['abs_difference_sum'] = stats.get('abs_difference_sum', 0.0) + float(difference.sum())
+                stats['max_abs_difference'] = max(stats.get('max_abs_difference', 0.0), float(difference.max()))
+
+    def _count(self, ref, counter, rows):
+        with self._lock:
+            stats = self._stats.setdefault(ref, {})
+            stats[counter] = stats.get(counter, 0) + rows
+
+    def stats(self):
+        """
+        Returns, per model reference, the rows it served, shadow-scored and dropped, and the mean
+        and max absolute difference between its shadow predictions and the served ones.
+        """
+        with self._lock:
+            stats = {ref: dict(values) for ref, values in self._stats.items()}
+        for values in stats.values():
+            if values.get('shadow_rows'):
+                values['mean_abs_difference'] = values.pop('abs_difference_sum') / values['shadow_rows']
+        return stats
+
+    def render_prometheus(self):
+        """
+        Returns the routing and shadow statistics in Prometheus text exposition format.
+        """
+        lines = []
+        for name, kind in (('served_rows', 'counter'), ('shadow_rows', 'counter'), ('dropped_rows', 'counter'),
+                           ('mean_abs_difference', 'gauge'), ('max_abs_difference', 'gauge')):
+            lines.append(f"# TYPE model_router_{name}{'_total' if kind == 'counter' else ''} {kind}")
+            for ref, values in sorted(self.stats().items()):
+                if name in values:
+                    escaped = ref.replace('\\', '\\\\').replace('"', '\\"')
+                    lines.append(f'model_router_{name}{"_total" if kind == "counter" else ""}'
+                                 f'{{model="{escaped}"}} {values[name]}')
+        return '\n'.join(lines) + '\n'
@@ -1,41 +1,246 @@
+import math
 import sys
 import pandas as pd
 from src.exception import CustomException
-from src.utils import load_object
+from src.metrics import metrics
+from src.pipeline.artifact_cache import artifact_cache
+from src.pipeline.input_schema import SchemaValidationError
+from src.pipeline.prediction_cache import prediction_cache
+
+CATEGORICAL_FEATURES = [
+    'gender', 'race_ethnicity', 'parental_level_of_education',
+    'lunch', 'test_preparation_course'
+]
+NUMERIC_FEATURES = ['reading_score', 'writing_score']
+FEATURE_COLUMNS = CATEGORICAL_FEATURES + NUMERIC_FEATURES
+
+
+def _feature_key(values):
+    """
+    Normalizes raw feature values into a hashable prediction cache key.
+
+    Scores are compared as floats (70, '70' and 70.0 give the same prediction) and missing
+    scores, which are all imputed the same way, share one key. Categories are kept verbatim
+    since the encoder treats any other spelling as an unknown category. Returns None when the
+    values can't be keyed, in which case the cache is bypassed.
+    """
+    try:
+        key = []
+        for name in CATEGORICAL_FEATURES:
+            value = values.get(name)
+            key.append(('nan',) if isinstance(value, float) and math.isnan(value) else value)
+        for name in NUMERIC_FEATURES:
+            value = values.get(name)
+            value = None if value is None else float(value)
+            key.append(None if value is None or math.isnan(value) else value)
+        key = tuple(key)
+        hash(key)
+        return key
+    except (TypeError, ValueError):
+        return None
 
 
 class PredictPipeline:
     """
     A class to handle the machine learning prediction pipeline.
+
+    The model and preprocessor come from a process-wide cache, so creating
+    a PredictPipeline is cheap and the artifacts are only unpickled again
+    when they change on disk. Single-row predictions are also memoized in a
+    process-wide result cache keyed on the normalized input features.
+
+    Inputs are checked against the schema of the loaded preprocessor before any
+    preprocessing; invalid inputs raise `SchemaValidationError` (a ValueError) with
+    the row and field of every error, instead of a `CustomException`.
+
+    With a `ModelRouter`, the models and preprocessor come from the model registry instead and
+    each request is routed to one of several served models (A/B testing) and shadow-scored;
+    the lookup table, prediction cache and micro-batcher, which hold a single model, are not used.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, cache=None, result_cache=None, batcher=None, router=None):
+        self.cache = cache or artifact_cache
+        self.result_cache = result_cache or prediction_cache
+        # Optional MicroBatcher that coalesces concurrent predict_one calls into one model call
+        self.batcher = batcher
+        # Optional ModelRouter serving several registered models side by side
+        self.router = router
 
-    def predict(self, input_features):
+    def predict(self, input_features, routing_key=None):
         """
         Predicts the output for given input features.
 
         Parameters:
-        - input_features (pd.DataFrame): Preprocessed input data.
+        - input_features (pd.DataFrame): Raw input data, one column per feature.
+        - routing_key (str, optional): With a router, serves every row with the same model for the same key.
 
         Returns:
         - np.ndarray: Model predictions.
+
+        Raises:
+        - SchemaValidationError: If any row is invalid, before any preprocessing is done.
         """
+        if self.router is not None:
+            return self.predict_routed(input_features, routing_key)[0]
         try:
-            model_path = 'artifacts/model.pkl'
-            preprocessor_path = 'artifacts/preprocessor.pkl'
-
-            # Load model and preprocessor
-            model = load_object(model_path)
-            preprocessor = load_object(preprocessor_path)
+            # Take one consistent snapshot of the cached model and preprocessor
+            artifacts = self.cache.get()
+            if artifacts.schema is not None:
+                input_features = artifacts.schema.validate(input_features)
 
             # Apply preprocessing and make prediction
-            scaled_data = preprocessor.transform(input_features)
-            predictions = model.predict(scaled_data)
+            with metrics.timed('preprocess', path='dataframe'):
+                scaled_data = artifacts.preprocessor.transform(input_features)
+            with metrics.timed('predict', path='dataframe'):
+                predictions = artifacts.model.predict(scaled_data)
 
             return predictions
 
+        except SchemaValidationError:
+            raise
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict_routed(self, input_features, routing_key=None):
+        """
+        Predicts the output for given input features with the router's models, preprocessing them once.
+
+        Parameters:
+        - input_features (pd.DataFrame): Raw input data, one column per feature.
+        - routing_key (str, optional): Serves every row with the same model for the same key.
+
+        Returns:
+        - tuple: The predictions and the reference of the model that made each one.
+
+        Raises:
+        - SchemaValidationError: If any row is invalid, before any model is called.
+        """
+        try:
+            models = self.router.get()
+
+            def preprocess(group):
+                rows = group.schema.validate(input_features) if group.schema is not None else input_features
+                with metrics.timed('preprocess', path='dataframe'):
+                    return group.preprocessor.transform(rows)
+
+            predictions, arms = self.router.predict(models, preprocess, len(input_features), routing_key)
+            return predictions, [models.arms[arm] for arm in arms]
+
+        except SchemaValidationError:
+            raise
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict_one(self, student_data, routing_key=None):
+        """
+        Predicts the output for a single student without building a DataFrame.
+
+        Inputs covered by the lookup table (PREDICTION_MODE=lookup) are a single
+        array index, and repeated inputs are answered from the prediction cache.
+        Otherwise the row is scored in a micro-batch when a batcher is set, or
+        with the compiled preprocessor when available, with a fallback to
+        preprocessing a one-row DataFrame.
+
+        Parameters:
+        - student_data (CustomData): Raw input data for one student.
+        - routing_key (str, optional): With a router, serves the same model for the same key.
+
+        Returns:
+        - float: The model prediction.
+
+        Raises:
+        - SchemaValidationError: If the input is invalid, before any preprocessing is done.
+        """
+        if self.router is not None:
+            return self._predict_one_routed(student_data, routing_key)
+        try:
+            artifacts = self.cache.get()
+            values = student_data.to_dict()
+            if artifacts.schema is not None:
+                values = artifacts.schema.validate_record(values)
+
+            if artifacts.lookup_table is not None:
+                prediction = artifacts.lookup_table.lookup(values)
+                if prediction is not None:
+                    return prediction
+
+            key = _feature_key(values) if self.result_cache.enabled else None
+            if key is not None:
+                prediction = self.result_cache.get(artifacts.version, key)
+                if prediction is not None:
+                    return prediction
+
+            if self.batcher is not None:
+                prediction, version = self.batcher.predict(values)
+                # Only cache results of the artifacts version the key was looked up under
+                if key is not None and version == artifacts.version:
+                    self.result_cache.put(version, key, prediction)
+                return prediction
+
+            if artifacts.compiled_preprocessor is None:
+                with metrics.timed('preprocess', path='dataframe'):
+                    scaled_row = artifacts.preprocessor.transform(pd.DataFrame([values], columns=FEATURE_COLUMNS))
+            else:
+                with metrics.timed('preprocess', path='compiled'):
+                    scaled_row = artifacts.compiled_preprocessor.transform_one(values)
+            with metrics.timed('predict', path='single'):
+                prediction = artifacts.model.predict(scaled_row)[0]
+
+            if key is not None:
+                self.result_cache.put(artifacts.version, key, prediction)
+            return prediction
+
+        except SchemaValidationError:
+            raise
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _predict_one_routed(self, student_data, routing_key):
+        try:
+            models = self.router.get()
+            values = student_data.to_dict()
+
+            def preprocess(group):
+                record = group.schema.validate_record(values) if group.schema is not None else values
+                if group.compiled_preprocessor is None:
+                    with metrics.timed('preprocess', path='dataframe'):
+                        return group.preprocessor.transform(pd.DataFrame([record], columns=FEATURE_COLUMNS))
+                with metrics.timed('preprocess', path='compiled'):
+                    # Copied out of the per-thread buffer the next request overwrites, the shadow
+                    # models score it later
+                    return group.compiled_preprocessor.transform_one(record).copy()
+
+            predictions, _ = self.router.predict(models, preprocess, 1, routing_key)
+            return float(predictions[0])
+
+        except SchemaValidationError:
+            raise
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def warm_up(self):
+        """
+        Loads the artifacts and runs one prediction through both the batch and the single-row
+        paths, using the preprocessor's own imputation values (the most frequent categories and
+        median scores) as a known-valid input.
+
+        Returns:
+        - float: The warm-up prediction.
+        """
+        try:
+            if self.router is not None:
+                preprocessor = self.router.get().groups[0].preprocessor
+            else:
+                preprocessor = self.cache.get().preprocessor
+            numeric = preprocessor.named_transformers_['numeric_pipeline'].named_steps['imputer']
+            categorical = preprocessor.named_transformers_['categorical_pipeline'].named_steps['imputer']
+            values = dict(zip(CATEGORICAL_FEATURES, categorical.statistics_))
+            values.update(zip(NUMERIC_FEATURES, (float(value) for value in numeric.statistics_)))
+
+            student_data = CustomData(**values)
+            self.predict(student_data.to_dataframe())
+            return self.predict_one(student_data)
+
         except Exception as e:
             raise CustomException(e, sys)
 
@@ -55,6 +260,12 @@ class CustomData:
         self.reading_score = reading_score
         self.writing_score = writing_score
 
+    def to_dict(self):
+        """
+        Returns the collected user data as a plain dict keyed by feature name.
+        """
+        return {name: getattr(self, name) for name in FEATURE_COLUMNS}
+
     def to_dataframe(self):
         """
         Converts the collected user data into a Pandas DataFrame for model input.
@@ -76,3 +287,49 @@ class CustomData:
 
         except Exception as e:
             raise CustomException(e, sys)
+
+    @staticmethod
+    def batch_to_dataframe(payload, max_batch_size=None):
+        """
+        Checks the structure of a batch of student records and converts it into one DataFrame for model input.
+
+        Parameters:
+        - payload (list | dict): Either a list of records (one dict per student), a dict
+          with a "records" list, or a dict with a "columns" mapping of feature name to a
+          list of values (columnar arrays).
+        - max_batch_size (int, optional): Reject batches with more rows than this.
+
+        Returns:
+        - pd.DataFrame: The structured data, rows in input order.
+
+        Raises:
+        - ValueError: If the payload is malformed, too large, or has missing fields.
+        """
+        if isinstance(payload, dict) and 'columns' in payload:
+            columns = payload['columns']
+            if not isinstance(columns, dict):
+                raise ValueError('"columns" must map feature names to lists of values.')
+            missing = [name for name in FEATURE_COLUMNS if name not in columns]
+            if missing:
+                raise ValueError(f"Missing columns: {missing}")
+            if not all(isinstance(columns[name], list) for name in FEATURE_COLUMNS) or \
+                    len({len(columns[name]) for name in FEATURE_COLUMNS}) != 1:
+                raise ValueError('All columns must be lists of the same length.')
+            df = pd.DataFrame({name: columns[name] for name in FEATURE_COLUMNS})
+        else:
+            records = payload.get('records') if isinstance(payload, dict) else payload
+            if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                raise ValueError('Expected a list of records, {"records": [...]} or {"columns": {...}}.')
+            for row, record in enumerate(records):
+                missing = [name for name in FEATURE_COLUMNS if name not in record]
+                if missing:
+                    raise ValueError(f"Record {row} is missing fields: {missing}")
+            df = pd.DataFrame.from_records(records, columns=FEATURE_COLUMNS)
+
+        if df.empty:
+            raise ValueError('The batch is empty.')
+        if max_batch_size is not None and len(df) > max_batch_size:
+            raise ValueError(f"Batch of {len(df)} rows exceeds the maximum of {max_batch_size}.")
+
+        # Field values are checked against the model's input schema by `PredictPipeline.predict`
+        return df
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class PredictionCacheConfig:
+    """
+    Configuration for the prediction result cache.
+    Attributes:
+    - max_entries: Maximum number of cached predictions, 0 disables the cache.
+    - ttl: Seconds a cached prediction stays valid, None to keep it until evicted or the model changes.
+    """
+    max_entries: int = int(os.environ.get('PREDICTION_CACHE_SIZE', 50_000))
+    ttl: Optional[float] = float(os.environ['PREDICTION_CACHE_TTL']) if os.environ.get('PREDICTION_CACHE_TTL') else None
+
+
+class PredictionCache:
+    """
+    A thread-safe LRU/TTL cache of predictions keyed on normalized input features.
+
+    Entries belong to one artifacts version: as soon as a lookup comes in for a different
+    version (the model or preprocessor was reloaded), the whole cache is dropped. The number
+    of entries is bounded, so memory stays bounded too (a few hundred bytes per entry).
+    """
+
+    def __init__(self, config=None):
+        self.config = config or PredictionCacheConfig()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.config.max_entries > 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version, key):
+        """
+        Returns the cached prediction for `key` under artifacts `version`, or None on a miss.
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, version, key, value):
+        """
+        Caches the prediction for `key` under artifacts `version`, evicting the least recently used entry if full.
+        """
+        with self._lock:
+            self._check_version(version)
+            expires = time.monotonic() + self.config.ttl if self.config.ttl is not None else None
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss statistics and the current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.config.max_entries,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def render_prometheus(self):
+        """
+        Returns the statistics in Prometheus text exposition format.
+        """
+        stats = self.stats()
+        return (
+            "# TYPE prediction_cache_hits_total counter\n"
+            f"prediction_cache_hits_total {stats['hits']}\n"
+            "# TYPE prediction_cache_misses_total counter\n"
+            f"prediction_cache_misses_total {stats['misses']}\n"
+            "# TYPE prediction_cache_evictions_total counter\n"
+            f"prediction_cache_evictions_total {stats['evictions']}\n"
+            "# TYPE prediction_cache_entries gauge\n"
+            f"prediction_cache_entries {stats['size']}\n"
+        )
+
+
+# Shared by every PredictPipeline in the process.
+prediction_cache = PredictionCache()
@@ -0,0 +1,553 @@
+import argparse
+import hashlib
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from src.artifact_store import ArtifactStore, run_cached_stage
+from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.components.data_transformation import DataTransformation, DataTransformationConfig
+from src.components.lookup_table_exporter import LookupTableExporter
+from src.components.model_distiller import ModelDistiller
+from src.components.model_trainer import ModelTrainer, ModelTrainerConfig
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import metrics
+from src.profiling import profiler
+from src.utils import load_features, make_cv_folds, score_candidate, search_candidate
+
+
+@dataclass(frozen=True)
+class TrainingPipelineConfig:
+    """
+    Configuration of the training pipeline run.
+    Attributes:
+    - runs_dir: One directory per run, holding its node checkpoints and `summary.json`.
+    - n_jobs: CPU cores shared by the concurrent nodes, -1 for all of them.
+    - incremental: Update the previous best model instead of searching (see `IncrementalTrainer`).
+    - distill: Publish a compact surrogate of the best model (see `ModelDistiller`).
+    - export_lookup_table: Tabulate the best model for PREDICTION_MODE=lookup serving.
+    - ingestion / transformation / trainer: Configurations of the stages.
+    """
+    runs_dir: str = os.path.join('artifacts', 'runs')
+    n_jobs: int = -1
+    incremental: bool = os.environ.get('INCREMENTAL_TRAINING') == '1'
+    distill: bool = os.environ.get('MODEL_DISTILLATION') == '1'
+    export_lookup_table: bool = True
+    ingestion: Optional[DataIngestionConfig] = None
+    transformation: Optional[DataTransformationConfig] = None
+    trainer: Optional[ModelTrainerConfig] = None
+
+    def stage_configs(self):
+        """
+        Returns the stage configurations, with the defaults of an (incremental) run where not set.
+        """
+        return (
+            self.ingestion or DataIngestionConfig(split='hash' if self.incremental else 'random'),
+            self.transformation or DataTransformationConfig(refit_preprocessor=not self.incremental),
+            self.trainer or ModelTrainerConfig(incremental=self.incremental),
+        )
+
+
+@dataclass(frozen=True)
+class Node:
+    """
+    A step of the pipeline DAG.
+    Attributes:
+    - name: Unique name, also the name of its checkpoint.
+    - run: Module-level function called as `run(inputs, **kwargs)`, `inputs` holding the outputs of
+      the dependencies by name. Its return value is the node's output and is checkpointed.
+    - deps: Names of the nodes whose outputs it needs.
+    - kwargs: Extra keyword arguments, picklable for nodes run in a worker process.
+    - worker: Run in a worker process (CPU-bound nodes) instead of a thread of the main process.
+    - priority: Among the nodes ready to run, higher priorities are started first.
+    - partial_inputs: Also run when some dependencies failed, their outputs missing from `inputs`.
+      The output is then not checkpointed (nor those of its dependents), so resuming the run
+      recomputes it once the failed dependencies have been rerun.
+    """
+    name: str
+    run: Callable
+    deps: Tuple[str, ...] = ()
+    kwargs: dict = field(default_factory=dict)
+    worker: bool = False
+    priority: int = 0
+    partial_inputs: bool = False
+
+
+def _execute(name, node_run, inputs, kwargs, worker=False):
+    # Timed where the node runs, so the summary has its own wall time and not its queueing delay.
+    # A worker process has a profiler of its own, its entries are sent back to be merged
+    if worker:
+        profiler.reset()
+    start = time.perf_counter()
+    with profiler.stage(name):
+        output = node_run(inputs, **kwargs)
+    return output, time.perf_counter() - start, os.getpid(), profiler.report() if worker else None
+
+
+def _process_context():
+    # The fork server imports the pipeline once and forks a clean process for every worker node,
+    # without the threads of the main process; spawn where it is not available (Windows)
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['src.pipeline.train_pipeline'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class DagRunner:
+    """
+    Runs the nodes of a DAG as soon as their dependencies are done, checkpointing every output.
+
+    Worker nodes run concurrently, up to `max_workers` at a time, each in a process of its own,
+    so a worker that crashes only fails its own node. Main-process nodes run concurrently in
+    threads. The output of every finished node is written to `<run_dir>/checkpoints/<name>.joblib`
+    before its dependents start, and nodes that already have a checkpoint are not run again, so
+    re-running an interrupted run only redoes the nodes that had not finished. When a node fails
+    (an exception or a crash of its process), it is not checkpointed, the nodes that depend on it
+    are skipped (or run with partial inputs, see `Node.partial_inputs`) and the independent ones
+    still run to completion.
+    """
+
+    def __init__(self, nodes, run_dir, max_workers=1):
+        self.nodes = {node.name: node for node in nodes}
+        self.run_dir = run_dir
+        self.checkpoint_dir = os.path.join(run_dir, 'checkpoints')
+        self.max_workers = max_workers
+        for node in nodes:
+            missing = [dep for dep in node.deps if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"Node {node.name!r} depends on unknown nodes {missing}.")
+
+    def checkpoint_path(self, name):
+        return os.path.join(self.checkpoint_dir, f"{name.replace(':', '__').replace(' ', '_')}.joblib")
+
+    def _save_checkpoint(self, name, output):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        descriptor, tmp_path = tempfile.mkstemp(dir=self.checkpoint_dir, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            joblib.dump(output, file)
+        os.replace(tmp_path, self.checkpoint_path(name))
+
+    def run(self, on_update=None):
+        """
+        Runs every node not checkpointed yet.
+
+        Parameters:
+        - on_update (callable, optional): Called with the node states after every change.
+
+        Returns:
+        - tuple: The outputs of the completed nodes and the state of every node (status, seconds,
+          process and error), both keyed by node name.
+        """
+        outputs, states = {}, {}
+        for name in self.nodes:
+            if os.path.exists(self.checkpoint_path(name)):
+                outputs[name] = joblib.load(self.checkpoint_path(name))
+                states[name] = {'status': 'resumed', 'seconds': 0.0}
+            else:
+                states[name] = {'status': 'pending'}
+
+        def finished(dep):
+            return dep in outputs or states[dep]['status'] in ('failed', 'skipped')
+
+        pending = [name for name, state in states.items() if state['status'] == 'pending']
+        running, processes, partial = {}, {}, set()
+        threads = ThreadPoolExecutor(max_workers=max(1, len(self.nodes)), thread_name_prefix='pipeline')
+        context = None
+        try:
+            while pending or running:
+                for name in list(pending):
+                    node = self.nodes[name]
+                    if not node.partial_inputs and any(
+                            states[dep]['status'] in ('failed', 'skipped') for dep in node.deps):
+                        pending.remove(name)
+                        states[name] = {'status': 'skipped', 'error': 'A dependency failed.'}
+
+                ready = sorted(
+                    (name for name in pending if all(finished(dep) for dep in self.nodes[name].deps)),
+                    key=lambda name: -self.nodes[name].priority,
+                )
+                started = False
+                for name in ready:
+                    node = self.nodes[name]
+                    inputs = {dep: outputs[dep] for dep in node.deps if dep in outputs}
+                    if node.worker:
+                        if len(processes) >= self.max_workers:
+                            continue
+                        context = context or _process_context()
+                        executor = ProcessPoolExecutor(max_workers=1, mp_context=context)
+                        future = executor.submit(_execute, name, node.run, inputs, node.kwargs, worker=True)
+                        processes[future] = executor
+                    else:
+                        future = threads.submit(_execute, name, node.run, inputs, node.kwargs)
+                    if len(inputs) < len(node.deps) or any(dep in partial for dep in node.deps):
+                        partial.add(name)
+                    running[future] = name
+                    pending.remove(name)
+                    states[name] = {'status': 'running'}
+                    started = True
+                if on_update is not None and started:
+                    on_update(states)
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future in processes:
+                        processes.pop(future).shutdown(wait=False)
+                    try:
+                        output, seconds, pid, profile = future.result()
+                        if profile is not None:
+                            profiler.merge(profile)
+                        if name not in partial:
+                            self._save_checkpoint(name, output)
+                        outputs[name] = output
+                        states[name] = {'status': 'completed', 'seconds': seconds,
+                                        'process': 'worker' if pid != os.getpid() else 'main'}
+                        if name in partial:
+                            states[name]['partial'] = True
+                        logging.info(f"Pipeline node {name} completed in {seconds:.2f}s.")
+                    except Exception as e:
+                        states[name] = {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                        logging.error(f"Pipeline node {name} failed: {e}")
+                if on_update is not None:
+                    on_update(states)
+        finally:
+            for executor in processes.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            threads.shutdown(wait=True)
+        return outputs, states
+
+
+# Node functions. They run in worker processes or threads and only exchange picklable values
+# (paths, fitted estimators and report dicts), so each one can be checkpointed.
+
+def _ingest(inputs, config, store_config):
+    train_path, test_path = DataIngestion(config=config, store=ArtifactStore(store_config)).initialize_data_ingestion()
+    return {'train': train_path, 'test': test_path}
+
+
+def _transform(inputs, config, store_config):
+    transformation = DataTransformation(config=config, store=ArtifactStore(store_config))
+    # With a store, the features and targets are always written to the configured paths
+    transformation.initialize_data_transformation(inputs['ingestion']['train'], inputs['ingestion']['test'])
+    return {
+        'train_features': config.train_features_file_path,
+        'train_target': config.train_target_file_path,
+        'test_features': config.test_features_file_path,
+        'test_target': config.test_target_file_path,
+    }
+
+
+def _load_split(paths, split):
+    # Dense features and targets are memory-mapped, so concurrent workers share the pages
+    return (load_features(paths[f'{split}_features'], mmap_mode='r'),
+            np.load(paths[f'{split}_target'], mmap_mode='r'))
+
+
+def _make_folds(inputs, trainer_config):
+    X_train, y_train = _load_split(inputs['transformation'], 'train')
+    folds, data_digest = make_cv_folds(
+        X_train, y_train, trainer_config.cv_folds, ModelTrainer(trainer_config).fold_cache())
+    return {'folds': folds, 'data_digest': data_digest}
+
+
+def _search(inputs, model_name, trainer_config, n_jobs, deadline=None):
+    """
+    Tunes one candidate. An error fails the node, so it is not checkpointed and resuming the
+    run retries it; selection still runs with the other candidates. Past the `deadline` of the
+    run's time budget, a search is skipped if it has not started yet and stopped at its best
+    setting so far otherwise.
+    """
+    trainer = ModelTrainer(trainer_config)
+    param_grid = trainer.param_grids().get(model_name, {})
+    # Untuned candidates are a single cheap fit, only searches are skipped past the deadline
+    if param_grid and deadline is not None and time.time() >= deadline:
+        logging.warning(f"Skipping {model_name}: time budget exhausted.")
+        return {'model': None, 'error': 'Skipped: time budget exhausted', 'skipped': True}
+    X_train, y_train = _load_split(inputs['transformation'], 'train')
+    model, search = search_candidate(
+        model_name, trainer.candidate_models()[model_name], param_grid,
+        X_train, y_train, n_jobs, trainer_config.search_strategy, model_name in trainer_config.dense_models,
+        inputs['cv_folds']['folds'], trainer.fold_cache(), inputs['cv_folds']['data_digest'], deadline)
+    return {'model': model, 'search': search}
+
+
+def _evaluate(inputs, model_name, trainer_config):
+    search = inputs[f'search:{model_name}']
+    if search['model'] is None:
+        return {'error': search['error']}
+    X_train, y_train = _load_split(inputs['transformation'], 'train')
+    X_test, y_test = _load_split(inputs['transformation'], 'test')
+    try:
+        return score_candidate(model_name, search['model'], X_train, y_train, X_test, y_test,
+                               model_name in trainer_config.dense_models)
+    except ValueError as e:
+        # A model that predicts differently on the dense rows it is served is not selected
+        logging.error(f"Error evaluating model {model_name}: {e}")
+        return {'error': str(e)}
+
+
+def _select(inputs, model_names, trainer_config):
+    models, report = {}, {}
+    for name in model_names:
+        if f'evaluate:{name}' not in inputs:
+            report[name] = {'error': 'The search or evaluation node failed.'}
+            continue
+        search, scores = inputs[f'search:{name}'], inputs[f'evaluate:{name}']
+        if search['model'] is None or 'error' in scores:
+            report[name] = {'error': search.get('error') or scores.get('error')}
+            continue
+        models[name] = search['model']
+        report[name] = {**scores, **search['search']}
+        metrics.observe('model_fit', report[name]['fit_time'], model=name)
+        metrics.observe('model_predict', report[name]['predict_time'], model=name)
+    logging.info(f"Model evaluation completed. Report: {report}")
+
+    X_train, y_train = _load_split(inputs['transformation'], 'train')
+    best_model, best_score = ModelTrainer(trainer_config).select_and_save(models, report, X_train, y_train)
+    return {'best_model': best_model, 'test_score': best_score, 'report': report}
+
+
+def _train_incrementally(inputs, trainer_config, store_config):
+    X_train, y_train = _load_split(inputs['transformation'], 'train')
+    X_test, y_test = _load_split(inputs['transformation'], 'test')
+    ModelTrainer(trainer_config, store=ArtifactStore(store_config)).initiate_model_trainer(
+        X_train, y_train, X_test, y_test)
+    return {'model': trainer_config.model_obj_file_path}
+
+
+def _distill(inputs):
+    X_train, y_train = _load_split(inputs['transformation'], 'train')
+    X_test, y_test = _load_split(inputs['transformation'], 'test')
+    report = ModelDistiller().distill(X_train, y_train, X_test, y_test)
+    return {'published': report['published']}
+
+
+def _export_lookup_table(inputs, store_config):
+    exporter = LookupTableExporter()
+    run_cached_stage(
+        ArtifactStore(store_config),
+        'LookupTableExport',
+        dict(
+            input_files=[exporter.config.model_path, exporter.config.preprocessor_path],
+            config=exporter.config,
+            code_files=[inspect.getsourcefile(LookupTableExporter)],
+        ),
+        {'table': exporter.config.table_file_path, 'metadata': exporter.config.metadata_file_path},
+        exporter.export,
+    )
+    return {'table': exporter.config.table_file_path}
+
+
+class TrainingPipeline:
+    """
+    The training entry point: ingestion, transformation, one search and one test-set evaluation
+    node per candidate model, selection and the artifact exports, run as a DAG by `DagRunner`.
+
+    The candidate searches and evaluations are independent nodes spread over the worker pool
+    within the `n_jobs` CPU budget, largest search first. Every run gets a directory under
+    `runs_dir` with its node checkpoints and a `summary.json` (status and wall time of every
+    node, and the candidates the time budget skipped or cut short); `run(resume=...)` continues
+    an interrupted run from its checkpoints. Stages whose inputs are unchanged are still
+    restored from the artifact store, and model searches reuse the fold cache.
+    """
+
+    def __init__(self, config=None, store=None):
+        self.config = config or TrainingPipelineConfig()
+        self.store = store or ArtifactStore()
+
+    def nodes(self, deadline=None):
+        """
+        Returns the nodes of the pipeline DAG.
+
+        Parameters:
+        - deadline (float, optional): `time.time()` at which the time budget of the candidate
+          searches runs out, shared by every search node.
+        """
+        ingestion, transformation, trainer_config = self.config.stage_configs()
+        store_config = self.store.config
+        nodes = [
+            Node('ingestion', _ingest, kwargs={'config': ingestion, 'store_config': store_config}),
+            Node('transformation', _transform, ('ingestion',),
+                 kwargs={'config': transformation, 'store_config': store_config}),
+        ]
+
+        if trainer_config.incremental:
+            nodes.append(Node('model_training', _train_incrementally, ('transformation',),
+                              kwargs={'trainer_config': trainer_config, 'store_config': store_config}))
+            trained = 'model_training'
+        else:
+            trainer = ModelTrainer(trainer_config)
+            models, grids = trainer.candidate_models(), trainer.param_grids()
+            cpu_budget = self._cpu_budget()
+            inner_jobs = max(1, cpu_budget // max(1, min(len(models), cpu_budget)))
+            nodes.append(Node('cv_folds', _make_folds, ('transformation',), kwargs={'trainer_config': trainer_config}))
+            for name in models:
+                grid = grids.get(name, {})
+                search_size = math.prod(len(values) for values in grid.values()) if grid else 0
+                nodes.append(Node(f'search:{name}', _search, ('transformation', 'cv_folds'),
+                                  kwargs={'model_name': name, 'trainer_config': trainer_config, 'n_jobs': inner_jobs,
+                                          'deadline': deadline},
+                                  worker=True, priority=search_size))
+                nodes.append(Node(f'evaluate:{name}', _evaluate, ('transformation', f'search:{name}'),
+                                  kwargs={'model_name': name, 'trainer_config': trainer_config}, worker=True))
+            nodes.append(Node('selection', _select,
+                              ('transformation',) + tuple(f'{step}:{name}' for name in models
+                                                          for step in ('search', 'evaluate')),
+                              kwargs={'model_names': list(models), 'trainer_config': trainer_config},
+                              partial_inputs=True))
+            trained = 'selection'
+
+        if self.config.distill:
+            nodes.append(Node('distillation', _distill, ('transformation', trained)))
+        if self.config.export_lookup_table:
+            nodes.append(Node('lookup_export', _export_lookup_table, (trained,), kwargs={'store_config': store_config}))
+        return nodes
+
+    def _cpu_budget(self):
+        n_jobs = self.config.n_jobs
+        return (os.cpu_count() or 1) if n_jobs is None or n_jobs < 0 else n_jobs
+
+    def fingerprint(self):
+        """
+        Returns a digest of the run configuration, a run is only resumed with the same one.
+        """
+        description = {
+            'config': asdict(self.config),
+            'stages': [asdict(config) for config in self.config.stage_configs()],
+            'nodes': [node.name for node in self.nodes()],
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def _latest_unfinished_run(self):
+        if not os.path.isdir(self.config.runs_dir):
+            return None
+        runs = []
+        for run_id in os.listdir(self.config.runs_dir):
+            summary_path = os.path.join(self.config.runs_dir, run_id, 'summary.json')
+            if os.path.exists(summary_path):
+                with open(summary_path) as file:
+                    summary = json.load(file)
+                if summary['status'] != 'completed':
+                    runs.append((summary['started_at'], run_id))
+        return max(runs)[1] if runs else None
+
+    def run(self, resume=None):
+        """
+        Runs the pipeline.
+
+        Parameters:
+        - resume (str, optional): Run id to continue from its checkpoints, 'latest' for the most
+          recent run that did not complete (a new run if there is none), None for a new run.
+
+        Returns:
+        - dict: The run summary, also written to `<runs_dir>/<run id>/summary.json`.
+        """
+        try:
+            fingerprint = self.fingerprint()
+            run_id = self._latest_unfinished_run() if resume == 'latest' else resume
+            run_dir = os.path.join(self.config.runs_dir, run_id) if run_id else None
+            if run_dir and os.path.exists(os.path.join(run_dir, 'summary.json')):
+                with open(os.path.join(run_dir, 'summary.json')) as file:
+                    summary = json.load(file)
+                if summary['fingerprint'] != fingerprint:
+                    raise ValueError(f"Run {run_id} was started with a different configuration, start a new run.")
+                summary['attempts'] += 1
+                logging.info(f"Resuming training run {run_id}.")
+                previous = summary.get('nodes', {})
+            else:
+                run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+                run_dir = os.path.join(self.config.runs_dir, run_id)
+                summary = {'run_id': run_id, 'fingerprint': fingerprint, 'started_at': time.time(), 'attempts': 1}
+                previous = {}
+            os.makedirs(run_dir, exist_ok=True)
+            summary_path = os.path.join(run_dir, 'summary.json')
+
+            def write_summary(states, status='running'):
+                # Nodes restored from a checkpoint keep the wall time of the attempt that ran them
+                for name, state in states.items():
+                    if state['status'] == 'resumed' and 'seconds' in previous.get(name, {}):
+                        state['seconds'] = previous[name]['seconds']
+                summary.update(status=status, nodes=states)
+                descriptor, tmp_path = tempfile.mkstemp(dir=run_dir, suffix='.tmp')
+                with os.fdopen(descriptor, 'w') as file:
+                    json.dump(summary, file, indent=2, default=str)
+                os.replace(tmp_path, summary_path)
+
+            # One deadline for every search of this attempt, a resumed run gets the whole budget again
+            time_budget = self.config.stage_configs()[2].time_budget
+            deadline = None if time_budget is None else time.time() + time_budget
+            nodes = self.nodes(deadline)
+            start = time.perf_counter()
+            with profiler.stage('training_pipeline'):
+                outputs, states = DagRunner(nodes, run_dir, max_workers=self._cpu_budget()).run(on_update=write_summary)
+            wall_time = time.perf_counter() - start
+
+            failed = sorted(name for name, state in states.items() if state['status'] in ('failed', 'skipped'))
+            summary['wall_seconds'] = wall_time
+            summary['node_seconds'] = sum(state.get('seconds', 0.0) for state in states.values())
+            if 'selection' in outputs:
+                summary['best_model'] = outputs['selection']['best_model']
+                summary['test_score'] = outputs['selection']['test_score']
+            searches = {name.partition(':')[2]: output for name, output in outputs.items() if name.startswith('search:')}
+            summary['time_budget'] = {
+                'seconds': time_budget,
+                'skipped': sorted(name for name, output in searches.items() if output.get('skipped')),
+                'truncated': sorted(name for name, output in searches.items()
+                                    if output.get('search', {}).get('truncated')),
+            }
+            write_summary(states, status='failed' if failed else 'completed')
+
+            logging.info(f"Training run {run_id} {summary['status']} in {wall_time:.2f}s "
+                         f"({summary['node_seconds']:.2f}s of node time).")
+            for name, state in states.items():
+                logging.info(f"  {name:<28} {state['status']:<10} {state.get('seconds', 0.0):8.2f}s"
+                             f"{'  ' + state['error'] if 'error' in state else ''}")
+
+            metrics.write_report(os.path.join('artifacts', 'training_timings.json'))
+            profiler.write_report(os.path.join('artifacts', 'data_profile.json'))
+            return summary
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the training pipeline.")
+    parser.add_argument('--resume', nargs='?', const='latest', default=None, metavar='RUN_ID',
+                        help="Continue an interrupted run from its checkpoints (the latest one without a RUN_ID).")
+    parser.add_argument('--n-jobs', type=int, default=TrainingPipelineConfig.n_jobs,
+                        help="CPU cores for the concurrent nodes, -1 for all of them.")
+    parser.add_argument('--incremental', action='store_true', default=TrainingPipelineConfig.incremental)
+    parser.add_argument('--distill', action='store_true', default=TrainingPipelineConfig.distill)
+    parser.add_argument('--time-budget', type=float, default=None, metavar='SECONDS',
+                        help="Stop the candidate searches after this many seconds, keeping the best setting so far.")
+    args = parser.parse_args(argv)
+
+    trainer = None
+    if args.time_budget is not None:
+        trainer = ModelTrainerConfig(incremental=args.incremental, time_budget=args.time_budget)
+    config = TrainingPipelineConfig(n_jobs=args.n_jobs, incremental=args.incremental, distill=args.distill,
+                                    trainer=trainer)
+    summary = TrainingPipeline(config).run(resume=args.resume)
+    print(f"Run {summary['run_id']} {summary['status']}: {os.path.join(config.runs_dir, summary['run_id'], 'summary.json')}")
+    return 0 if summary['status'] == 'completed' else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
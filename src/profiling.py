@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size of the process so far, None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PipelineProfiler:
+    """
+    Records the wall time and memory of training pipeline stages, and the time and in-memory
+    size of every dataset read or written between them.
+
+    The process peak RSS is recorded after each stage. With `trace_memory`, each stage also
+    gets the peak of its own Python and NumPy allocations from tracemalloc, which slows the
+    stage down, so it is off unless PROFILE_MEMORY=1.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self._lock = threading.Lock()
+        self._stages = []
+        self._io = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Profiles a block as the pipeline stage `name`.
+        """
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {'stage': name, 'seconds': time.perf_counter() - start, 'peak_rss_bytes': peak_rss_bytes()}
+            if self.trace_memory:
+                entry['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+            with self._lock:
+                self._stages.append(entry)
+
+    def record_io(self, operation, file_path, seconds, df):
+        """
+        Records one dataset read or write: its file, duration, rows and in-memory size.
+        """
+        entry = {
+            'operation': operation,
+            'file': file_path,
+            'format': os.path.splitext(file_path)[1].lstrip('.'),
+            'seconds': seconds,
+            'rows': len(df),
+            'memory_bytes': int(df.memory_usage(deep=True, index=False).sum()),
+            'file_bytes': os.path.getsize(file_path) if os.path.exists(file_path) else None,
+            'dtypes': {name: str(dtype) for name, dtype in df.dtypes.items()},
+        }
+        with self._lock:
+            self._io.append(entry)
+
+    def merge(self, report):
+        """
+        Adds the stages and dataset I/O of a `report()` made by another process, such as a pipeline
+        worker. Their peak RSS is that of the process that ran them.
+        """
+        with self._lock:
+            self._stages.extend(dict(entry) for entry in report['stages'])
+            self._io.extend(dict(entry) for entry in report['io'])
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._io.clear()
+
+    def report(self):
+        """
+        Returns the stages, the dataset I/O and the process peak RSS as a JSON-serializable dict.
+        """
+        with self._lock:
+            return {
+                'stages': [dict(entry) for entry in self._stages],
+                'io': [dict(entry) for entry in self._io],
+                'peak_rss_bytes': peak_rss_bytes(),
+            }
+
+    def write_report(self, file_path):
+        """
+        Writes `report()` as JSON to `file_path`.
+        """
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+# Process-wide profiler of the training pipeline, PROFILE_MEMORY=1 adds per-stage tracemalloc peaks
+profiler = PipelineProfiler(trace_memory=os.environ.get('PROFILE_MEMORY') == '1')
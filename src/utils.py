@@ -1,107 +1,732 @@
 import os, sys
+import hashlib
+import json
+import math
+import tempfile
+import time
 import dill
+import joblib
+import numpy as np
+from contextlib import contextmanager
+from joblib import Parallel, delayed
+from src.artifact_store import array_digest
 from src.exception import CustomException
-from sklearn.metrics import r2_score
+from src.fold_cache import estimator_key
 from src.logger import logging
-from sklearn.model_selection import GridSearchCV, RandomizedSearchCV
+from src.metrics import metrics
 
-def save_object(file_path, obj):
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# sklearn's model selection and metrics modules are only needed for training, so they are
+# imported inside the training helpers below and `load_object` stays cheap to import for serving.
+
+SERIALIZERS = ('dill', 'joblib')
+
+# Version of the metadata written next to every saved object
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def metadata_path(file_path):
+    """
+    Returns the path of the metadata file (format version, serializer, checksum) of a saved object.
     """
-    Save any Python object to a file using dill.
+    return f"{file_path}.meta.json"
+
+
+def _stream_sha256(file, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_sha256(file_path):
+    with open(file_path, 'rb') as file:
+        return _stream_sha256(file)
+
+
+def _read_metadata(file_path):
+    try:
+        with open(metadata_path(file_path)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _is_current(file, file_path):
+    try:
+        return os.path.samestat(os.fstat(file.fileno()), os.stat(file_path))
+    except FileNotFoundError:
+        return False
+
+
+def _metadata_entry(file, metadata, verify):
+    # The metadata describes the saved object and, while a save swaps it, the one it replaces.
+    # None if neither matches the checksum of the open file.
+    candidates = [metadata] + ([metadata['previous']] if metadata.get('previous') else [])
+    if verify:
+        digest = _stream_sha256(file)
+        return next((candidate for candidate in candidates if candidate['sha256'] == digest), None)
+    size = os.fstat(file.fileno()).st_size
+    return next((candidate for candidate in candidates if candidate.get('size') == size), metadata)
+
+
+def _current_entry(file_path):
+    # Metadata entry of the file currently at `file_path`, None if it has none
+    try:
+        with open(file_path, 'rb') as file:
+            metadata = _read_metadata(file_path)
+            return None if metadata is None else _metadata_entry(file, metadata, verify=False)
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _publish_lock(file_path):
+    # Serializes the saves of one path across threads and processes, so their metadata and file
+    # swaps don't interleave. Not available on Windows, where concurrent saves are last-writer-wins.
+    if fcntl is None:
+        yield
+        return
+    with open(f"{file_path}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def save_object(file_path, obj, serializer='dill', compress=0):
+    """
+    Save any Python object to a file using dill or joblib.
+
+    joblib stores NumPy arrays as raw aligned buffers, which makes them much faster to load and,
+    when uncompressed, lets `load_object(..., mmap_mode='r')` memory-map them so that several
+    worker processes share one copy from the page cache. A `<file_path>.meta.json` file records
+    the format version, serializer and SHA-256 checksum of the saved file. It is published before
+    the file and also describes the file being replaced, so `load_object` always finds a matching
+    entry, whichever of the two it reads during a save.
 
     Args:
         file_path (str): Path to save the object.
         obj: The object to save.
+        serializer (str): 'dill' or 'joblib'.
+        compress (int): joblib compression level from 0 (none, memory-mappable) to 9.
     """
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "wb") as file:
-            dill.dump(obj, file)
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown serializer {serializer!r}, expected one of {SERIALIZERS}.")
+        if serializer == 'dill' and compress:
+            raise ValueError("Compression is only supported with the joblib serializer.")
+
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to temporary files of their own and rename them, so readers never see a partially
+        # written object and concurrent saves don't overwrite each other's files
+        tmp_paths = []
+        for _ in range(2):
+            descriptor, tmp = tempfile.mkstemp(dir=directory or '.', suffix='.tmp')
+            os.close(descriptor)
+            tmp_paths.append(tmp)
+        tmp_path, tmp_metadata_path = tmp_paths
+        try:
+            if serializer == 'joblib':
+                joblib.dump(obj, tmp_path, compress=compress)
+            else:
+                with open(tmp_path, "wb") as file:
+                    dill.dump(obj, file)
+
+            metadata = {
+                'format_version': ARTIFACT_FORMAT_VERSION,
+                'serializer': serializer,
+                'compress': compress,
+                'sha256': _file_sha256(tmp_path),
+                'size': os.path.getsize(tmp_path),
+            }
+            with _publish_lock(file_path):
+                previous = _current_entry(file_path)
+                if previous is not None:
+                    metadata['previous'] = {
+                        key: previous.get(key) for key in ('serializer', 'compress', 'sha256', 'size')}
+                with open(tmp_metadata_path, "w") as file:
+                    json.dump(metadata, file, indent=2)
+                os.replace(tmp_metadata_path, metadata_path(file_path))
+                os.replace(tmp_path, file_path)
+        finally:
+            for path in tmp_paths:
+                if os.path.exists(path):
+                    os.remove(path)
     except Exception as e:
-        raise CustomException(e)
-    
+        raise CustomException(e, sys)
 
-def load_object(file_path):
+
+def load_object(file_path, mmap_mode=None, verify=True):
     """
     Loads a serialized Python object (e.g., model, preprocessor) from a file.
 
+    Files without a metadata file are treated as plain dill pickles, as written by older versions.
+
     Parameters:
     - file_path (str): Path to the serialized object file.
+    - mmap_mode (str, optional): e.g. 'r' to memory-map the NumPy arrays of uncompressed joblib files.
+    - verify (bool): Check the file against the checksum in its metadata.
 
     Returns:
     - object: The loaded Python object.
     """
     try:
-        with open(file_path, "rb") as file:
-            return dill.load(file)
+        for _ in range(3):
+            # The file is opened before its metadata is read: `save_object` publishes the metadata
+            # first, so whatever file this is, the metadata read next has an entry for it
+            with open(file_path, "rb") as file:
+                metadata = _read_metadata(file_path)
+                if metadata is None:
+                    return dill.load(file)
+
+                if metadata.get('format_version', 0) > ARTIFACT_FORMAT_VERSION:
+                    raise ValueError(f"{file_path} was saved with a newer artifact format "
+                                     f"(version {metadata['format_version']}).")
+                entry = _metadata_entry(file, metadata, verify)
+                if entry is None:
+                    if _is_current(file, file_path):
+                        raise ValueError(f"Checksum mismatch for {file_path}, the file is corrupt or was modified.")
+                    # Replaced by more than one save since it was opened, read the new file
+                    continue
+
+                if entry['serializer'] != 'joblib':
+                    file.seek(0)
+                    return dill.load(file)
+                # joblib reopens the path to memory-map it, which must still be the checked file
+                try:
+                    obj = joblib.load(file_path, mmap_mode=None if entry.get('compress') else mmap_mode)
+                except Exception:
+                    if _is_current(file, file_path):
+                        raise
+                    continue
+                if _is_current(file, file_path):
+                    return obj
+        raise ValueError(f"{file_path} kept being replaced while it was loaded.")
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def save_features(file_path, features):
+    """
+    Saves a feature matrix: dense arrays in .npy format (memory-mappable), CSR matrices in
+    scipy's .npz format. `load_features` tells the two apart by their content.
+
+    Parameters:
+    - file_path (str): Destination path, used as is whatever the format.
+    - features (numpy.ndarray or scipy.sparse matrix): The matrix to save.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        with open(file_path, 'wb') as file:
+            if hasattr(features, 'tocsr'):
+                from scipy import sparse
+                sparse.save_npz(file, features.tocsr(), compressed=False)
+            else:
+                np.save(file, features)
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_features(file_path, mmap_mode=None):
+    """
+    Loads a feature matrix saved by `save_features`.
+
+    Parameters:
+    - mmap_mode (str, optional): e.g. 'r' to memory-map a dense matrix (ignored for CSR).
+
+    Returns:
+    - numpy.ndarray or scipy.sparse.csr_matrix: The matrix.
+    """
+    try:
+        loaded = np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
+        if isinstance(loaded, np.lib.npyio.NpzFile):
+            loaded.close()
+            from scipy import sparse
+            return sparse.load_npz(file_path)
+        return loaded
     except Exception as e:
         raise CustomException(e, sys)
 
 
-def evaluate_model(X_train, y_train, X_test, y_test, models, params):
+def features_nbytes(features):
+    """
+    Returns the memory used by a dense or CSR feature matrix, in bytes.
+    """
+    if hasattr(features, 'indptr'):
+        return features.data.nbytes + features.indices.nbytes + features.indptr.nbytes
+    return features.nbytes
+
+
+def _accepts_sparse(model):
+    from sklearn.utils import get_tags
+
+    try:
+        return get_tags(model).input_tags.sparse
+    except Exception:
+        return False
+
+
+SEARCH_STRATEGIES = ('random', 'halving')
+
+
+def _fit_fold(estimator, X, y, fold):
+    """
+    Fits a copy of `estimator` on the training part of one CV fold and returns its R^2 on the
+    held-out part (None if the fit failed) and the fit time.
+    """
+    from sklearn.base import clone
+    from sklearn.metrics import r2_score
+
+    train_index, test_index = fold
+    start = time.perf_counter()
+    try:
+        fitted = clone(estimator).fit(X[train_index], y[train_index])
+        score = float(r2_score(y[test_index], fitted.predict(X[test_index])))
+    except Exception as e:
+        logging.warning(f"CV fit of {type(estimator).__name__} failed: {e}")
+        score = None
+    return score, time.perf_counter() - start
+
+
+def _fit_cached(estimator, X, y, fold_cache, data_digest):
+    """
+    Fits `estimator` on all of `X`, or returns the estimator cached for the same configuration and data.
+    """
+    key = estimator_key(estimator, data_digest, extra={'refit': True, 'sparse': hasattr(X, 'toarray')})
+    cached = fold_cache.get_model(key) if fold_cache is not None else None
+    if cached is not None:
+        return cached, True
+    estimator.fit(X, y)
+    if fold_cache is not None:
+        fold_cache.put_model(key, estimator)
+    return estimator, False
+
+
+def _deadline_passed(deadline):
+    return deadline is not None and time.time() >= deadline
+
+
+def _score_settings(estimators, X, y, folds, n_jobs, fold_cache=None, data_digest=None, extra=None,
+                    deadline=None):
+    """
+    Computes the CV score of every estimator on every fold, looking each one up in `fold_cache`
+    first and fitting the missing ones in parallel over `n_jobs` cores.
+
+    The fits run in batches of about `n_jobs` and the deadline is checked before each batch, so
+    past the deadline the remaining estimators are left unscored. The first batch always runs
+    unless a setting is already fully scored from the cache, so there is something to pick from.
+
+    Returns:
+        tuple: The (estimators x folds) scores, NaN for failed fits, the mask of the estimators
+        scored on every fold, the number of scores served from the cache and whether the
+        deadline stopped the scoring.
+    """
+    from joblib import effective_n_jobs
+
+    scores = np.full((len(estimators), len(folds)), np.nan)
+    scored = np.zeros((len(estimators), len(folds)), dtype=bool)
+    sparse_input = hasattr(X, 'toarray')
+
+    pending = []
+    cache_hits = 0
+    for i, estimator in enumerate(estimators):
+        for j in range(len(folds)):
+            key = None
+            if fold_cache is not None:
+                key = estimator_key(estimator, data_digest, extra={'fold': j, 'sparse': sparse_input, **(extra or {})})
+                cached = fold_cache.get_score(key)
+                if cached is not None:
+                    scores[i, j] = np.nan if cached['score'] is None else cached['score']
+                    scored[i, j] = True
+                    cache_hits += 1
+                    continue
+            pending.append((i, j, key))
+
+    # Whole settings per batch, so a stopped search leaves complete settings behind
+    batch_settings = max(1, math.ceil(effective_n_jobs(n_jobs) / len(folds)))
+    pending_settings = list(dict.fromkeys(i for i, _, _ in pending))
+    truncated = False
+    for start in range(0, len(pending_settings), batch_settings):
+        if _deadline_passed(deadline) and scored.all(axis=1).any():
+            truncated = True
+            break
+        batch_settings_set = set(pending_settings[start:start + batch_settings])
+        batch = [(i, j, key) for i, j, key in pending if i in batch_settings_set]
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_fold)(estimators[i], X, y, folds[j]) for i, j, _ in batch
+        )
+        for (i, j, key), (score, fit_time) in zip(batch, results):
+            scores[i, j] = np.nan if score is None else score
+            scored[i, j] = True
+            if fold_cache is not None:
+                fold_cache.put_score(key, score, fit_time)
+
+    return scores, scored.all(axis=1), cache_hits, truncated
+
+
+def _best_setting(settings, scores, complete):
+    # A setting with a failed fold scores NaN and is ranked last, as in scikit-learn
+    mean_scores = np.where(complete, scores.mean(axis=1), np.nan)
+    if np.isnan(mean_scores).all():
+        raise ValueError("Every hyperparameter setting failed to fit.")
+    return settings[int(np.nanargmax(mean_scores))]
+
+
+def _cached_random_search(model, param_grid, X_train, y_train, folds, n_jobs, fold_cache=None, data_digest=None,
+                          n_iter=10, random_state=42, deadline=None):
+    """
+    Random hyperparameter search over precomputed CV folds, with fold results cached on disk.
+
+    Samples the same settings as RandomizedSearchCV(n_iter=10, random_state=42) and picks the
+    best mean R^2 the same way, but every (setting, fold) score is looked up in `fold_cache`
+    first and only the missing ones are fitted (see `_score_settings`). Past the deadline, the
+    best of the settings scored so far is taken. The best setting is then refitted on the full
+    training data, or taken from the cache.
+
+    Returns:
+        tuple: The fitted best estimator, its parameters, the number of fits served from the
+        cache and whether the deadline cut the search short.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import ParameterSampler
+
+    settings = list(ParameterSampler(param_grid, n_iter=n_iter, random_state=random_state))
+    estimators = [clone(model).set_params(**setting) for setting in settings]
+    scores, complete, cache_hits, truncated = _score_settings(
+        estimators, X_train, y_train, folds, n_jobs, fold_cache, data_digest, deadline=deadline)
+    best_params = _best_setting(settings, scores, complete)
+
+    best_model, refit_cached = _fit_cached(
+        clone(model).set_params(**best_params), X_train, y_train, fold_cache, data_digest)
+    return best_model, best_params, cache_hits + int(refit_cached), truncated
+
+
+def _cached_halving_search(model, param_grid, X_train, y_train, folds, n_jobs, fold_cache=None, data_digest=None,
+                           n_candidates=10, factor=3, random_state=42, deadline=None):
+    """
+    Successive halving over `n_candidates` sampled settings, on the precomputed CV folds.
+
+    Each round keeps the best third of the settings and triples their budget, so unpromising
+    ones are dropped after a cheap first round; the last round runs on the full budget. The
+    budget is `n_estimators` when the grid tunes it, otherwise the number of training rows of
+    each fold. This follows HalvingRandomSearchCV(min_resources='exhaust'), with the fold
+    results cached like the random search and the deadline checked between (and within)
+    rounds: past it, the best setting of the last round scored is refitted (with that round's
+    `n_estimators` when it is the budget).
+
+    Returns:
+        tuple: The fitted best estimator, its parameters, the number of fits served from the
+        cache and whether the deadline cut the search short.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import ParameterSampler
+
+    param_grid = dict(param_grid)
+    if 'n_estimators' in param_grid:
+        # Boosting rounds / trees become the budget instead of a searched parameter
+        resource, max_resources = 'n_estimators', max(param_grid.pop('n_estimators'))
+    else:
+        resource, max_resources = 'n_samples', min(len(train_index) for train_index, _ in folds)
+
+    settings = list(ParameterSampler(param_grid, n_iter=n_candidates, random_state=random_state)) \
+        if param_grid else [{}]
+    n_rounds = 1 + int(math.floor(math.log(len(settings), factor)))
+    min_resources = max(1, max_resources // factor ** (n_rounds - 1))
+    rng = np.random.RandomState(random_state)
+
+    cache_hits, truncated, best_params = 0, False, None
+    for round_index in range(n_rounds):
+        if round_index and _deadline_passed(deadline):
+            truncated = True
+            break
+        last_round = round_index == n_rounds - 1
+        budget = max_resources if last_round else min_resources * factor ** round_index
+        round_settings, round_folds = settings, folds
+        if resource == 'n_estimators':
+            round_settings = [{**setting, 'n_estimators': budget} for setting in settings]
+        elif not last_round:
+            # The same subsample of each fold's training rows for every setting of the round
+            round_folds = [(np.sort(rng.choice(train_index, size=budget, replace=False)), test_index)
+                           for train_index, test_index in folds]
+
+        estimators = [clone(model).set_params(**setting) for setting in round_settings]
+        scores, complete, hits, round_truncated = _score_settings(
+            estimators, X_train, y_train, round_folds, n_jobs, fold_cache, data_digest,
+            extra={'halving_budget': int(budget)} if resource == 'n_samples' else None, deadline=deadline)
+        cache_hits += hits
+        best_params = _best_setting(round_settings, scores, complete)
+        if round_truncated:
+            truncated = True
+            break
+
+        # Keep the best third of the settings for the next round
+        mean_scores = np.nan_to_num(np.where(complete, scores.mean(axis=1), np.nan), nan=-np.inf)
+        keep = np.argsort(-mean_scores, kind='stable')[:math.ceil(len(settings) / factor)]
+        settings = [settings[i] for i in sorted(keep)]
+
+    best_model, refit_cached = _fit_cached(
+        clone(model).set_params(**best_params), X_train, y_train, fold_cache, data_digest)
+    return best_model, best_params, cache_hits + int(refit_cached), truncated
+
+
+def _share_with_workers(directory, arrays):
+    """
+    Dumps `arrays` once and loads them back memory-mapped, so the worker processes map the same
+    file instead of each receiving a copy.
+    """
+    path = os.path.join(directory, 'shared.joblib')
+    joblib.dump(arrays, path)
+    return joblib.load(path, mmap_mode='r')
+
+
+def _candidate_features(model, X, dense=False):
+    # Sparse features are used as is by models that support them, densified for the others
+    if hasattr(X, 'toarray') and (dense or not _accepts_sparse(model)):
+        return X.toarray()
+    return X
+
+
+def check_sparse_consistency(model_name, model, X, dense=False, n_rows=1000):
+    """
+    Checks that a model trained on CSR features predicts the same on the equivalent dense rows,
+    which is what the serving preprocessors produce. Models that read an absent CSR entry as
+    missing rather than as 0 (e.g. XGBoost) fail it and belong in `dense_models`.
+
+    Raises:
+        ValueError: If the predictions on the first `n_rows` rows of `X` differ.
+    """
+    if not hasattr(X, 'toarray') or dense or not _accepts_sparse(model):
+        return
+    sample = X[:n_rows]
+    sparse_predictions = np.asarray(model.predict(sample), dtype=np.float64)
+    dense_predictions = np.asarray(model.predict(sample.toarray()), dtype=np.float64)
+    if not np.allclose(sparse_predictions, dense_predictions, rtol=1e-6, atol=1e-6):
+        difference = float(np.max(np.abs(sparse_predictions - dense_predictions)))
+        raise ValueError(f"{model_name} predicts up to {difference:.3g} differently on dense rows than on "
+                         f"the CSR features it was trained on, add it to dense_models.")
+
+
+def make_cv_folds(X_train, y_train, cv_folds=3, fold_cache=None):
+    """
+    Computes the CV folds shared by every candidate search and, when a fold cache is used, the
+    digest of the training data and folds that keys its entries.
+
+    Returns:
+        tuple: The list of (train_index, test_index) folds and the data digest (None without a cache).
+    """
+    from sklearn.model_selection import KFold
+
+    # Same splits as the default cv=3 of scikit-learn's searches for regressors
+    folds = list(KFold(n_splits=cv_folds).split(np.zeros((X_train.shape[0], 1))))
+    data_digest = None
+    if fold_cache is not None:
+        data_digest = hashlib.sha256(''.join(
+            [array_digest(X_train), array_digest(np.asarray(y_train))]
+            + [array_digest(test_index) for _, test_index in folds]
+        ).encode()).hexdigest()
+    return folds, data_digest
+
+
+def search_candidate(model_name, model, param_grid, X_train, y_train, n_jobs, search_strategy='random',
+                     dense=False, folds=3, fold_cache=None, data_digest=None, deadline=None):
+    """
+    Tunes (if a grid is given) and fits a single candidate model on the training data.
+
+    With a `deadline` (a `time.time()` timestamp), the search stops once it has passed and
+    the best setting scored so far is refitted.
+
+    Returns:
+        tuple: The fitted best estimator and its search report (best parameters, fit time in
+        seconds, number of fits served from the fold cache and whether the deadline cut the
+        search short).
+    """
+    X_train = _candidate_features(model, X_train, dense)
+
+    logging.info(f"Training {model_name} with {search_strategy} search...")
+    fit_start = time.perf_counter()
+
+    if search_strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy {search_strategy!r}, expected one of {SEARCH_STRATEGIES}.")
+    if isinstance(folds, int):
+        folds, data_digest = make_cv_folds(X_train, y_train, folds, fold_cache)
+
+    cache_hits, truncated = 0, False
+    if param_grid:
+        search = _cached_random_search if search_strategy == 'random' else _cached_halving_search
+        best_model, best_params, cache_hits, truncated = search(
+            model, param_grid, X_train, y_train, folds, n_jobs, fold_cache, data_digest, deadline=deadline)
+        if truncated:
+            logging.warning(f"Search for {model_name} stopped by the time budget, keeping the best setting so far.")
+        logging.info(f"Best parameters for {model_name}: {best_params}")
+    else:
+        best_model, refit_cached = _fit_cached(model, X_train, y_train, fold_cache, data_digest)
+        cache_hits = int(refit_cached)
+        best_params = "Default parameters"
+
+    return best_model, {
+        'best_params': best_params,
+        'fit_time': time.perf_counter() - fit_start,
+        'cache_hits': cache_hits,
+        'truncated': truncated,
+    }
+
+
+def score_candidate(model_name, best_model, X_train, y_train, X_test, y_test, dense=False):
+    """
+    Scores a fitted candidate on the training and testing data.
+
+    Returns:
+        dict: Train and test R^2 scores and the prediction wall time in seconds.
+
+    Raises:
+        ValueError: If it predicts differently on dense rows, see `check_sparse_consistency`.
     """
-    Train models with hyperparameter tuning using RandomizedSearchCV and evaluate performance on training and testing datasets.
+    from sklearn.metrics import r2_score
+
+    check_sparse_consistency(model_name, best_model, X_test, dense)
+
+    X_train = _candidate_features(best_model, X_train, dense)
+    X_test = _candidate_features(best_model, X_test, dense)
+
+    # Make predictions
+    predict_start = time.perf_counter()
+    y_train_pred = best_model.predict(X_train)
+    y_test_pred = best_model.predict(X_test)
+    predict_time = time.perf_counter() - predict_start
+
+    # Evaluate model performance using R^2 score
+    train_score = r2_score(y_train, y_train_pred)
+    test_score = r2_score(y_test, y_test_pred)
+    logging.info(f"{model_name} - Train Score: {train_score:.4f}, Test Score: {test_score:.4f}")
+
+    return {'train_score': train_score, 'test_score': test_score, 'predict_time': predict_time}
+
+
+def _evaluate_candidate(model_name, model, param_grid, X_train, y_train, X_test, y_test, n_jobs,
+                        search_strategy='random', deadline=None, dense=False, folds=3,
+                        fold_cache=None, data_digest=None):
+    """
+    Tunes (if a grid is given), fits and scores a single candidate model.
+
+    Returns:
+        tuple: The model name, the fitted best estimator (None on failure) and its report entry.
+    """
+    try:
+        # Untuned candidates are a single cheap fit, only searches are skipped past the deadline
+        if param_grid and deadline is not None and time.time() >= deadline:
+            logging.warning(f"Skipping {model_name}: time budget exhausted.")
+            return model_name, None, {'error': 'Skipped: time budget exhausted'}
+
+        best_model, search = search_candidate(
+            model_name, model, param_grid, X_train, y_train, n_jobs, search_strategy, dense,
+            folds, fold_cache, data_digest, deadline)
+        scores = score_candidate(model_name, best_model, X_train, y_train, X_test, y_test, dense)
+        logging.info(f"{model_name} - Fit: {search['fit_time']:.2f}s, cached fits: {search['cache_hits']}")
+
+        return model_name, best_model, {
+            'train_score': scores['train_score'],
+            'test_score': scores['test_score'],
+            'best_params': search['best_params'],
+            'fit_time': search['fit_time'],
+            'predict_time': scores['predict_time'],
+            'cache_hits': search['cache_hits'],
+            'truncated': search['truncated'],
+        }
+    except Exception as e:
+        logging.error(f"Error evaluating model {model_name}: {e}")
+        return model_name, None, {'error': str(e)}
+
+
+def evaluate_model(X_train, y_train, X_test, y_test, models, params, n_jobs=-1,
+                   search_strategy='random', time_budget=None, dense_models=(), cv_folds=3, fold_cache=None):
+    """
+    Train models with hyperparameter tuning (random search or successive halving) and evaluate performance on training and testing datasets.
+
+    Candidate searches run concurrently within a global CPU budget: the candidates are spread
+    over a shared process pool and the cores left over are given to each candidate's own
+    search, so cheap models no longer leave cores idle while the ensembles train.
+    The fitted best estimator of each candidate replaces its entry in `models`.
+
+    The CV folds are computed once and shared by every search. With several workers, the data
+    and the folds are written once to memory-mapped files that all worker processes read,
+    instead of being copied into each of them.
 
     Args:
-        X_train (array): Training features.
+        X_train (array or sparse matrix): Training features.
         y_train (array): Training target values.
-        X_test (array): Testing features.
+        X_test (array or sparse matrix): Testing features.
         y_test (array): Testing target values.
         models (dict): Dictionary of model instances keyed by their names.
         params (dict): Dictionary of hyperparameter grids for each model.
+        n_jobs (int): Total number of CPU cores to use, -1 for all of them and 1 to train sequentially.
+        search_strategy (str): 'random' for random search or 'halving' for successive halving.
+        time_budget (float, optional): Seconds after which the whole search stops: running searches
+            keep the best setting scored so far (reported with 'truncated'), searches that have not
+            started yet are skipped and reported with an error.
+        dense_models (iterable): Names of the models trained on dense features even though they
+            accept sparse ones, because they are slower on sparse input.
+        cv_folds (int): Number of (unshuffled) K-fold splits used by every search.
+        fold_cache (FoldCache, optional): On-disk cache of fold scores and refitted estimators.
 
     Returns:
-        dict: A report containing training and testing R^2 scores, along with best parameters for each model.
+        dict: A report containing training and testing R^2 scores, best parameters, and fit/predict
+        wall times in seconds for each model.
     """
-    report = {}
     try:
-        for model_name, model in models.items():
-            try:
-                logging.info(f"Training {model_name} with RandomizedSearchCV...")
-
-                # Get hyperparameter grid for the current model, if available.
-                param_grid = params.get(model_name, {})
-
-                if param_grid:
-                    # Use RandomizedSearchCV to randomly sample a fixed number of parameter settings
-                    random_search = RandomizedSearchCV(
-                        estimator=model,
-                        param_distributions=param_grid,
-                        cv=3,                      # Reduced number of CV folds to 3
-                        scoring="r2",
-                        n_iter=10,                 # Try only 10 combinations to reduce the search space
-                        n_jobs=-1,
-                        verbose=1,
-                        random_state=42
-                    )
-                    random_search.fit(X_train, y_train)
-                    best_model = random_search.best_estimator_
-                    best_params = random_search.best_params_
-                    logging.info(f"Best parameters for {model_name}: {best_params}")
-                else:
-                    best_model = model
-                    best_model.fit(X_train, y_train)
-                    best_params = "Default parameters"
-
-                # Make predictions
-                y_train_pred = best_model.predict(X_train)
-                y_test_pred = best_model.predict(X_test)
-
-                # Evaluate model performance using R^2 score
-                train_score = r2_score(y_train, y_train_pred)
-                test_score = r2_score(y_test, y_test_pred)
-
-                logging.info(f"{model_name} - Train Score: {train_score:.4f}, Test Score: {test_score:.4f}")
-
-                # Store the results
-                report[model_name] = {
-                    'train_score': train_score,
-                    'test_score': test_score,
-                    'best_params': best_params
-                }
-            except Exception as e:
-                logging.error(f"Error evaluating model {model_name}: {e}")
-                report[model_name] = {'error': str(e)}
+        if search_strategy not in SEARCH_STRATEGIES:
+            raise ValueError(f"Unknown search strategy {search_strategy!r}, expected one of {SEARCH_STRATEGIES}.")
+        deadline = time.time() + time_budget if time_budget is not None else None
+
+        cpu_budget = (os.cpu_count() or 1) if n_jobs is None or n_jobs < 0 else n_jobs
+        outer_jobs = max(1, min(len(models), cpu_budget))
+        inner_jobs = max(1, cpu_budget // outer_jobs)
+
+        # Start the largest searches first so they don't end up as the stragglers
+        def search_size(model_name):
+            grid = params.get(model_name, {})
+            return math.prod(len(values) for values in grid.values()) if grid else 0
+
+        ordered_names = sorted(models, key=search_size, reverse=True)
+
+        folds, data_digest = make_cv_folds(X_train, y_train, cv_folds, fold_cache)
+
+        logging.info(f"Evaluating {len(models)} models on {outer_jobs} workers "
+                     f"x {inner_jobs} cores each (budget: {cpu_budget} cores).")
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix='evaluate_model_') as shared_dir:
+            if outer_jobs > 1:
+                X_train, y_train, X_test, y_test, folds = _share_with_workers(
+                    shared_dir, (X_train, y_train, X_test, y_test, folds))
+            results = Parallel(n_jobs=outer_jobs)(
+                delayed(_evaluate_candidate)(
+                    model_name, models[model_name], params.get(model_name, {}),
+                    X_train, y_train, X_test, y_test, inner_jobs,
+                    search_strategy, deadline, model_name in dense_models,
+                    folds, fold_cache, data_digest,
+                )
+                for model_name in ordered_names
+            )
+        logging.info(f"Model evaluation took {time.perf_counter() - start:.2f}s.")
+
+        # Report in the caller's order and hand back the fitted estimators
+        results = {model_name: (best_model, entry) for model_name, best_model, entry in results}
+        report = {}
+        for model_name in models:
+            best_model, report[model_name] = results[model_name]
+            if best_model is not None:
+                models[model_name] = best_model
+                # Candidates may have trained in worker processes, so record their timings here
+                metrics.observe('model_fit', report[model_name]['fit_time'], model=model_name)
+                metrics.observe('model_predict', report[model_name]['predict_time'], model=model_name)
 
         return report
     except Exception as e: